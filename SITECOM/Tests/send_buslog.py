@@ -1,16 +1,36 @@
 #!/usr/bin/env python3
 """
 Script para enviar dados do buslog.json para a API de webhook
-Uso: python3 send_buslog.py [caminho_do_buslog.json]
+Uso: python3 send_buslog.py [caminho_do_buslog.json] [--stream [--chunk-size N] [--records-key CHAVE] [--no-gzip] [--restart]]
+     python3 send_buslog.py DIRETÓRIO|GLOB|ARQUIVO... [--concurrency N] [--report relatorio.json] [--stream ...]
 """
 
 import sys
 import os
 import json
+import gzip
+import time
+import glob
+import hashlib
+import argparse
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 
+API_URL = os.getenv('buslog_api_url', "https://aquanimal.com.br/apicom/webhook/track3rc")
+# Modo --stream: registros por lote e bytes lidos do arquivo por vez
+DEFAULT_CHUNK_SIZE = int(os.getenv('buslog_chunk_size', '500'))
+READ_BLOCK_SIZE = 64 * 1024
+# Novas tentativas de um lote em timeout, erro de conexão, 429 ou 5xx
+CHUNK_RETRIES = 3
+# Formato de header que a API aceitou, por URL: as próximas execuções vão direto nele
+AUTH_CACHE_PATH = os.getenv('buslog_auth_cache', os.path.expanduser('~/.send_buslog_auth.json'))
+# Modo diretório: arquivos enviados ao mesmo tempo
+DEFAULT_CONCURRENCY = int(os.getenv('buslog_concurrency', '4'))
+
+
 def read_json_file(file_path):
     """
     Lê o arquivo JSON e retorna o conteúdo
@@ -48,44 +68,111 @@ def get_token_from_env():
     return token
 
 
-def send_to_api(json_data, token):
+# Formatos de header com o token, em ordem de prioridade
+AUTH_FORMATS = {
+    'token': lambda token: {'token': token},  # Formato mais simples: header 'token'
+    'bearer': lambda token: {'Authorization': f'Bearer {token}'},  # Bearer token
+    'x-api-token': lambda token: {'X-API-Token': token},  # Header customizado
+    'authorization': lambda token: {'Authorization': token},  # Token direto no Authorization
+}
+
+
+class AuthState:
+    """
+    Formato de header em uso, compartilhado pelos envios (inclusive entre
+    threads). O formato aceito pela API é salvo em AUTH_CACHE_PATH junto com
+    a URL e um hash do token; as próximas execuções começam por ele e só
+    testam os outros se receberem 401.
+    """
+    def __init__(self, token):
+        self.token = token
+        self.lock = threading.Lock()
+        self.name = self._load()
+
+    def _key(self):
+        return f"{API_URL} {hashlib.sha256(self.token.encode('utf-8')).hexdigest()[:16]}"
+
+    def _load(self):
+        try:
+            with open(AUTH_CACHE_PATH, 'r', encoding='utf-8') as f:
+                name = json.load(f).get(self._key())
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            return None
+        return name if name in AUTH_FORMATS else None
+
+    def candidates(self):
+        """
+        Nomes dos formatos na ordem de tentativa: o confirmado primeiro
+        """
+        with self.lock:
+            first = self.name
+        return ([first] if first else []) + [name for name in AUTH_FORMATS if name != first]
+
+    def header(self, name):
+        return AUTH_FORMATS[name](self.token)
+
+    def confirm(self, name):
+        """
+        Registra o formato que a API aceitou e salva se mudou
+        """
+        with self.lock:
+            if name == self.name:
+                return
+            self.name = name
+            try:
+                with open(AUTH_CACHE_PATH, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                cache = {}
+            cache[self._key()] = name
+            tmp = f"{AUTH_CACHE_PATH}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(cache, f)
+                os.replace(tmp, AUTH_CACHE_PATH)
+            except OSError as e:
+                print(f"⚠️  Não foi possível salvar o formato do header em {AUTH_CACHE_PATH}: {e}")
+
+
+def send_to_api(json_data, auth):
     """
     Envia o JSON para a API via POST
-    Tenta diferentes formatos de header com token
+    Começa pelo formato de header salvo; sem formato salvo, tenta os
+    diferentes formatos de header com token
     """
-    url = "https://aquanimal.com.br/apicom/webhook/track3rc"
+    url = API_URL
+    token = auth.token
     
-    # Lista de formatos de header para tentar (em ordem de prioridade)
-    header_formats = [
-        {'token': token},  # Formato mais simples: header 'token'
-        {'Authorization': f'Bearer {token}'},  # Bearer token
-        {'X-API-Token': token},  # Header customizado
-        {'Authorization': token},  # Token direto no Authorization
-    ]
+    # Formatos de header para tentar (o salvo primeiro, depois em ordem de prioridade)
+    header_formats = auth.candidates()
+    cached = auth.name
     
     try:
+        # Serializa uma vez: o mesmo corpo serve para todas as tentativas
+        body = json.dumps(json_data).encode('utf-8')
         print(f"📡 Enviando dados para: {url}")
-        print(f"📦 Tamanho do JSON: {len(json.dumps(json_data))} bytes")
+        print(f"📦 Tamanho do JSON: {len(body)} bytes")
         print(f"🔑 Token: {token[:10]}...{token[-5:] if len(token) > 15 else token}")
+        if cached:
+            print(f"🔑 Usando o formato de header salvo: '{cached}'")
         
         response = None
         last_error = None
         successful_response = None
         
         # Tentar cada formato de header
-        for i, header_format in enumerate(header_formats, 1):
+        for i, header_name in enumerate(header_formats, 1):
             headers = {
                 'Content-Type': 'application/json',
-                **header_format
+                **auth.header(header_name)
             }
             
-            header_name = list(header_format.keys())[0]
             print(f"🔄 Tentativa {i}/{len(header_formats)}: Header '{header_name}'")
             
             try:
                 response = requests.post(
                     url,
-                    json=json_data,
+                    data=body,
                     headers=headers,
                     timeout=30
                 )
@@ -93,6 +180,7 @@ def send_to_api(json_data, token):
                 # Se sucesso (2xx), parar de tentar
                 if 200 <= response.status_code < 300:
                     print(f"✅ Requisição enviada com sucesso usando header '{header_name}'!")
+                    auth.confirm(header_name)
                     successful_response = response
                     break
                 elif response.status_code == 401:
@@ -100,14 +188,19 @@ def send_to_api(json_data, token):
                     last_error = response
                     continue
                 else:
-                    # Outro erro, salvar mas continuar tentando
                     print(f"   ⚠️  Status {response.status_code} com header '{header_name}'")
                     last_error = response
+                    # Com o formato salvo, outro erro não é de autenticação: não reenvia
+                    if header_name == cached:
+                        break
+                    # Outro erro, salvar mas continuar tentando
                     continue
                     
             except requests.exceptions.RequestException as e:
                 print(f"   ⚠️  Erro na tentativa {i}: {str(e)}")
                 last_error = e
+                if header_name == cached:
+                    break
                 continue
         
         # Se tivemos sucesso, processar resposta
@@ -194,17 +287,419 @@ def send_to_api(json_data, token):
         return False
 
 
+class JsonStream:
+    """
+    Leitor JSON incremental: mantém só um bloco do arquivo em memória e
+    decodifica um valor por vez com raw_decode (sem dependências além da
+    biblioteca padrão)
+    """
+    decoder = json.JSONDecoder()
+
+    def __init__(self, f, block_size=READ_BLOCK_SIZE):
+        self.f = f
+        self.block_size = block_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        data = self.f.read(self.block_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Próximo caractere que não é espaço ('' no fim do arquivo)
+        """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Esperado '{char}', encontrado '{found or 'fim do arquivo'}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """
+        Decodifica o próximo valor, lendo mais blocos enquanto ele estiver incompleto
+        """
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+                # Um número no fim do bloco pode continuar no próximo
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+class BuslogStream:
+    """
+    Percorre os registros de rastreio de um buslog sem carregar o arquivo:
+    o arquivo pode ser uma lista de registros ou um objeto com a lista em
+    records_key (padrão: a primeira chave cujo valor é uma lista). As chaves
+    do objeto que vêm antes da lista são repetidas em cada lote.
+    """
+    def __init__(self, file_path, records_key=None):
+        self.file_path = file_path
+        self.records_key = records_key
+        self.envelope = None
+
+    def records(self):
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            stream = JsonStream(f)
+            if stream.peek() == '[':
+                yield from self._array(stream)
+                return
+            stream.expect('{')
+            self.envelope = {}
+            while stream.peek() != '}':
+                key = stream.value()
+                stream.expect(':')
+                if stream.peek() == '[' and (self.records_key is None or key == self.records_key):
+                    self.records_key = key
+                    yield from self._array(stream)
+                    return
+                self.envelope[key] = stream.value()
+                if stream.peek() == ',':
+                    stream.expect(',')
+            raise ValueError(f"Nenhuma lista de registros encontrada em {self.file_path}"
+                             + (f" (chave '{self.records_key}')" if self.records_key else ""))
+
+    def _array(self, stream):
+        stream.expect('[')
+        while stream.peek() != ']':
+            yield stream.value()
+            if stream.peek() == ',':
+                stream.expect(',')
+
+    def chunks(self, chunk_size):
+        """
+        Lotes de até chunk_size registros: (registros, corpo no mesmo formato do arquivo)
+        """
+        chunk = []
+        for record in self.records():
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk, self._body(chunk)
+                chunk = []
+        if chunk:
+            yield chunk, self._body(chunk)
+
+    def _body(self, chunk):
+        if self.envelope is None:
+            return chunk
+        return {**self.envelope, self.records_key: chunk}
+
+
+def progress_path(file_path):
+    return f"{file_path}.progress"
+
+
+def load_progress(file_path, chunk_size):
+    """
+    Lotes já confirmados pela API numa execução anterior interrompida.
+    Só vale se o arquivo e o tamanho do lote forem os mesmos.
+    """
+    try:
+        with open(progress_path(file_path), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+    stat = os.stat(file_path)
+    if (state.get('size'), state.get('mtime'), state.get('chunk_size')) != (stat.st_size, stat.st_mtime, chunk_size):
+        print("⚠️  Progresso anterior é de outra versão do arquivo ou outro tamanho de lote; começando do início")
+        return 0
+    return state.get('acked', 0)
+
+
+def save_progress(file_path, chunk_size, acked):
+    """
+    Grava o último lote confirmado (arquivo temporário + rename, à prova de interrupção)
+    """
+    stat = os.stat(file_path)
+    state = {'size': stat.st_size, 'mtime': stat.st_mtime, 'chunk_size': chunk_size, 'acked': acked}
+    tmp = f"{progress_path(file_path)}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, progress_path(file_path))
+
+
+def post_chunk(session, body, headers, timeout, say=print):
+    """
+    POST de um lote com novas tentativas (backoff 1s, 2s, 4s) em timeout,
+    erro de conexão, 429 e 5xx. Retorna a resposta final ou levanta a exceção.
+    """
+    for attempt in range(CHUNK_RETRIES + 1):
+        try:
+            response = session.post(API_URL, data=body, headers=headers, timeout=timeout)
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            error = f"Status {response.status_code}"
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            if attempt == CHUNK_RETRIES:
+                raise
+            error = str(e)
+        if attempt == CHUNK_RETRIES:
+            return response
+        say(f"   ↻ {error}, nova tentativa em {2 ** attempt}s")
+        time.sleep(2 ** attempt)
+
+
+def post_authenticated(session, body, base_headers, auth, timeout, say=print):
+    """
+    POST com o formato de header confirmado (ou o primeiro, se nenhum foi
+    confirmado ainda); os outros formatos só são testados num 401
+    """
+    candidates = auth.candidates()
+    for i, name in enumerate(candidates):
+        response = post_chunk(session, body, {**base_headers, **auth.header(name)}, timeout, say)
+        if response.status_code == 401 and i + 1 < len(candidates):
+            say(f"   ⚠️  Não autorizado (401) com header '{name}'")
+            continue
+        if 200 <= response.status_code < 300:
+            auth.confirm(name)
+        return response
+
+
+def new_session(pool_size=1):
+    """
+    Sessão HTTP keep-alive com até pool_size conexões abertas para a API
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def stream_to_api(file_path, auth, chunk_size, records_key=None, use_gzip=True, restart=False, timeout=30,
+                  session=None, say=print):
+    """
+    Envia o buslog em lotes de chunk_size registros, lidos do arquivo aos
+    poucos, numa única sessão HTTP (keep-alive) e com corpo gzip. Cada lote
+    confirmado (2xx) é gravado em <arquivo>.progress; se a execução for
+    interrompida, a próxima continua do lote seguinte.
+    """
+    if restart and os.path.exists(progress_path(file_path)):
+        os.remove(progress_path(file_path))
+    acked = load_progress(file_path, chunk_size)
+    if acked:
+        say(f"↻ Retomando após o lote {acked} já confirmado")
+
+    say(f"📡 Enviando dados para: {API_URL} (lotes de {chunk_size} registros{', gzip' if use_gzip else ''})")
+    own_session = session is None
+    if own_session:
+        session = new_session()
+    base_headers = {'Content-Type': 'application/json'}
+    if use_gzip:
+        base_headers['Content-Encoding'] = 'gzip'
+
+    sent_bytes = 0
+    raw_bytes = 0
+    sent_chunks = 0
+    start = time.monotonic()
+    try:
+        for index, (records, chunk) in enumerate(BuslogStream(file_path, records_key).chunks(chunk_size), 1):
+            if index <= acked:
+                continue
+            raw = json.dumps(chunk, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            body = gzip.compress(raw, compresslevel=6) if use_gzip else raw
+
+            response = post_authenticated(session, body, base_headers, auth, timeout, say)
+            if not 200 <= response.status_code < 300:
+                say(f"❌ Lote {index}: Status {response.status_code} - {response.text[:500] or '(vazia)'}")
+                say(f"   {acked} lote(s) confirmados; rode de novo para continuar do lote {acked + 1}")
+                return False
+
+            acked = index
+            save_progress(file_path, chunk_size, acked)
+            sent_chunks += 1
+            sent_bytes += len(body)
+            raw_bytes += len(raw)
+            say(f"✅ Lote {index}: {len(records)} registros, {len(raw) / 1024:.0f} KB"
+                + (f" -> {len(body) / 1024:.0f} KB gzip" if use_gzip else "")
+                + f" (status {response.status_code}, header '{auth.name}')")
+    except ValueError as e:
+        say(f"❌ ERRO: Arquivo JSON inválido: {e}")
+        return False
+    except requests.exceptions.RequestException as e:
+        say(f"❌ ERRO de conexão no lote {acked + 1}: {e}")
+        say(f"   {acked} lote(s) confirmados; rode de novo para continuar do lote {acked + 1}")
+        return False
+    finally:
+        if own_session:
+            session.close()
+
+    if os.path.exists(progress_path(file_path)):
+        os.remove(progress_path(file_path))
+    elapsed = time.monotonic() - start
+    say(f"📊 {sent_chunks} lote(s) enviados em {elapsed:.1f}s: {raw_bytes / 1024:.0f} KB de JSON"
+        + (f", {sent_bytes / 1024:.0f} KB no fio" if use_gzip else ""))
+    return True
+
+
+def resolve_files(paths):
+    """
+    Arquivos a enviar: cada item pode ser um arquivo, um diretório (todos os
+    *.json dele) ou um padrão glob (ex: 'buslogs/2024-05-*.json', útil no
+    Windows, onde o shell não expande)
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(path, '*.json')))
+        elif glob.has_magic(path):
+            matches = sorted(glob.glob(path))
+        else:
+            matches = [path]
+        for match in matches:
+            if match not in files:
+                files.append(match)
+    return files
+
+
+def push_file(session, file_path, auth, timeout, stream_options=None):
+    """
+    Envia um arquivo do modo diretório e retorna o resultado para o
+    relatório. Com stream_options, envia em lotes (stream_to_api); sem,
+    num único POST como o modo padrão.
+    """
+    name = os.path.basename(file_path)
+    say = lambda message: print(f"[{name}] {message}")
+    result = {'arquivo': file_path, 'ok': False, 'status': None, 'bytes': 0, 'segundos': 0.0, 'erro': None}
+    start = time.monotonic()
+    try:
+        result['bytes'] = os.path.getsize(file_path)
+        if stream_options is not None:
+            result['ok'] = stream_to_api(file_path, auth, session=session, say=say, timeout=timeout, **stream_options)
+            if not result['ok']:
+                result['erro'] = f"interrompido; progresso em {progress_path(file_path)}"
+        else:
+            with open(file_path, 'rb') as f:
+                body = f.read()
+            json.loads(body)
+            response = post_authenticated(session, body, {'Content-Type': 'application/json'}, auth, timeout, say)
+            result['status'] = response.status_code
+            result['ok'] = 200 <= response.status_code < 300
+            if not result['ok']:
+                result['erro'] = response.text[:200] or f"Status {response.status_code}"
+    except FileNotFoundError:
+        result['erro'] = "arquivo não encontrado"
+    except ValueError as e:
+        result['erro'] = f"JSON inválido: {e}"
+    except requests.exceptions.RequestException as e:
+        result['erro'] = str(e)
+    result['segundos'] = round(time.monotonic() - start, 2)
+    say(("✅ Enviado" if result['ok'] else f"❌ Falhou: {result['erro']}") + f" ({result['segundos']:.1f}s)")
+    return result
+
+
+def push_many(files, auth, concurrency, timeout, stream_options=None, report_path=None):
+    """
+    Envia vários arquivos ao mesmo tempo (até concurrency) por uma sessão
+    com pool de conexões. Sem formato de header confirmado, o primeiro
+    arquivo vai sozinho para descobri-lo antes de abrir o paralelismo.
+    Imprime (e opcionalmente grava em JSON) o relatório por arquivo.
+    """
+    concurrency = max(1, concurrency)
+    session = new_session(concurrency)
+    results = []
+    start = time.monotonic()
+    pending = list(files)
+    try:
+        if auth.name is None and pending:
+            results.append(push_file(session, pending.pop(0), auth, timeout, stream_options))
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(push_file, session, f, auth, timeout, stream_options) for f in pending]
+            for future in as_completed(futures):
+                results.append(future.result())
+    finally:
+        session.close()
+    elapsed = time.monotonic() - start
+
+    order = {f: i for i, f in enumerate(files)}
+    results.sort(key=lambda r: order[r['arquivo']])
+    ok = sum(1 for r in results if r['ok'])
+    total_bytes = sum(r['bytes'] for r in results if r['ok'])
+    print("\n📊 Relatório por arquivo:")
+    for r in results:
+        detail = f"status {r['status']}" if r['status'] is not None else ("lotes" if r['ok'] else "")
+        print(f"   {'✅' if r['ok'] else '❌'} {r['arquivo']}  {r['bytes'] / 1024:.0f} KB  {r['segundos']:.1f}s"
+              + (f"  {detail}" if detail else "") + (f"  - {r['erro']}" if r['erro'] else ""))
+    print(f"\n{ok}/{len(results)} arquivo(s) enviados em {elapsed:.1f}s "
+          f"({total_bytes / 1024 / max(elapsed, 0.001):.0f} KB/s, {concurrency} em paralelo)")
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({'arquivos': results, 'enviados': ok, 'total': len(results), 'segundos': round(elapsed, 2)},
+                      f, indent=2, ensure_ascii=False)
+        print(f"📄 Relatório gravado em {report_path}")
+    return ok == len(results)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Envia o buslog.json para a API de webhook")
+    parser.add_argument('arquivos', nargs='*',
+                        help="caminho do buslog.json; vários arquivos, diretórios ou padrões glob enviam em paralelo")
+    parser.add_argument('--stream', action='store_true',
+                        help="lê o arquivo aos poucos e envia em lotes gzip numa única conexão, com retomada")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"registros por lote no modo --stream (padrão: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument('--records-key', help="chave da lista de registros quando o arquivo é um objeto "
+                                              "(padrão: a primeira lista encontrada)")
+    parser.add_argument('--no-gzip', action='store_true', help="envia os lotes sem compressão")
+    parser.add_argument('--restart', action='store_true', help="ignora o progresso salvo e envia desde o primeiro lote")
+    parser.add_argument('--timeout', type=float, default=30, help="timeout de cada requisição em segundos (padrão: 30)")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"modo diretório: arquivos enviados ao mesmo tempo (padrão: {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--report', help="modo diretório: grava o relatório por arquivo neste JSON")
+    return parser.parse_args()
+
+
 def main():
     """
     Função principal
     """
+    args = parse_args()
     print("=" * 60)
     print("  AQUANIMAL - Enviar Buslog para API Webhook")
     print("=" * 60)
     
+    # Vários arquivos, diretório ou glob: modo diretório
+    if len(args.arquivos) > 1 or any(os.path.isdir(p) or glob.has_magic(p) for p in args.arquivos):
+        files = resolve_files(args.arquivos)
+        if not files:
+            print("\n❌ Nenhum arquivo .json encontrado em: " + ", ".join(args.arquivos))
+            sys.exit(1)
+        print(f"\n[STEP 1] Obtendo token da variável de ambiente...")
+        auth = AuthState(get_token_from_env())
+        print(f"\n[STEP 2] Enviando {len(files)} arquivo(s), até {args.concurrency} em paralelo...")
+        stream_options = None
+        if args.stream:
+            stream_options = dict(chunk_size=max(1, args.chunk_size), records_key=args.records_key,
+                                  use_gzip=not args.no_gzip, restart=args.restart)
+        success = push_many(files, auth, args.concurrency, args.timeout, stream_options, args.report)
+        print("=" * 60)
+        print("✅ Concluído com sucesso!" if success else "❌ Falha ao enviar um ou mais arquivos")
+        sys.exit(0 if success else 1)
+    
     # Determinar caminho do arquivo JSON
-    if len(sys.argv) > 1:
-        json_file_path = sys.argv[1]
+    if args.arquivos:
+        json_file_path = args.arquivos[0]
     else:
         # Tentar encontrar buslog.json no diretório atual
         json_file_path = "buslog.json"
@@ -224,6 +719,19 @@ def main():
     
     json_file_path = str(json_file_path)
     
+    if args.stream:
+        if not os.path.exists(json_file_path):
+            print(f"❌ ERRO: Arquivo não encontrado: {json_file_path}")
+            sys.exit(1)
+        print(f"\n[STEP 1] Obtendo token da variável de ambiente...")
+        auth = AuthState(get_token_from_env())
+        print(f"\n[STEP 2] Enviando {json_file_path} em lotes...")
+        success = stream_to_api(json_file_path, auth, max(1, args.chunk_size), args.records_key,
+                                not args.no_gzip, args.restart, args.timeout)
+        print("=" * 60)
+        print("✅ Concluído com sucesso!" if success else "❌ Falha ao enviar dados para a API")
+        sys.exit(0 if success else 1)
+    
     # 1. Ler arquivo JSON
     print(f"\n[STEP 1] Lendo arquivo JSON...")
     json_data = read_json_file(json_file_path)
@@ -234,7 +742,7 @@ def main():
     
     # 3. Enviar para a API
     print(f"\n[STEP 3] Enviando dados para a API...")
-    success = send_to_api(json_data, token)
+    success = send_to_api(json_data, AuthState(token))
     
     print("=" * 60)
     
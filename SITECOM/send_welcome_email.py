@@ -2,24 +2,58 @@
 """
 Script para enviar email de boas-vindas via AWS SES
 Uso: python3 send_welcome_email.py email@example.com
+     python3 send_welcome_email.py --file destinatarios.txt [--concurrency 8] [--rate 14]
+     cat destinatarios.txt | python3 send_welcome_email.py --file -
 """
 
+import os
+import re
 import sys
-import boto3
-from botocore.exceptions import ClientError
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
-def send_welcome_email(recipient_email):
+def dispatcher_dir():
     """
-    Envia email de boas-vindas para usuário com problemas no cadastro
+    Diretório do Dispatcher, de onde vem o governor de envio: DISPATCHER_DIR,
+    o SLCOM/Dispatcher do repositório ou o ~/Dispatcher2 do deploy no bastion
     """
-    # Configuração
-    SENDER = "aquanimal@aquanimal.com.br"
-    SUBJECT = "Seu cadastro Aquanimal"
-    REGION = "us-east-1"
-    
-    # Corpo do email em HTML
-    BODY_HTML = f"""
+    if os.getenv('DISPATCHER_DIR'):
+        return os.getenv('DISPATCHER_DIR')
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'SLCOM', 'Dispatcher')
+    return repo if os.path.isdir(repo) else os.path.expanduser('~/Dispatcher2')
+
+
+sys.path.insert(0, dispatcher_dir())
+from modules.SendGovernor import SendGovernor, THROTTLE_ERRORS
+
+
+# Configuração
+SENDER = "aquanimal@aquanimal.com.br"
+SUBJECT = "Seu cadastro Aquanimal"
+REGION = os.getenv('AWS_REGION', "us-east-1")
+BCC = "pedrosa.leonardo@gmail.com"
+# Endpoint alternativo do SES, ex: stub local (SLCOM/Dispatcher/bench/ses_stub.py)
+ENDPOINT_URL = os.getenv('SES_ENDPOINT_URL')
+
+# Modo em lote: envios simultâneos e envios/s se a cota da conta não puder ser lida
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 14.0
+# Fração da cota de 24h do SES deixada para os emails de pedido; segundos entre leituras da cota
+DEFAULT_QUOTA_RESERVE = 0.1
+QUOTA_REFRESH = 60
+QUOTA_RESERVED = "Cota diária do SES reservada"
+# O boas-vindas tem peso 0 e os outros emails 1: a reserva da cota fica para eles
+WELCOME_WEIGHT = 0
+# Throttling do SES: novas tentativas com espera dobrando a partir de 1s
+THROTTLE_RETRIES = 5
+
+EMAIL_PATTERN = re.compile(r"^[^@\s<>,;]+@[^@\s<>,;]+\.[^@\s<>,;.]{2,}$")
+
+# Corpo do email em HTML
+BODY_HTML = f"""
     <html>
     <head></head>
     <body>
@@ -39,9 +73,9 @@ def send_welcome_email(recipient_email):
     </body>
     </html>
     """
-    
-    # Corpo do email em texto plano (fallback)
-    BODY_TEXT = f"""
+
+# Corpo do email em texto plano (fallback)
+BODY_TEXT = f"""
 Olá!
 
 Tivemos um problema técnico hoje e alguns cadastros não foram concluídos com sucesso.
@@ -60,10 +94,74 @@ aquanimal.com.br
 ---
 Este é um email automático. Por favor, não responda.
     """
-    
+
+
+def create_client(max_connections=10):
+    """
+    Cliente SES (um por execução: é thread-safe e reaproveita as conexões)
+    """
+    import boto3
+    from botocore.config import Config
+    return boto3.client('ses', region_name=REGION, endpoint_url=ENDPOINT_URL,
+                        config=Config(max_pool_connections=max_connections))
+
+
+def ses_send(client, recipient_email, bcc=True):
+    """
+    Uma chamada send_email com a mensagem de boas-vindas; retorna a resposta do SES
+    """
+    return client.send_email(
+        Source=SENDER,
+        Destination={
+            'ToAddresses': [recipient_email],
+            'BccAddresses': [BCC] if bcc else []
+        },
+        Message={
+            'Subject': {
+                'Data': SUBJECT,
+                'Charset': 'UTF-8'
+            },
+            'Body': {
+                'Text': {
+                    'Data': BODY_TEXT,
+                    'Charset': 'UTF-8'
+                },
+                'Html': {
+                    'Data': BODY_HTML,
+                    'Charset': 'UTF-8'
+                }
+            }
+        }
+    )
+
+
+def create_governor(client, concurrency, rate, reserve):
+    """
+    Governor do Dispatcher para o boas-vindas: taxa da conta (limitada a
+    rate/s se rate > 0) e parada na reserva da cota do dia
+    """
+    governor = SendGovernor(rate or DEFAULT_RATE, reserve, WELCOME_WEIGHT + 1, QUOTA_REFRESH, rate)
+    governor.attach(client, concurrency)
+    return governor
+
+
+def send_welcome_email(recipient_email, client=None, governor=None, reserve=DEFAULT_QUOTA_RESERVE):
+    """
+    Envia email de boas-vindas para usuário com problemas no cadastro
+    """
     # Criar cliente SES
-    client = boto3.client('ses', region_name=REGION)
+    if client is None:
+        client = create_client()
+    if governor is None:
+        governor = create_governor(client, 1, 0, reserve)
     
+    # Destinatário + BCC: é o que o SES conta na cota
+    recipients = 2
+    if not governor.admits(WELCOME_WEIGHT, recipients):
+        print(f"⏸ Cota de 24h do SES na reserva de {reserve:.0%} ({describe(governor)}): email não enviado, tente quando a cota liberar")
+        return False
+    governor.acquire(recipients)
+    ok = False
     try:
         print(f"📧 Enviando email para: {recipient_email}")
         print(f"📤 Remetente: {SENDER}")
@@ -72,36 +170,15 @@ Este é um email automático. Por favor, não responda.
         print("-" * 50)
         
         # Enviar email
-        response = client.send_email(
-            Source=SENDER,
-            Destination={
-                'ToAddresses': [recipient_email],
-                'BccAddresses': ['pedrosa.leonardo@gmail.com']
-            },
-            Message={
-                'Subject': {
-                    'Data': SUBJECT,
-                    'Charset': 'UTF-8'
-                },
-                'Body': {
-                    'Text': {
-                        'Data': BODY_TEXT,
-                        'Charset': 'UTF-8'
-                    },
-                    'Html': {
-                        'Data': BODY_HTML,
-                        'Charset': 'UTF-8'
-                    }
-                }
-            }
-        )
+        response = ses_send(client, recipient_email)
+        ok = True
         
         print(f"✅ Email enviado com sucesso!")
         print(f"📬 MessageId: {response['MessageId']}")
         print(f"🆔 RequestId: {response['ResponseMetadata']['RequestId']}")
         return True
         
-    except ClientError as e:
+    except client.exceptions.ClientError as e:
         error_code = e.response['Error']['Code']
         error_message = e.response['Error']['Message']
         
@@ -124,6 +201,206 @@ Este é um email automático. Por favor, não responda.
         print(f"❌ ERRO inesperado: {str(e)}")
         return False
 
+    finally:
+        governor.release(recipients, ok)
+
+
+def describe(governor):
+    """Resumo da taxa e da cota lidas pelo governor, para o cabeçalho do lote"""
+    remaining = governor.remaining()
+    quota = f"cota 24h: {remaining:g} de {governor.max24:g} restantes" if remaining is not None else "cota 24h: sem limite"
+    return f"até {governor.ceiling:g}/s | {quota}"
+
+
+def normalize_email(raw):
+    """'Nome <Fulano@Exemplo.com>' ou 'fulano@exemplo.com,Nome' -> 'fulano@exemplo.com'"""
+    email = raw.strip()
+    if email.endswith(">") and "<" in email:
+        email = email[email.rindex("<") + 1:-1]
+    else:
+        email = re.split(r"[,;\t]", email, 1)[0]
+    return email.strip().lower()
+
+
+def read_recipients(source):
+    """
+    Lê os destinatários (um por linha; '#' comenta; CSV usa a primeira coluna)
+    de um arquivo ou de stdin ('-'). Retorna (válidos sem repetição, na ordem
+    do arquivo; inválidos; quantidade de repetidos)
+    """
+    stream = sys.stdin if source == '-' else open(source, encoding='utf-8-sig')
+    valid, invalid, seen, duplicates = [], [], set(), 0
+    try:
+        for line in stream:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            email = normalize_email(line)
+            if not EMAIL_PATTERN.match(email):
+                invalid.append(line)
+            elif email in seen:
+                duplicates += 1
+            else:
+                seen.add(email)
+                valid.append(email)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return valid, invalid, duplicates
+
+
+class Checkpoint:
+    """
+    Arquivo (um endereço por linha, só acrescentado) com os emails já aceitos
+    pelo SES; numa nova execução eles são pulados. Cada linha é gravada logo
+    após o envio, então uma execução interrompida retoma de onde parou
+    """
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = {line.split('\t', 1)[0].strip() for line in f if line.strip()}
+        self.file = open(path, 'a', encoding='utf-8')
+        self.lock = threading.Lock()
+
+    def record(self, email, message_id):
+        with self.lock:
+            self.file.write(f"{email}\t{message_id}\n")
+            self.file.flush()
+            self.done.add(email)
+
+    def close(self):
+        self.file.close()
+
+
+def send_with_retry(client, governor, email, bcc, stop):
+    """
+    Envia um email respeitando a taxa e a cota do governor; Throttling que
+    sobra das tentativas do boto3 espera e tenta de novo. Retorna
+    (MessageId, None), (None, 'Código: mensagem') ou (None, QUOTA_RESERVED)
+    """
+    recipients = 2 if bcc else 1
+    delay = 1.0
+    for attempt in range(THROTTLE_RETRIES + 1):
+        if stop.is_set():
+            return None, "Interrompido"
+        if not governor.admits(WELCOME_WEIGHT, recipients):
+            stop.set()
+            return None, QUOTA_RESERVED
+        governor.acquire(recipients)
+        ok = False
+        try:
+            message_id = ses_send(client, email, bcc)['MessageId']
+            ok = True
+            return message_id, None
+        except client.exceptions.ClientError as e:
+            code = e.response['Error']['Code']
+            if code not in THROTTLE_ERRORS or attempt == THROTTLE_RETRIES:
+                return None, f"{code}: {e.response['Error']['Message']}"
+        except Exception as e:
+            return None, str(e)
+        finally:
+            governor.release(recipients, ok)
+        time.sleep(delay)
+        delay *= 2
+
+
+def send_bulk(source, concurrency, rate, checkpoint_path, bcc, dry_run, reserve):
+    """
+    Envia o email de boas-vindas para todos os destinatários de source com
+    até concurrency envios simultâneos num único cliente SES, na taxa da
+    conta (limitada a rate/s se rate > 0) e parando na reserva da cota do dia.
+    Retorna True se todos foram enviados
+    """
+    recipients, invalid, duplicates = read_recipients(source)
+    checkpoint = Checkpoint(checkpoint_path)
+    pending = [email for email in recipients if email not in checkpoint.done]
+    skipped = len(recipients) - len(pending)
+
+    print(f"📋 Destinatários: {len(recipients)} válidos, {duplicates} repetidos, {len(invalid)} inválidos")
+    for line in invalid[:20]:
+        print(f"   ⚠ inválido: {line}")
+    if len(invalid) > 20:
+        print(f"   ... e mais {len(invalid) - 20}")
+    print(f"↻ Já enviados (checkpoint {checkpoint_path}): {skipped}")
+    if dry_run or not pending:
+        print(f"📤 A enviar: {len(pending)}")
+        checkpoint.close()
+        return True
+
+    client = create_client(concurrency)
+    governor = create_governor(client, concurrency, rate, reserve)
+    print(f"📤 A enviar: {len(pending)} | até {concurrency} simultâneos | {describe(governor)} | BCC: {'sim' if bcc else 'não'}")
+    print(f"🌎 Região: {REGION}")
+    print("-" * 50)
+
+    stop = threading.Event()
+    sent, failures, deferred, quota_reached = 0, [], 0, False
+    started = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    futures = {}
+    try:
+        futures = {pool.submit(send_with_retry, client, governor, email, bcc, stop): email for email in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            email = futures[future]
+            message_id, error = future.result()
+            if message_id:
+                checkpoint.record(email, message_id)
+                sent += 1
+            elif error in (QUOTA_RESERVED, "Interrompido"):
+                deferred += 1
+                quota_reached = quota_reached or error == QUOTA_RESERVED
+            else:
+                failures.append((email, error))
+                print(f"❌ {email}: {error}")
+            if done % 500 == 0:
+                elapsed = time.monotonic() - started
+                print(f"   {done}/{len(pending)} processados ({done / elapsed:.1f}/s)")
+    except KeyboardInterrupt:
+        print("\n⚠ Interrompido: os envios já feitos estão no checkpoint, rode de novo para continuar")
+        stop.set()
+        for future in futures:
+            future.cancel()
+    finally:
+        pool.shutdown(wait=True)
+        checkpoint.close()
+    elapsed = time.monotonic() - started
+
+    print("=" * 50)
+    if quota_reached:
+        print(f"⏸ Cota de 24h do SES na reserva de {reserve:.0%}: {deferred} ficaram para depois, rode de novo quando a cota liberar")
+    print(f"📊 Enviados: {sent} | Falhas: {len(failures)} | Não enviados: {deferred} | Pulados (checkpoint): {skipped}"
+          f" | Repetidos: {duplicates} | Inválidos: {len(invalid)}")
+    print(f"📊 Tempo: {elapsed:.1f}s | Vazão: {sent / elapsed if elapsed > 0 else 0:.1f} emails/s")
+    return not failures and not deferred
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Envia o email de boas-vindas da Aquanimal via AWS SES")
+    parser.add_argument('email', nargs='?', help="destinatário único")
+    parser.add_argument('--file', help="arquivo com um destinatário por linha ('-' lê de stdin)")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"envios simultâneos no modo em lote (padrão {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--rate', type=float, default=0,
+                        help=f"limita os envios por segundo abaixo do limite da conta SES, que é o padrão "
+                             f"({DEFAULT_RATE:g} se a conta não puder ser consultada)")
+    parser.add_argument('--quota-reserve', type=float, default=DEFAULT_QUOTA_RESERVE,
+                        help=f"fração da cota de 24h que fica para os outros emails; o envio para ao chegar nela (padrão {DEFAULT_QUOTA_RESERVE:g})")
+    parser.add_argument('--checkpoint', help="arquivo dos endereços já enviados (padrão <arquivo>.sent)")
+    parser.add_argument('--bcc', action='store_true',
+                        help="no modo em lote, manda também a cópia oculta para o administrador")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="só lê, valida e conta os destinatários, sem enviar")
+    args = parser.parse_args(argv)
+    if bool(args.email) == bool(args.file):
+        parser.error("informe um email ou --file")
+    if args.concurrency < 1:
+        parser.error("--concurrency deve ser >= 1")
+    if args.file and not args.checkpoint:
+        args.checkpoint = "welcome_email.sent" if args.file == '-' else f"{args.file}.sent"
+    return args
+
 
 def main():
     """
@@ -133,18 +410,16 @@ def main():
     print("  AQUANIMAL - Email de Boas-Vindas")
     print("=" * 50)
     
-    # Validar argumentos
-    if len(sys.argv) != 2:
-        print("\n❌ Uso incorreto!\n")
-        print("Uso correto:")
-        print(f"  python3 {sys.argv[0]} email@example.com\n")
-        print("Exemplos:")
-        print(f"  python3 {sys.argv[0]} joao@gmail.com")
-        print(f"  python3 {sys.argv[0]} maria.silva@hotmail.com")
-        print()
-        sys.exit(1)
+    args = parse_args(sys.argv[1:])
+    
+    if args.file:
+        success = send_bulk(args.file, args.concurrency, args.rate, args.checkpoint, args.bcc, args.dry_run,
+                            args.quota_reserve)
+        print("=" * 50)
+        print("✅ Concluído com sucesso!" if success else "❌ Nem todos foram enviados; rode de novo para enviar só o que faltou")
+        sys.exit(0 if success else 1)
     
-    recipient_email = sys.argv[1].strip()
+    recipient_email = args.email.strip()
     
     # Validação básica de email
     if '@' not in recipient_email or '.' not in recipient_email:
@@ -153,7 +428,9 @@ def main():
         sys.exit(1)
     
     # Enviar email
-    success = send_welcome_email(recipient_email)
+    client = create_client()
+    success = send_welcome_email(recipient_email, client, create_governor(client, 1, args.rate, args.quota_reserve),
+                                 args.quota_reserve)
     
     print("=" * 50)
     
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Testes do governor do send_welcome_email.py, sem AWS.
+Uso: python3 -m unittest test_send_welcome_email
+"""
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+import send_welcome_email
+
+class ClientError(Exception):
+    pass
+
+
+class FakeClient:
+    """O mínimo do client do SES que o governor e o envio usam"""
+    exceptions = SimpleNamespace(ClientError=ClientError)
+
+    def __init__(self, max_send_rate, max24=-1, sent24=0):
+        self.quota = {'MaxSendRate': max_send_rate, 'Max24HourSend': max24, 'SentLast24Hours': sent24}
+        self.meta = SimpleNamespace(events=SimpleNamespace(register=lambda *args, **kwargs: None))
+        self.sent = []
+
+    def get_send_quota(self):
+        return dict(self.quota)
+
+    def send_email(self, **kwargs):
+        self.sent.append(kwargs['Destination']['ToAddresses'][0])
+        return {'MessageId': f"msg-{len(self.sent)}", 'ResponseMetadata': {'RequestId': 'req'}}
+
+
+def bulk_governor(client, concurrency=1, rate=0, reserve=send_welcome_email.DEFAULT_QUOTA_RESERVE):
+    return send_welcome_email.create_governor(client, concurrency, rate, reserve)
+
+
+def acquire_within(governor, recipients, seconds):
+    """acquire(recipients) numa thread; retorna quanto levou ou None se não terminou em seconds"""
+    elapsed = []
+    def run():
+        start = time.monotonic()
+        governor.acquire(recipients)
+        elapsed.append(time.monotonic() - start)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    return elapsed[0] if elapsed else None
+
+
+class SendGovernorTest(unittest.TestCase):
+    def test_rate_below_recipients_does_not_hang(self):
+        # Sandbox do SES: 1 envio/s, e o --bcc conta 2 destinatários por email
+        governor = bulk_governor(FakeClient(1))
+        elapsed = acquire_within(governor, 2, 5)
+        self.assertIsNotNone(elapsed, "acquire(2) com taxa de 1/s não terminou")
+        self.assertGreaterEqual(elapsed, 0.9)
+
+    def test_rate_reduced_below_recipients_by_throttling(self):
+        governor = bulk_governor(FakeClient(2))
+        throttled = {'Error': {'Code': 'Throttling', 'Message': "Maximum sending rate exceeded."}}
+        governor.onAttempt(response=(None, throttled))
+        self.assertLess(governor.rate, 2)
+        self.assertIsNotNone(acquire_within(governor, 2, 5), "acquire(2) após o throttling não terminou")
+
+    def test_rate_option_caps_account_rate(self):
+        self.assertEqual(bulk_governor(FakeClient(50), rate=10).ceiling, 10)
+        self.assertEqual(bulk_governor(FakeClient(50)).ceiling, 50)
+
+    def test_stops_at_quota_reserve(self):
+        # 100 restantes de 1000, reserva de 10%: o boas-vindas para nos 100
+        governor = bulk_governor(FakeClient(1000, max24=1000, sent24=800))
+        sent = 0
+        while governor.admits(send_welcome_email.WELCOME_WEIGHT, 2):
+            governor.acquire(2)
+            governor.release(2, True)
+            sent += 2
+        self.assertEqual(sent, 100)
+
+    def test_single_email_goes_through_governor(self):
+        client = FakeClient(14, max24=1000, sent24=0)
+        governor = bulk_governor(client)
+        self.assertTrue(send_welcome_email.send_welcome_email("cliente@example.com", client, governor))
+        self.assertEqual(client.sent, ["cliente@example.com"])
+        # Destinatário + BCC contam na cota
+        self.assertEqual(governor.sentSinceRefresh, 2)
+
+    def test_single_email_stops_at_quota_reserve(self):
+        client = FakeClient(14, max24=1000, sent24=900)
+        self.assertFalse(send_welcome_email.send_welcome_email("cliente@example.com", client, bulk_governor(client)))
+        self.assertEqual(client.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,270 +1,339 @@
-import pyodbc
-import os
+import sys,os
 import modules.Constants
-from email.message import EmailMessage
-from modules.DataTypes import ReceiptInfo
-from types import SimpleNamespace
-from string import Template
-import json
-import ssl
-import boto3
-from botocore.exceptions import ClientError
-
-# Obter variáveis de ambiente
-DB_SERVER = os.getenv('AA_DBSERVER')
-DB_DATABASE = os.getenv('AA_DB_DATABASE')
-DB_UID = os.getenv('AA_DB_UID')
-DB_PWD = os.getenv('AA_DB_PWD')
-DB_PORT = os.getenv('AA_DB_PORT')
+import modules.Db
+from modules.DataTypes import decodeTrxInfo
+from modules.TrxQueue import claimBatches, defaultWorkerId, GroupCommit, hasClaimable, pendingStats, trxDead, trxDeferMany, trxReconcileMany, trxSuppressed
+from modules.SendLedger import SendLedger
+from modules.Suppression import SuppressionList
+from modules.SesSender import SesSender, SendJob, SendResult
+from modules.SendGovernor import SendGovernor
+from modules.SenderPool import SenderPool, parseEndpoints, ENDPOINT_MAX_RETRIES
+from modules.EmailRegistry import COALESCE_CODES, HANDLERS, PRIORITY_ORDER, TEMPLATES, getHandler, renderCombined
+from modules.Coalesce import planCoalesced, pullSiblings
+from modules.Daemon import PollLoop
+from modules.Retry import RetryPolicy
+from modules.Scheduler import PriorityScheduler
+from modules.Metrics import METRICS
 
+# Obter variáveis de ambiente (as do banco, AA_DB*, ficam em modules/Db.py)
 AWS_REGION = os.getenv('AWS_REGION')
 SES_FROM_EMAIL = os.getenv('SES_FROM_EMAIL', 'aquanimal@aquanimal.com.br')
 SES_CC_EMAIL = os.getenv('SES_CC_EMAIL', 'aquanimal@aquanimal.com.br')
 SES_BCC_EMAIL = os.getenv('SES_BCC_EMAIL', 'pedrosa.leonardo@gmail.com')
+# Envios simultâneos e limite de envios/s da conta SES (0 = sem limite)
+SES_CONCURRENCY = int(os.getenv('SES_CONCURRENCY', '8'))
+SES_MAX_SEND_RATE = float(os.getenv('SES_MAX_SEND_RATE', '14'))
+# Endpoint alternativo do SES, ex: stub local (bench/ses_stub.py)
+SES_ENDPOINT_URL = os.getenv('SES_ENDPOINT_URL')
+# Pool de endpoints 'região|identidade[|url], ...' (vazio: só AWS_REGION/SES_FROM_EMAIL).
+# Um endpoint sai do pool após SES_FAILOVER_AFTER erros seguidos e é verificado
+# (GetSendQuota) a cada SES_HEALTH_INTERVAL segundos
+SES_ENDPOINTS = os.getenv('SES_ENDPOINTS', '')
+SES_FAILOVER_AFTER = int(os.getenv('SES_FAILOVER_AFTER', '5'))
+SES_HEALTH_INTERVAL = float(os.getenv('SES_HEALTH_INTERVAL', '30'))
+# Governor: taxa e cota lidas da conta (GetSendQuota) e ajustadas ao throttling;
+# SES_MAX_SEND_RATE passa a ser só a taxa usada se a cota não puder ser lida
+SES_GOVERNOR = os.getenv('SES_GOVERNOR', '1') == '1'
+SES_QUOTA_REFRESH = float(os.getenv('SES_QUOTA_REFRESH', '60'))
+# Fração da cota de 24h reservada aos emails de pedido e reset de senha; abaixo
+# dela os avisos são adiados por SES_QUOTA_DEFER_SECONDS
+SES_QUOTA_RESERVE = float(os.getenv('SES_QUOTA_RESERVE', '0.1'))
+SES_QUOTA_DEFER_SECONDS = int(os.getenv('SES_QUOTA_DEFER_SECONDS', '900'))
 
-# Construir connection string
-cnxn_str = f"Driver={{ODBC Driver 17 for SQL Server}};PORT={DB_PORT};Server={DB_SERVER};Database={DB_DATABASE};UID={DB_UID};PWD={DB_PWD};"
-conn = pyodbc.connect(cnxn_str, autocommit=False)
+# Claim/lease: cada worker reserva lotes de linhas, então várias cópias podem rodar em paralelo
+WORKER_ID = os.getenv('EMAILJOB_WORKER_ID', defaultWorkerId())
+BATCH_SIZE = int(os.getenv('EMAILJOB_BATCH_SIZE', '100'))
+LEASE_SECONDS = int(os.getenv('EMAILJOB_LEASE_SECONDS', '300'))
+# Claim por prioridade (peso e meta de espera de cada TRX_CODE em modules/EmailRegistry.py);
+# 0 volta ao claim único em ordem de TRX_ID
+PRIORITY_ENABLED = os.getenv('EMAILJOB_PRIORITY', '1') == '1'
+# Group commit: grava os PROCESSED a cada N emails ou T ms (1 = commit por email)
+COMMIT_EVERY = int(os.getenv('EMAILJOB_COMMIT_EVERY', '1'))
+COMMIT_INTERVAL_MS = int(os.getenv('EMAILJOB_COMMIT_INTERVAL_MS', '1000'))
+# Novas tentativas: backoff exponencial com jitter e DEAD após MAX_ATTEMPTS
+MAX_ATTEMPTS = int(os.getenv('EMAILJOB_MAX_ATTEMPTS', '8'))
+RETRY_BASE_MS = int(os.getenv('EMAILJOB_RETRY_BASE_MS', '2000'))
+RETRY_MAX_MS = int(os.getenv('EMAILJOB_RETRY_MAX_MS', '3600000'))
+# Envio bulk (SendBulkTemplatedEmail) para grupos de pelo menos BULK_MIN linhas do mesmo TRX_CODE
+BULK_ENABLED = os.getenv('EMAILJOB_BULK', '0') == '1'
+BULK_MIN = int(os.getenv('EMAILJOB_BULK_MIN', '2'))
+# Ledger local dos envios aceitos pelo SES e ainda sem PROCESSED no banco (vazio desliga).
+# Fica fora de ~/Dispatcher2, que o deploy apaga.
+LEDGER_PATH = os.getenv('EMAILJOB_LEDGER_PATH', os.path.expanduser('~/.slcom/emailjob_ledger.db'))
+# Lista de supressão (bounce/reclamação): arquivo local e/ou tabela (vazio desliga cada fonte).
+# A tabela só depois de aplicar sql/004 (o deploy não roda os scripts SQL)
+SUPPRESSION_FILE = os.getenv('EMAILJOB_SUPPRESSION_FILE', '')
+SUPPRESSION_TABLE = os.getenv('EMAILJOB_SUPPRESSION_TABLE', '')
+SUPPRESSION_TTL = float(os.getenv('EMAILJOB_SUPPRESSION_TTL', '300'))
+# Coalescência: segundos que um evento de pedido espera na fila pelos outros do mesmo
+# pedido/destinatário, que saem num email só (0 desliga)
+COALESCE_WINDOW = int(os.getenv('EMAILJOB_COALESCE_WINDOW', '0'))
+# Modo daemon (python3 Emailjob.py --daemon)
+POLL_INTERVAL = float(os.getenv('EMAILJOB_POLL_INTERVAL', '10'))
 
-def trxSuccess(aTrxId):
-    iQuery = "UPDATE TRANSACTION_LOG SET TRX_STATUS = 'PROCESSED' WHERE TRX_ID = ?;"
-    iCursor = conn.cursor()
-    iCursor.execute(iQuery, int(aTrxId))
+# Conexão e client SES são criados sob demanda (connect() / getSender()):
+# importar o Emailjob não abre nada e um cron sem pendências não carrega o boto3
+conn = None
+statusBatch = None
+sender = None
+ledger = None
+suppression = SuppressionList(SUPPRESSION_FILE, SUPPRESSION_TABLE, SUPPRESSION_TTL) if SUPPRESSION_FILE or SUPPRESSION_TABLE else None
+retryPolicy = RetryPolicy(MAX_ATTEMPTS, RETRY_BASE_MS, RETRY_MAX_MS)
+scheduler = PriorityScheduler(HANDLERS.values(), BATCH_SIZE, COALESCE_CODES, COALESCE_WINDOW) if PRIORITY_ENABLED else None
 
-def send_mail2(to_email, subject, message, cci):
-    """Envia email usando AWS SES SDK (boto3)"""
-    ses_client = boto3.client('ses', region_name=AWS_REGION)
-    
-    to_addresses = [to_email]
-    cc_addresses = [SES_CC_EMAIL] if cci == 1 else []
-    bcc_addresses = [SES_BCC_EMAIL] if SES_BCC_EMAIL else []
-    
-    print(f"Enviando email para {to_email}")
-    
-    try:
-        response = ses_client.send_email(
-            Source=SES_FROM_EMAIL,
-            Destination={
-                'ToAddresses': to_addresses,
-                'CcAddresses': cc_addresses,
-                'BccAddresses': bcc_addresses
-            },
-            Message={
-                'Subject': {'Data': subject, 'Charset': 'UTF-8'},
-                'Body': {'Html': {'Data': message, 'Charset': 'UTF-8'}}
-            }
-        )
-        print(f"✅ Email enviado! MessageId: {response['MessageId']}")
-        return True
-    except ClientError as e:
-        print(f"❌ Error sending email: {e.response['Error']['Message']}")
-        return False
-    except Exception as e:
-        print(f"❌ Error sending email: {e}")
-        return False
+def connect():
+    """Abre a conexão (uma vez por processo), o ledger e o group commit que os usa"""
+    global conn, statusBatch, ledger
+    if conn is None:
+        conn = modules.Db.connect()
+        if LEDGER_PATH:
+            ledger = SendLedger(LEDGER_PATH)
+        statusBatch = GroupCommit(conn, WORKER_ID, COMMIT_EVERY, COMMIT_INTERVAL_MS,
+                                  ledger.reconciled if ledger is not None else None)
+    return conn
 
-def send_mail(to_email,
-               subject,
-               message):
-    send_mail2(to_email, subject, message, 0)
+def reconcileLedger():
+    """Grava PROCESSED dos envios que ficaram no ledger (ex: queda antes do commit)"""
+    if ledger is None:
+        return
+    ids = ledger.pending()
+    if ids:
+        trxReconcileMany(conn, ids)
+        conn.commit()
+        ledger.reconciled(ids)
+        print(f"Ledger: {len(ids)} Trx Ids já enviados marcados como PROCESSED")
 
-########################################################
-#RECEIPT_EMAIL - Sent e-mail for new NF in LION 
-########################################################
-selectQuery = """
-                select TRX_INFO,TRX_ID
-                from TRANSACTION_LOG 
-                WHERE TRX_CODE=? 
-                AND TRX_STATUS='PENDING';
-         """
-cursor = conn.cursor()
-cursor.execute(selectQuery, modules.Constants.RECEIPT_EMAIL)
-rs = cursor.fetchall()
+def newSesSender(aRegion, aFromEmail, aEndpointUrl, aMaxRetries=None):
+    governor = SendGovernor(SES_MAX_SEND_RATE, SES_QUOTA_RESERVE, PRIORITY_ORDER, SES_QUOTA_REFRESH) if SES_GOVERNOR else None
+    return SesSender(aRegion, aFromEmail, SES_CC_EMAIL, SES_BCC_EMAIL,
+                     SES_CONCURRENCY, SES_MAX_SEND_RATE, aEndpointUrl, governor, aMaxRetries)
 
-t = Template("""
-<html>
-<body>
-<img src="https://aquanimal.com.br/images/mailogo.jpg" style="width: 200px"><br>
-Ola $nome,
-<br><br>
-Uma nova Nota Fiscal foi gerada para você, seu pedido poderá ser enviado ainda hoje.
-<br>
-Nota Fiscal: $nf<br>
-Chave de Acesso: $key<br>
-<br>
-Agradecemos o seu pedido e esperamos atendê-lo novamente em breve.<br>
-Equipe Aquanimal.
-</body>
-</html>
-        """);
-print("Starting lion receipt email process")
-for r in rs:
-    receiptInfo = json.loads(r[0], object_hook=lambda d: SimpleNamespace(**d))
-    trxId = r[1]
-    send_mail(receiptInfo.email,"Nota Fiscal",t.substitute(nome=receiptInfo.socialName,
-                                                                      nf=receiptInfo.receiptNo,
-                                                                      key=receiptInfo.nfeKey))
-    print(f"Processing Lion Receipt Trx Id {trxId}")
-    trxSuccess(trxId)
-    conn.commit()
+def getSender():
+    """SesSender da região/identidade padrão, ou SenderPool com SES_ENDPOINTS"""
+    global sender
+    if sender is None:
+        if SES_ENDPOINTS:
+            sender = SenderPool([(region, newSesSender(region, fromEmail, url, ENDPOINT_MAX_RETRIES))
+                                 for region, fromEmail, url in parseEndpoints(SES_ENDPOINTS)],
+                                SES_FAILOVER_AFTER, SES_HEALTH_INTERVAL)
+        else:
+            sender = newSesSender(AWS_REGION, SES_FROM_EMAIL, SES_ENDPOINT_URL)
+    return sender
 
-########################################################
-### SITE NEW ORDER EMAIL
-########################################################
-selectQuery = """
-                select TRX_INFO,TRX_ID
-                from TRANSACTION_LOG
-                WHERE TRX_CODE=?
-                AND TRX_STATUS='PENDING';
-         """
-cursor = conn.cursor()
-cursor.execute(selectQuery, modules.Constants.SITE_0_EMAIL)
-rs = cursor.fetchall()
+def claimed():
+    if scheduler is not None:
+        return scheduler.batches(conn, WORKER_ID, LEASE_SECONDS)
+    return claimBatches(conn, list(HANDLERS.keys()), WORKER_ID, BATCH_SIZE, LEASE_SECONDS, COALESCE_CODES, COALESCE_WINDOW)
 
-t = Template("""
-<html><body><img src="https://aquanimal.com.br/images/mailogo.jpg"><br><br><font face="Verdana,Arial" size=2><b>Pedido $ped - Recebido com Sucesso.</b><br><br>Prezado Cliente,<br><br>Gostaríamos de informar que sua compra já foi recebida com sucesso e será processada em breve.<br>Lembre-se que, de acordo com as instruções do -como comprar- em nosso site, o prazo para envio pode variar entre 5 a 15 dias. Itens mais populares e que tem uma boa saída são mantidos em estoque a pronta entrega e enviados mais rápido. Itens com menor giro trabalhamos com o estoque do fornecedor, por isso podem demorar mais tempo.<br>Animais de água doce normalmente tem alto estoque e são enviados em até uma semana, entretanto os marinhos ou doces que necessitam de cuidado especial como quarentena diferenciada para envio, podem demorar até 15 dias. O mesmo se aplica para os casos de cliente retira! Quanto ao envio, a sua encomenda será entregue no endereço cadastrado por você, e o prazo de transporte pode variar de acordo com a sua cidade, mas não se preocupe! Nossas embalagens seguem um protocolo de acordo com o tempo da viagem para que os animais cheguem em completa segurança. Logo após o envio do seu pedido você recebe um e-mail dizendo que ele foi despachado, e assim, pode se programar melhor para recebe-lo.<br><br><a href="https://aquanimal.com.br/Orders">Clique aqui acessar os dados de depósito ou para acompanhar o seu pedido.</a><br><br><br>Agradecemos por comprar conosco!<br>Aquanimal</font></body></html>
-        """);
-print("Starting site 0-email process")
-for r in rs:
-    receiptInfo = json.loads(r[0], object_hook=lambda d: SimpleNamespace(**d))
-    trxId = r[1]
-    send_mail2(receiptInfo.email,"Recebemos o seu pedido.",t.substitute(nome=receiptInfo.socialName,ped=receiptInfo.orderId),1)
-    print(f"Processing Site 0-mail Trx Id {trxId}")
-    trxSuccess(trxId)
-    conn.commit()
+def reportResults(aResults, aMeta, aContributors=None):
+    """
+    Atualiza a TRANSACTION_LOG pelo TRX_ID de cada resultado; os TRX_ID
+    coalescidos em aContributors seguem o resultado do envio que os levou
+    """
+    for result in aResults:
+        handler, attempts = aMeta[result.trxId]
+        others = aContributors.get(result.trxId, []) if aContributors else []
+        print(f"Processing {handler.label} Trx Id {result.trxId}")
+        if others:
+            print(f"Trx Ids {', '.join(str(i) for i in others)} coalescidos neste envio")
+        if result.ok:
+            print(f"✅ Email enviado! MessageId: {result.messageId}")
+            for trxId in [result.trxId] + others:
+                if ledger is not None:
+                    ledger.record(trxId, result.messageId)
+                METRICS.inc("dispatcher_emails_total", trx_code=aMeta[trxId][0].trxCode,
+                            result="sent" if trxId == result.trxId else "coalesced")
+                statusBatch.add(trxId)
+        else:
+            print(f"❌ Error sending email: {result.error}")
+            status = retryPolicy.fail(conn, WORKER_ID, result, attempts)
+            for trxId in others:
+                retryPolicy.fail(conn, WORKER_ID, SendResult(trxId, False, None, result.error, result.errorCode), aMeta[trxId][1])
+            with METRICS.timer("dispatcher_stage_seconds", stage="commit"):
+                conn.commit()
+            METRICS.inc("dispatcher_emails_total", trx_code=handler.trxCode, result=status.lower())
+    statusBatch.flushIfDue()
 
+def syncSesTemplates():
+    """Garante que os templates do SES usados no envio bulk estão iguais aos de templates/"""
+    for handler in HANDLERS.values():
+        getSender().ensureTemplate(handler.sesTemplateName(), handler.subject, handler.sesTemplateHtml())
 
+def sendItems(aItems):
+    """
+    Envia itens já decodificados [(TRX_ID, TRX_CODE, ATTEMPTS, trxInfo)]:
+    grupos grandes do mesmo TRX_CODE via bulk, o resto um a um. Com a
+    coalescência ligada, os eventos do mesmo pedido são reservados juntos e
+    combinados antes do envio. O que não cabe na cota do dia (governor)
+    volta para a fila sem contar tentativa.
+    """
+    if COALESCE_WINDOW > 0:
+        aItems = list(aItems) + pullSiblings(conn, aItems, WORKER_ID, LEASE_SECONDS)
+    # O lote anterior terminou: a cota que ele reservou já foi gasta ou devolvida
+    getSender().settle()
+    meta = {}
+    pending = []
+    deferred = []
+    for trxId, trxCode, attempts, trxInfo in aItems:
+        handler = getHandler(trxCode)
+        if ledger is not None and ledger.get(trxId) is not None:
+            # O SES já aceitou este email; falta só o PROCESSED
+            print(f"Trx Id {trxId} já enviado (MessageId {ledger.get(trxId)}), sem reenvio")
+            METRICS.inc("dispatcher_emails_total", trx_code=handler.trxCode, result="ledger")
+            statusBatch.add(trxId)
+            continue
+        if attempts is not None and attempts >= MAX_ATTEMPTS:
+            # Só chega aqui pelos leases vencidos, que o claim conta como tentativa
+            print(f"☠ Trx Id {trxId}: {attempts} tentativas sem concluir (lease vencido), marcado como DEAD")
+            METRICS.inc("dispatcher_emails_total", trx_code=handler.trxCode, result="dead")
+            trxDead(conn, trxId, WORKER_ID, f"Lease vencido em {attempts} tentativas")
+            conn.commit()
+            continue
+        if suppression is not None and suppression.isSuppressed(trxInfo.email):
+            print(f"Trx Id {trxId}: {trxInfo.email} está na lista de supressão, não enviado")
+            METRICS.inc("dispatcher_emails_total", trx_code=handler.trxCode, result="suppressed")
+            trxSuppressed(conn, trxId, WORKER_ID, "Destinatário na lista de supressão")
+            conn.commit()
+            continue
+        if not getSender().admits(handler.weight, getSender().recipients(handler.cci)):
+            METRICS.inc("dispatcher_emails_total", trx_code=handler.trxCode, result="deferred")
+            deferred.append(trxId)
+            continue
+        meta[trxId] = (handler, attempts)
+        pending.append((trxId, handler, trxInfo))
+    if deferred:
+        trxDeferMany(conn, deferred, WORKER_ID, SES_QUOTA_DEFER_SECONDS, "Cota diária do SES reservada")
+        conn.commit()
+        print(f"⚠ Cota diária do SES: {len(deferred)} emails adiados por {SES_QUOTA_DEFER_SECONDS}s")
 
-########################################################
-### SITE SENT ORDER EMAIL
-########################################################
-selectQuery = """
-                select TRX_INFO,TRX_ID
-                from TRANSACTION_LOG
-                WHERE TRX_CODE=?
-                AND TRX_STATUS='PENDING';
-         """
-cursor = conn.cursor()
-cursor.execute(selectQuery, modules.Constants.SITE_V_EMAIL)
-rs = cursor.fetchall()
+    combined = []
+    contributors = {}
+    if COALESCE_WINDOW > 0:
+        pending, combined, contributors = planCoalesced(pending)
+    groups = {}
+    for trxId, handler, trxInfo in pending:
+        groups.setdefault(handler, []).append((trxId, trxInfo))
 
-t = Template("""
-<html>
-<body>
-<img src="https://aquanimal.com.br/images/mailogo.jpg" style="width: 200px"><br>
-<font face="Verdana,Arial" size=2><br>
-Ol&aacute; $nome,<br><br>
-Informamos que seu pedido $ped foi enviado na data de hoje.<br><br>
-Escolhemos sempre a melhor maneira de envio para a sua cidade!<br><br>
-Para envios via <b>JADLOG</b> o rastreio poder&aacute; ser feito hoje ap&oacute;s as 20h, direto no site da transportadora www.jadlog.com.br, com seu CPF.<br><br>
-Para envios pela transportadora <b>BUSLOG</b>, voc&ecirc; receber&aacute; via whatsapp o <b>n&uacute;mero da encomenda</b> para rastreio direto no site https://envio.buslog.com.br/rastreamento - Voc&ecirc; tamb&eacute;m poder&aacute; usar o seu CPF.<br><br>
-Se voc&ecirc; reside na regi&atilde;o Norte, Nordeste ou algumas cidades do Centro Oeste ou escolheu Retira Aeroporto, a sua carga foi enviada via <b>GOLLOG</b>. No final do dia, voc&ecirc; receber&aacute; via whatsapp o <b>n&uacute;mero operacional</b> para rastreio direto no site - https://servicos.gollog.com.br/app/site/tracking<br><br>
-Cargas enviadas via <b>JADLOG</b> e <b>BUSLOG</b> ser&atilde;o entregues no endere&ccedil;o indicado, ou retirados na transportadora, conforme acordado com a Aquanimal.<br><br>
-Cargas enviadas via aeroporto, dever&atilde;o ser retiradas no <b>Galp&atilde;o da GOLLOG</b> no aeroporto escolhido por voc&ecirc;.<br><br>
-Caso o seu pedido seja apenas de produtos, enviamos via <b>CORREIOS</b> e voc&ecirc; poder&aacute; verificar em nosso site, atrav&eacute;s do link <b>Meus Pedidos</b> o c&oacute;digo de rastreamento do seu PAC.<br><br>
-Fazemos embalagem para que os peixes fiquem confort&aacute;veis durante a viagem, a maioria dos envios leva at&eacute; 3 dias, caso n&atilde;o ocorra neste prazo, por favor entre em contato, lembramos que as trasnportadoras n&atilde;o fazem entregas nos finais de semana nem feriados.<br><br>
-Abaixo, nossas instru&ccedil;&otilde;es de como receber os peixes novos no seu aqu&aacute;rio, tamb&eacute;m enviamos as mesmas instru&ccedil;&otilde;es em uma cartinha dentro da sua encomenda.<br><br>
-NUNCA COLOQUE A &Aacute;GUA DO AQU&Aacute;RIO NO SAQUINHO COM O PEIXE<br><br>
-1 - Apague a luz do aqu&aacute;rio para reduzir o estresse do peixe.<br>
-2 - Deixe o saco fechado boiando na &aacute;gua do aqu&aacute;rio por 10 minutos para igualar a temperatura.<br>
-3 - Corte o saquinho e descarte a &aacute;gua fora, em seguida, coloque o peixe direto no aqu&aacute;rio.<br>
-4 - Acenda a luz novamente em algumas horas.<br><br>
-Para saber mais, acesse http://blog.aquanimal.com.br/2016/05/aclimatizando-seu-novo-peixe-de-agua.html<br><br>
-Obrigada por comprar conosco!<br><br>
-Aquanimal<br>
-www.aquanimal.com.br<br>
-Whatsapp 11 9 9221-2363
-</body>
-</html>
-        """);
-print("Starting site v-email process")
-for r in rs:
-    receiptInfo = json.loads(r[0], object_hook=lambda d: SimpleNamespace(**d))
-    trxId = r[1]
-    send_mail(receiptInfo.email,"Pedido Enviado!",t.substitute(nome=receiptInfo.socialName,ped=receiptInfo.orderId))
-    print(f"Processing Site V-mail Trx Id {trxId}")
-    trxSuccess(trxId)
-    conn.commit()
+    jobs = []
+    for handler, items in groups.items():
+        METRICS.inc("dispatcher_claimed_total", len(items), trx_code=handler.trxCode)
+        if BULK_ENABLED and len(items) >= BULK_MIN:
+            with METRICS.timer("dispatcher_stage_seconds", stage="render"):
+                bulkJobs = [SendJob(trxId, trxInfo.email, handler.subject, None, handler.cci,
+                                    handler.templateData(trxInfo), handler.weight) for trxId, trxInfo in items]
+            reportResults(getSender().sendBulkMany(handler.sesTemplateName(), handler.defaultTemplateData(), bulkJobs),
+                          meta, contributors)
+        else:
+            with METRICS.timer("dispatcher_stage_seconds", stage="render"):
+                jobs.extend(SendJob(trxId, trxInfo.email, handler.subject, handler.render(trxInfo), handler.cci,
+                                    aWeight=handler.weight) for trxId, trxInfo in items)
+    for trxId, sections in combined:
+        with METRICS.timer("dispatcher_stage_seconds", stage="render"):
+            subject, message, cci = renderCombined(sections)
+        jobs.append(SendJob(trxId, sections[-1][1].email, subject, message, cci,
+                            aWeight=max(handler.weight for handler, info in sections)))
+    reportResults(getSender().sendMany(jobs), meta, contributors)
 
-########################################################
-### SITE READY TO PICKUP  EMAIL
-########################################################
-selectQuery = """
-                select TRX_INFO,TRX_ID
-                from TRANSACTION_LOG
-                WHERE TRX_CODE=?
-                AND TRX_STATUS='PENDING';
-         """
-cursor = conn.cursor()
-cursor.execute(selectQuery, modules.Constants.SITE_R_EMAIL)
-rs = cursor.fetchall()
+def sendBatch(aRows):
+    """
+    Envia um lote reservado [(TRX_INFO, TRX_ID, TRX_CODE, ATTEMPTS)]; uma linha
+    com TRX_INFO que não decodifica vai para DEAD e as outras seguem
+    """
+    items = []
+    with METRICS.timer("dispatcher_stage_seconds", stage="decode"):
+        for r in aRows:
+            try:
+                items.append((r[1], r[2], r[3], decodeTrxInfo(r[0])))
+            except Exception as e:
+                print(f"☠ Trx Id {r[1]}: TRX_INFO inválido ({type(e).__name__}: {e}), marcado como DEAD")
+                METRICS.inc("dispatcher_emails_total", trx_code=int(r[2]), result="dead")
+                trxDead(conn, r[1], WORKER_ID, f"TRX_INFO inválido: {type(e).__name__}: {e}")
+                conn.commit()
+    sendItems(items)
+
+def refreshSuppression():
+    """Recarrega a lista de supressão se o TTL venceu; numa falha segue com a lista atual"""
+    if suppression is None:
+        return
+    try:
+        suppression.refreshIfDue(conn)
+    except Exception as e:
+        print(f"❌ Error loading suppression list: {e}")
+        try:
+            conn.rollback()
+        except:
+            pass
 
-t = Template("""
-Ol&aacute; $nome,<br><br>
-<b>Agradecemos por comprar conosco.</b><br><br>
-Gostaríamos de informar que o seu pedido $ped já está pronto para ser retirado em nossa loja.<br><br>
-Nosso endereço se encontra no rodap&eacute; de nosso site.<br><br>
-Aquanimal
-        """);
-print("Starting site r-email process")
-for r in rs:
-    receiptInfo = json.loads(r[0], object_hook=lambda d: SimpleNamespace(**d))
-    trxId = r[1]
-    send_mail(receiptInfo.email,"Pedido pronto para retirada!",t.substitute(nome=receiptInfo.socialName,ped=receiptInfo.orderId))
-    print(f"Processing Site r-mail Trx Id {trxId}")
-    trxSuccess(trxId)
-    conn.commit()
+def drainQueue():
+    print("Starting email process")
+    try:
+        for rs in claimed():
+            refreshSuppression()
+            sendBatch(rs)
+    finally:
+        # Nenhum email enviado pode ficar sem PROCESSED
+        statusBatch.flush()
 
-########################################################
-### SITE CC NOT AUTHORIZED  EMAIL
-########################################################
-selectQuery = """
-                select TRX_INFO,TRX_ID
-                from TRANSACTION_LOG
-                WHERE TRX_CODE=?
-                AND TRX_STATUS='PENDING';
-         """
-cursor = conn.cursor()
-cursor.execute(selectQuery, modules.Constants.SITE_N_EMAIL)
-rs = cursor.fetchall()
+def exportMetrics(aJobName="emailjob"):
+    """Atualiza a profundidade e a idade da fila (PENDING por TRX_CODE) e grava as métricas"""
+    try:
+        METRICS.clearGauge("dispatcher_pending_rows")
+        METRICS.clearGauge("dispatcher_queue_age_seconds")
+        for trxCode, (count, age) in pendingStats(conn).items():
+            METRICS.setGauge("dispatcher_pending_rows", count, trx_code=trxCode)
+            if age is not None:
+                METRICS.setGauge("dispatcher_queue_age_seconds", age, trx_code=trxCode)
+        conn.commit()
+        for handler in HANDLERS.values():
+            METRICS.setGauge("dispatcher_queue_target_seconds", handler.targetSeconds, trx_code=handler.trxCode)
+    except Exception as e:
+        print(f"❌ Error reading queue depth: {e}")
+    return METRICS.export(aJobName)
 
-t = Template("""
-Ol&aacute; $nome,<br><br>
-O sue pedido $ped n&atilde;o pode ser conclu&iacute;do.<br>
-A operadora do seu cart&atilde;o de cr&eacute;dito n&atilde;o autorizou a transa&ccedil;&atilde;o.<br>
-Entre em contato com sua administradora e nos retorne.<br>
-Se tiver d&uacute;vidas, entre em contato com o nosso e-mail <a href="mailto:aquanimal@aquanimal.com.br">aquanimal@aquanimal.com.br</a>, ou pelo telefone.<br><br>
-Atenciosamente.<br>Aquanimal</br>
-        """);
-print("Starting site n-email process")
-for r in rs:
-    receiptInfo = json.loads(r[0], object_hook=lambda d: SimpleNamespace(**d))
-    trxId = r[1]
-    send_mail(receiptInfo.email,"Cartão não autorizado.",t.substitute(nome=receiptInfo.socialName,ped=receiptInfo.orderId))
-    print(f"Processing Site n-mail Trx Id {trxId}")
-    trxSuccess(trxId)
-    conn.commit()
+def daemonCycle(aJobName="emailjob"):
+    # Templates editados em templates/ passam a valer sem reiniciar o processo
+    reloaded = TEMPLATES.reloadIfChanged()
+    if reloaded:
+        print(f"Templates recarregados: {', '.join(reloaded)}")
+        if BULK_ENABLED:
+            syncSesTemplates()
+    try:
+        drainQueue()
+    except Exception as e:
+        print(f"❌ Error draining queue: {e}")
+        try:
+            conn.rollback()
+        except:
+            pass
+    if METRICS.exportDue():
+        exportMetrics(aJobName)
 
-##########################################################
-### LOST EMAIL
-##########################################################
-cursor = conn.cursor()
-cursor.execute(selectQuery, modules.Constants.SITE_6_EMAIL)
-rs = cursor.fetchall()
+def main():
+    connect()
+    reconcileLedger()
+    if "--daemon" in sys.argv:
+        if BULK_ENABLED:
+            syncSesTemplates()
+        try:
+            PollLoop("Emailjob", POLL_INTERVAL).run(daemonCycle)
+        finally:
+            exportMetrics()
+        return
 
-t = Template("""
-Segue sua senha tempor&aacute;ria: $senha<br>
-Altere essa senha o mais r&aacute;pido poss&iacute;vel em nosso site, no link "Cadastro".
-<br><br>
-Atenciosamente. <br>Aquanimal
-             """);
-print("Starting site n-email process")
-for r in rs:
-    trxInfo  = json.loads(r[0], object_hook=lambda d: SimpleNamespace(**d))
-    trxId = r[1]
-    send_mail(trxInfo.email,"Reset de Senha",t.substitute(senha=trxInfo.socialName))
-    print(f"Processing Site n-mail Trx Id {trxId}")
-    trxSuccess(trxId)
-    conn.commit()
+    # Caminho rápido do cron: fila vazia custa uma consulta, sem boto3 nem client SES
+    if not hasClaimable(conn, list(HANDLERS.keys())):
+        print("Nada pendente")
+        METRICS.export("emailjob")
+        return
 
+    if BULK_ENABLED:
+        syncSesTemplates()
+    try:
+        drainQueue()
+    finally:
+        exportMetrics()
+        for line in METRICS.summary():
+            print(line)
 
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,22 @@
 import sys,os
-import pyodbc
 import modules.Constants
-from modules.DataTypes import ReceiptInfo
+import modules.Db
+from modules.Daemon import PollLoop
+from modules.LionQueue import dispatchAll, dispatchChunked
+from modules.Metrics import METRICS
 
-# Obter variáveis de ambiente
-DB_SERVER = os.getenv('AA_DBSERVER')
-DB_DATABASE = os.getenv('AA_DB_DATABASE')
-DB_UID = os.getenv('AA_DB_UID')
-DB_PWD = os.getenv('AA_DB_PWD')
-DB_PORT = os.getenv('AA_DB_PORT')
+# bulk (padrão) ou row para o caminho antigo, um recibo por vez
+ENQUEUE_MODE = os.getenv('LION_ENQUEUE_MODE', modules.Constants.ENQUEUE_MODE_BULK)
+# > 0 lê e grava em blocos desse tamanho, com commit por bloco; 0 mantém uma única transação
+CHUNK_SIZE = int(os.getenv('LION_CHUNK_SIZE', '0'))
+# Modo daemon (python3 LionDispatcher.py --daemon)
+POLL_INTERVAL = float(os.getenv('LION_POLL_INTERVAL', '5'))
+FULL_SCAN_EVERY = int(os.getenv('LION_FULL_SCAN_EVERY', '720'))
 
-# Construir connection string
-cnxn_str = f"Driver={{ODBC Driver 17 for SQL Server}};PORT={DB_PORT};Server={DB_SERVER};Database={DB_DATABASE};UID={DB_UID};PWD={DB_PWD};"
-conn = pyodbc.connect(cnxn_str, autocommit=False)
-
-def saveTrxLog(aTrxInfos):
-    iQuery = """
-                INSERT INTO [TRANSACTION_LOG]
-                    ([TRX_CODE]
-                    ,[TRX_INFO]
-                    ,[TRX_STATUS])
-                VALUES
-                    (?,?,'PENDING')
-            """
-    iCursor = conn.cursor()
-    iCursor.execute(iQuery,aTrxInfos)
-    iCursor.execute("select @@IDENTITY")
-    rs = iCursor.fetchone()
-    trx_id = rs[0]
-    return trx_id
+def printError(e):
+    exc_type, exc_obj, exc_tb = sys.exc_info()
+    fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
+    print(exc_type, fname, exc_tb.tb_lineno, " - " , e)
 
 ######################################
 ############## START MAIN ############
@@ -37,57 +25,85 @@ def saveTrxLog(aTrxInfos):
 ####################################
 ###### MAIN - RECEIPT EMAIL ########
 ####################################
-def updateReceiptInTrx(receiptno, trxid):
-    iQuery = """
-                UPDATE RECEIPT
-                    SET TRX_ID = ?
-                WHERE RECEIPT_NO = ?
-            """
-    iCursor = conn.cursor()
-    iCursor.execute(iQuery, trxid, receiptno)
+def runOnce():
+    conn = modules.Db.connect()
+    try:
+        if CHUNK_SIZE > 0:
+            total, last = dispatchChunked(conn, ENQUEUE_MODE, CHUNK_SIZE)
+            print(f"=== DEBUG: Total de registros enfileirados: {total} ===")
+        else:
+            dispatchAll(conn, ENQUEUE_MODE)
+    except Exception as e:
+        printError(e)
+        try:
+            conn.rollback()
+        except:
+            pass
+    finally:
+        del conn
+        METRICS.export("lion")
+        for line in METRICS.summary():
+            print(line)
 
-selectQuery = """
-                select	r.RECEIPT_NO,
-                        o.PKId as ORDER_ID,
-                        c.SOCIAL_NAME,
-                        c.EMAIL,
-                        o.NFE_KEY
-                from    receipt r
-                join    [order] o on o.PKId = r.ORDER_ID
-                join    client c on c.PKId = o.CLIENT_ID
-                where   trx_id is null
-         """
-cursor = conn.cursor();
+class LionDaemon:
+    """
+    Mantém uma conexão aberta e, a cada poll, só olha recibos com RECEIPT_NO
+    acima da marca d'água (último recibo visto). A cada FULL_SCAN_EVERY polls
+    a marca volta ao início para pegar recibos que ficaram para trás.
+    """
+    def __init__(self, aOnCommitted=None, aMetricsJob="lion"):
+        self.onCommitted = aOnCommitted
+        # None: quem exporta as métricas é o processo que hospeda o daemon (ex: Pipeline)
+        self.metricsJob = aMetricsJob
+        self.conn = None
+        self.watermark = modules.Constants.RECEIPT_NO_START
+        self.polls = 0
+        self.chunkSize = CHUNK_SIZE if CHUNK_SIZE > 0 else modules.Constants.DAEMON_CHUNK_SIZE
 
-try:
-    cursor.execute(selectQuery)
-    rs = cursor.fetchall()
-    record_count = len(rs)
-    print(f"=== DEBUG: Total de registros encontrados: {record_count} ===")
-    
-    trxInfos = []
-    for idx, r in enumerate(rs, 1):
-        ri = ReceiptInfo(r[0],r[1],r[2],r[3],r[4])
-        tuple = (f"{modules.Constants.RECEIPT_EMAIL}", f"{ri.toJSON()}")
-        i = saveTrxLog(tuple)
-        print(f"Update {ri.receiptNo} with {i}")
-        updateReceiptInTrx(ri.receiptNo, i)
-        
-    conn.commit()
-except Exception as e:
-    exc_type, exc_obj, exc_tb = sys.exc_info()
-    fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
-    print(exc_type, fname, exc_tb.tb_lineno, " - " , e)
-    try:
-        conn.rollback()
-    except:
-        pass
-finally:
-    try:
-        cursor.close()
-    except:
-        pass
-    del conn
+    def poll(self):
+        if FULL_SCAN_EVERY > 0 and self.polls % FULL_SCAN_EVERY == 0:
+            self.watermark = modules.Constants.RECEIPT_NO_START
+        self.polls += 1
+        try:
+            if self.conn is None:
+                self.conn = modules.Db.connect()
+            total, self.watermark = dispatchChunked(self.conn, ENQUEUE_MODE, self.chunkSize,
+                                                    self.watermark, self.onCommitted)
+            if total > 0:
+                print(f"=== DEBUG: {total} recibos enfileirados, marca d'água em {self.watermark} ===")
+        except Exception as e:
+            printError(e)
+            # Descarta a conexão; o próximo poll reconecta
+            try:
+                self.conn.rollback()
+                self.conn.close()
+            except:
+                pass
+            self.conn = None
+        if self.metricsJob and METRICS.exportDue():
+            METRICS.export(self.metricsJob)
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except:
+                pass
+            self.conn = None
+
+def main():
+    if "--daemon" in sys.argv:
+        daemon = LionDaemon()
+        try:
+            PollLoop("LionDispatcher", POLL_INTERVAL).run(daemon.poll)
+        finally:
+            daemon.close()
+            METRICS.export("lion")
+    else:
+        runOnce()
+
+if __name__ == "__main__":
+    main()
 
 #############################################
 ###### MAIN -  SITE ORDER SENT EMAIL ########
@@ -0,0 +1,45 @@
+import sys,os
+import modules.Db
+from modules.Archive import archiveProcessed, ensurePendingIndex, pollLatencyMs
+from modules.EmailRegistry import HANDLERS
+from modules.Metrics import METRICS
+
+# Linhas PROCESSED com PROCESSED_AT mais antigo que isso vão para TRANSACTION_LOG_ARCHIVE
+RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', '90'))
+# Linhas por transação e pausa entre lotes, para não disputar a tabela com o Emailjob
+BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '2000'))
+PAUSE_MS = int(os.getenv('ARCHIVE_PAUSE_MS', '200'))
+# > 0 limita os lotes por execução (o resto fica para a próxima)
+MAX_BATCHES = int(os.getenv('ARCHIVE_MAX_BATCHES', '0'))
+# Mesmo lote do claim do Emailjob, para medir o poll como ele é feito
+POLL_BATCH_SIZE = int(os.getenv('EMAILJOB_BATCH_SIZE', '100'))
+
+def main():
+    conn = modules.Db.connect()
+    codes = list(HANDLERS.keys())
+    try:
+        before = pollLatencyMs(conn, codes, POLL_BATCH_SIZE)
+        index = ensurePendingIndex(conn)
+        if index == 'created':
+            print("Índice filtrado de pendentes criado")
+        elif index == 'different':
+            print("⚠ Já existe um índice com o nome do índice de pendentes, mas com outra definição; não foi alterado")
+        moved = archiveProcessed(conn, RETENTION_DAYS, BATCH_SIZE, PAUSE_MS, MAX_BATCHES)
+        after = pollLatencyMs(conn, codes, POLL_BATCH_SIZE)
+        print(f"Arquivamento: {moved} linhas PROCESSED com mais de {RETENTION_DAYS} dias movidas")
+        print(f"Latência do poll do Emailjob: {before:.1f}ms antes, {after:.1f}ms depois")
+        METRICS.setGauge("dispatcher_poll_latency_ms", round(before, 3), phase="before")
+        METRICS.setGauge("dispatcher_poll_latency_ms", round(after, 3), phase="after")
+    except Exception as e:
+        print(f"❌ Error in maintenance: {e}")
+        try:
+            conn.rollback()
+        except:
+            pass
+        sys.exit(1)
+    finally:
+        METRICS.export("maintenance")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import queue
+import threading
+import time
+import modules.Constants
+from modules.Daemon import PollLoop
+from modules.TrxQueue import claimIds
+import LionDispatcher
+import Emailjob
+
+# Capacidade da fila em memória entre o Dispatcher e o envio; cheia, o Dispatcher espera
+QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '1000'))
+# Espera máxima (s) para montar um lote antes de enviar o que já chegou
+BATCH_WAIT = float(os.getenv('PIPELINE_BATCH_WAIT', '0.2'))
+
+class Pipeline:
+    """
+    Dispatcher e Emailjob no mesmo processo (python3 Pipeline.py).
+    O LionDaemon grava os recibos em TRANSACTION_LOG como sempre e, após cada
+    commit, entrega os pares (TRX_ID, ReceiptInfo) numa fila limitada; uma
+    thread de envio reserva esses TRX_ID e envia sem reler nem decodificar
+    TRX_INFO. A tabela continua sendo o registro durável: o que não passar
+    pela fila (fila cheia no desligamento, queda do processo, retries e os
+    outros TRX_CODE) é pego pela varredura normal do Emailjob, feita pela
+    mesma thread a cada EMAILJOB_POLL_INTERVAL.
+    """
+    def __init__(self):
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.stopEvent = threading.Event()
+        self.lion = LionDispatcher.LionDaemon(self.enqueue, None)
+        self.thread = threading.Thread(target=self.sendLoop, name="PipelineSender", daemon=True)
+        self.lastSweep = 0.0
+
+    def enqueue(self, aEnqueued):
+        """Chamado pelo LionDaemon após cada commit; bloqueia enquanto a fila estiver cheia"""
+        for receipt, trxId in aEnqueued:
+            while not self.stopEvent.is_set():
+                try:
+                    self.queue.put((trxId, receipt), timeout=1)
+                    break
+                except queue.Full:
+                    pass
+
+    def nextBatch(self):
+        """Primeiro item com espera curta, depois o que já estiver na fila até BATCH_SIZE"""
+        try:
+            batch = [self.queue.get(timeout=BATCH_WAIT)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + BATCH_WAIT
+        while len(batch) < Emailjob.BATCH_SIZE:
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def sendQueued(self, aBatch):
+        Emailjob.refreshSuppression()
+        # TRX_ID -> ATTEMPTS: uma linha já reservada antes (lease vencido) conta para o DEAD
+        claimed = dict(claimIds(Emailjob.conn, [trxId for trxId, receipt in aBatch],
+                                Emailjob.WORKER_ID, Emailjob.LEASE_SECONDS))
+        Emailjob.sendItems([(trxId, modules.Constants.RECEIPT_EMAIL, claimed[trxId], receipt)
+                            for trxId, receipt in aBatch if trxId in claimed])
+        Emailjob.statusBatch.flushIfDue()
+
+    def sendLoop(self):
+        while True:
+            batch = self.nextBatch()
+            if batch:
+                try:
+                    self.sendQueued(batch)
+                except Exception as e:
+                    LionDispatcher.printError(e)
+                    try:
+                        Emailjob.conn.rollback()
+                    except:
+                        pass
+            elif self.stopEvent.is_set():
+                break
+            if time.monotonic() - self.lastSweep >= Emailjob.POLL_INTERVAL:
+                Emailjob.daemonCycle("pipeline")
+                self.lastSweep = time.monotonic()
+        Emailjob.statusBatch.flush()
+
+    def run(self):
+        Emailjob.connect()
+        Emailjob.reconcileLedger()
+        if Emailjob.BULK_ENABLED:
+            Emailjob.syncSesTemplates()
+        self.thread.start()
+        try:
+            PollLoop("Pipeline", LionDispatcher.POLL_INTERVAL).run(self.lion.poll)
+        finally:
+            # Para de aceitar itens novos, deixa a thread esvaziar a fila e encerra
+            self.stopEvent.set()
+            self.thread.join()
+            self.lion.close()
+            Emailjob.exportMetrics("pipeline")
+
+if __name__ == "__main__":
+    Pipeline().run()
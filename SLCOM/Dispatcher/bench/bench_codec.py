@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark do TRX_INFO: JSON indentado legado vs layout compacto versionado.
+Uso: python3 bench/bench_codec.py [quantidade]
+
+Compara o tamanho médio gravado na TRANSACTION_LOG, encodes/s e decodes/s
+(o decode antigo do Emailjob, com object_hook + SimpleNamespace, e o
+decodeTrxInfo lendo os dois formatos).
+"""
+
+import sys
+import os
+import json
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from modules.DataTypes import ReceiptInfo, decodeTrxInfo
+
+
+def receipts(count):
+    return [ReceiptInfo(100000 + i, 900000 + i, f"Cliente Bench {i}", f"bench{i}@example.com", f"{i:044d}")
+            for i in range(count)]
+
+
+def rate(items, fn):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    ris = receipts(count)
+    legacy = [ri.toJSON() for ri in ris]
+    compact = [ri.encode() for ri in ris]
+
+    assert all(decodeTrxInfo(t).toDict() == ri.toDict() for t, ri in zip(legacy[:1000], ris))
+    assert all(decodeTrxInfo(t).toDict() == ri.toDict() for t, ri in zip(compact[:1000], ris))
+
+    legacySize = sum(len(t) for t in legacy) / count
+    compactSize = sum(len(t) for t in compact) / count
+    print(f"{count} recibos")
+    print(f"  tamanho médio      legado {legacySize:7.1f} B   compacto {compactSize:7.1f} B   ({compactSize / legacySize - 1:+.0%})")
+    print(f"  encode/s           legado {rate(ris, ReceiptInfo.toJSON):>10,.0f}   compacto {rate(ris, ReceiptInfo.encode):>10,.0f}")
+
+    oldDecode = rate(legacy, lambda t: json.loads(t, object_hook=lambda d: SimpleNamespace(**d)))
+    print(f"  decode/s (antigo, SimpleNamespace)  {oldDecode:>10,.0f}")
+    print(f"  decode/s (decodeTrxInfo, legado)    {rate(legacy, decodeTrxInfo):>10,.0f}")
+    print(f"  decode/s (decodeTrxInfo, compacto)  {rate(compact, decodeTrxInfo):>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark do enfileiramento de recibos do LION: caminho por linha vs bulk.
+Uso: python3 bench/bench_enqueue.py [quantidade_de_recibos] [repeticoes]
+
+Usa as mesmas variáveis AA_DB* do LionDispatcher. Os recibos são sintéticos
+(RECEIPT_NO negativos, que não existem na RECEIPT) e cada execução roda dentro
+de uma transação que sofre rollback no final - nada é gravado no banco.
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import modules.Db
+from modules.DataTypes import ReceiptInfo
+from modules.LionQueue import enqueueReceiptsRowByRow, enqueueReceiptsBulk
+
+
+def synthetic_receipts(count):
+    return [ReceiptInfo(-(i + 1),
+                        900000 + i,
+                        f"Cliente Bench {i}",
+                        f"bench{i}@example.com",
+                        f"{i:044d}")
+            for i in range(count)]
+
+
+def run(conn, fn, receipts):
+    start = time.perf_counter()
+    fn(conn, receipts)
+    elapsed = time.perf_counter() - start
+    conn.rollback()
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    receipts = synthetic_receipts(count)
+    conn = modules.Db.connect()
+
+    # O caminho por linha imprime uma linha por recibo; não queremos medir o terminal
+    devnull = open(os.devnull, 'w')
+    stdout = sys.stdout
+    results = {}
+    try:
+        for name, fn in (("row", enqueueReceiptsRowByRow), ("bulk", enqueueReceiptsBulk)):
+            times = []
+            for _ in range(repeat):
+                sys.stdout = devnull
+                try:
+                    times.append(run(conn, fn, receipts))
+                finally:
+                    sys.stdout = stdout
+            results[name] = min(times)
+    finally:
+        conn.rollback()
+        conn.close()
+        devnull.close()
+
+    print(f"Recibos por execução: {count} (melhor de {repeat})")
+    for name, elapsed in results.items():
+        print(f"  {name:5s} {elapsed:8.3f}s  {count / elapsed:10.1f} recibos/s")
+    print(f"  speedup bulk/row: {results['row'] / results['bulk']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
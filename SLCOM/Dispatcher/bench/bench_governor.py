@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark do SendGovernor contra o stub local do SES com cotas simuladas.
+Uso: python3 bench/bench_governor.py [mensagens] [workers] [taxa_da_conta] [latencia_ms]
+
+Cada worker é um SesSender próprio (como várias cópias do Emailjob) e todos
+dividem a taxa da conta no stub. Compara a taxa fixa (cada worker acha que
+a conta é só dele) com o governor, e depois mostra o adiamento dos emails
+de baixa prioridade com a cota de 24h no fim.
+"""
+
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# O boto3 exige credenciais mesmo falando com o stub
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'stub')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'stub')
+
+from modules.EmailRegistry import PRIORITY_NOTICE, PRIORITY_ORDER
+from modules.SesSender import SesSender, SendJob
+from modules.SendGovernor import SendGovernor
+from ses_stub import startStub
+
+REGION = 'us-east-1'
+BODY = "<html><body>Ola $nome, seu pedido foi enviado.</body></html>" * 20
+
+
+def jobs(count, offset=0):
+    return [SendJob(offset + i, f"cliente{offset + i}@example.com", "Pedido Enviado!", BODY, 0) for i in range(count)]
+
+
+def workers(url, count, workerCount, rate, adaptive):
+    """Envia count emails divididos entre workerCount senders; retorna (enviados, throttled, segundos)"""
+    per = count // workerCount
+    results = []
+    def run(index):
+        governor = SendGovernor(rate) if adaptive else None
+        sender = SesSender(REGION, "bench@example.com", "cc@example.com", None, 8, rate, url, governor)
+        results.extend(sender.sendMany(jobs(per, index * per)))
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(workerCount)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    sent = sum(1 for r in results if r.ok)
+    return sent, len(results) - sent, elapsed
+
+
+def shared(label, count, workerCount, rate, latency, adaptive):
+    server, url = startStub(aLatencyMs=latency, aMaxSendRate=rate)
+    try:
+        sent, failed, elapsed = workers(url, count, workerCount, rate, adaptive)
+        config = server.stubConfig
+        print(f"  {label:22s} {elapsed:7.2f}s  {sent / elapsed:7.1f}/s de {rate:g}/s  "
+              f"enviados {sent:5d}  falhas {failed:5d}  throttled no SES {config.throttled}")
+    finally:
+        server.shutdown()
+
+
+def quota(latency):
+    """Cota de 24h com 100 destinatários restantes e 10% de reserva: os avisos param antes"""
+    server, url = startStub(aLatencyMs=latency, aMaxSendRate=50, aMax24HourSend=1000, aSentLast24Hours=900)
+    try:
+        governor = SendGovernor(0, 0.1, PRIORITY_ORDER)
+        sender = SesSender(REGION, "bench@example.com", "cc@example.com", None, 8, 0, url, governor)
+        for label, weight in (("aviso", PRIORITY_NOTICE), ("pedido", PRIORITY_ORDER)):
+            batch = jobs(80)
+            admitted = [job for job in batch if governor.admits(weight)]
+            sent = sum(1 for r in sender.sendMany(admitted) if r.ok)
+            governor.settle()
+            print(f"  {label:8s} peso {weight:2d}: {len(admitted):3d} de {len(batch)} admitidos, "
+                  f"{sent} enviados, cota restante {governor.remaining():g}")
+        print(f"  throttled no SES: {server.stubConfig.throttled}")
+    finally:
+        server.shutdown()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    workerCount = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else 50
+    latency = float(sys.argv[4]) if len(sys.argv) > 4 else 20
+    print(f"{count} emails, {workerCount} workers dividindo {rate:g}/s, latência do stub {latency}ms")
+    shared("taxa fixa", count, workerCount, rate, latency, False)
+    shared("governor", count, workerCount, rate, latency, True)
+    print("Cota de 24h quase no fim (100 restantes, reserva de 10%)")
+    quota(latency)
+
+
+if __name__ == "__main__":
+    main()
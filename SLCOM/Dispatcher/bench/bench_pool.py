@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark do SenderPool contra três stubs locais do SES, um por "região",
+com taxas e latências diferentes.
+Uso: python3 bench/bench_pool.py [mensagens]
+
+1. Um endpoint sozinho x o pool: vazão e quantos emails cada endpoint levou.
+2. Failover: a região mais rápida passa a responder ServiceUnavailable no
+   meio do envio; o pool tira ela, os emails seguem pelas outras e ela volta
+   na verificação de saúde depois que se recupera.
+"""
+
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# O boto3 exige credenciais mesmo falando com o stub
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'stub')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'stub')
+
+from modules.SesSender import SesSender, SendJob
+from modules.SendGovernor import SendGovernor
+from modules.SenderPool import SenderPool, ENDPOINT_MAX_RETRIES
+from ses_stub import startStub
+
+BODY = "<html><body>Ola $nome, seu pedido foi enviado.</body></html>" * 20
+# (região, identidade, envios/s da conta, latência em ms)
+REGIONS = [
+    ("us-east-1", "envio@aquanimal.com.br", 30, 20),
+    ("sa-east-1", "pedidos@aquanimal.com.br", 14, 80),
+    ("eu-west-1", "avisos@aquanimal.com.br", 50, 20),
+]
+
+
+def jobs(count):
+    return [SendJob(i, f"cliente{i}@example.com", "Pedido Enviado!", BODY, 0) for i in range(count)]
+
+
+def sender(region, fromEmail, url, maxRetries=None):
+    return SesSender(region, fromEmail, "cc@example.com", None, 8, 0, url, SendGovernor(0), maxRetries)
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    failed = sum(1 for r in fn() if not r.ok)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:22s} {elapsed:7.2f}s  {count / elapsed:7.1f} emails/s  falhas {failed}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    stubs = [(region, fromEmail, startStub(aLatencyMs=latency, aMaxSendRate=rate)) for region, fromEmail, rate, latency in REGIONS]
+    try:
+        print(f"{count} emails; " + ", ".join(f"{r} {rate}/s {lat}ms" for r, _, rate, lat in REGIONS))
+        region, fromEmail, (server, url) = stubs[0]
+        timed(f"só {region}", count, lambda: sender(region, fromEmail, url).sendMany(jobs(count)))
+
+        before = [server.stubConfig.sent for _, _, (server, _) in stubs]
+        pool = SenderPool([(region, sender(region, fromEmail, url, ENDPOINT_MAX_RETRIES)) for region, fromEmail, (server, url) in stubs],
+                          aFailoverAfter=3, aHealthInterval=2)
+        timed("pool", count, lambda: pool.sendMany(jobs(count)))
+        print("  " + " | ".join(f"{region}: {server.stubConfig.sent - b}"
+                                for (region, _, (server, _)), b in zip(stubs, before)))
+
+        print("Failover: eu-west-1 fora do ar entre 2s e 6s")
+        down = stubs[2][2][0].stubConfig
+        def outage():
+            time.sleep(2)
+            down.errorRate = 1.0
+            time.sleep(4)
+            down.errorRate = 0.0
+        before = [server.stubConfig.sent for _, _, (server, _) in stubs]
+        threading.Thread(target=outage, daemon=True).start()
+        timed("pool com falha", count * 2, lambda: pool.sendMany(jobs(count * 2)))
+        print("  " + " | ".join(f"{region}: {server.stubConfig.sent - b}"
+                                for (region, _, (server, _)), b in zip(stubs, before)))
+    finally:
+        for _, _, (server, _) in stubs:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline de envio SES contra o stub local (bench/ses_stub.py).
+Uso: python3 bench/bench_ses.py [mensagens] [concorrencia] [latencia_ms]
+
+Compara o envio antigo (um boto3.client novo por email, um de cada vez)
+com o SesSender (client único, envios em paralelo).
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# O boto3 exige credenciais mesmo falando com o stub
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'stub')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'stub')
+
+import boto3
+from modules.SesSender import SesSender, SendJob
+from ses_stub import startStub
+
+REGION = 'us-east-1'
+BODY = "<html><body>Ola $nome, seu pedido foi enviado.</body></html>" * 20
+
+
+def jobs(count):
+    return [SendJob(i, f"cliente{i}@example.com", "Pedido Enviado!", BODY, 0) for i in range(count)]
+
+
+def legacy(url, aJobs):
+    for job in aJobs:
+        client = boto3.client('ses', region_name=REGION, endpoint_url=url)
+        client.send_email(Source="bench@example.com",
+                          Destination={'ToAddresses': [job.toEmail]},
+                          Message={'Subject': {'Data': job.subject, 'Charset': 'UTF-8'},
+                                   'Body': {'Html': {'Data': job.message, 'Charset': 'UTF-8'}}})
+
+
+def engine(url, aJobs, concurrency):
+    sender = SesSender(REGION, "bench@example.com", "cc@example.com", None, concurrency, 0, url)
+    failed = [r for r in sender.sendMany(aJobs) if not r.ok]
+    if failed:
+        print(f"  {len(failed)} falhas, ex: {failed[0]}")
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:22s} {elapsed:8.3f}s  {count / elapsed:8.1f} emails/s")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 50
+    server, url = startStub(aLatencyMs=latency)
+    print(f"{count} emails, latência do stub {latency}ms")
+    try:
+        a = timed("client por email", count, lambda: legacy(url, jobs(count)))
+        b = timed("SesSender x1", count, lambda: engine(url, jobs(count), 1))
+        c = timed(f"SesSender x{concurrency}", count, lambda: engine(url, jobs(count), concurrency))
+        print(f"  speedup: {a / c:.1f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
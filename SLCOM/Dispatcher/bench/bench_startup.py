@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark do tempo de inicialização dos scripts.
+Uso: python3 bench/bench_startup.py [repeticoes] [--empty-run] [--max-ms 150]
+
+Mede, num processo Python novo a cada repetição:
+- o interpretador vazio (referência)
+- o import do LionDispatcher e do Emailjob, conferindo que nenhum dos dois
+  carrega o boto3 nem abre conexão no import
+- com --empty-run, a execução completa do Emailjob com a fila vazia contra o
+  banco de benchmark (bench/seed.py, variáveis BENCH_DB_*): o caminho do cron
+  que sai depois de uma única consulta
+
+Com --max-ms, termina com erro se a mediana da execução vazia (ou do import,
+sem --empty-run) passar do limite, para uso em CI.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import seed as benchdb
+
+DISPATCHER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000, 'boto3' in sys.modules)
+"""
+
+
+def wallMs(args, env=None):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable] + args, cwd=DISPATCHER_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return (time.perf_counter() - start) * 1000, out
+
+
+def median(label, samples):
+    value = statistics.median(samples)
+    print(f"  {label:28s} mediana {value:8.1f}ms  (min {min(samples):.1f}ms, max {max(samples):.1f}ms)")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de inicialização do LionDispatcher e do Emailjob")
+    parser.add_argument('repeat', nargs='?', type=int, default=10)
+    parser.add_argument('--empty-run', action='store_true')
+    parser.add_argument('--max-ms', type=float)
+    args = parser.parse_args()
+
+    print(f"{args.repeat} repetições, processo novo a cada uma")
+    median("python -c pass", [wallMs(['-c', 'pass'])[0] for _ in range(args.repeat)])
+
+    worst = 0.0
+    for module in ("LionDispatcher", "Emailjob"):
+        samples = []
+        for _ in range(args.repeat):
+            _, out = wallMs(['-c', IMPORT_PROBE.format(module=module)])
+            importMs, boto3Loaded = out.split()
+            if boto3Loaded == 'True':
+                sys.exit(f"{module}: o import carregou o boto3")
+            samples.append(float(importMs))
+        worst = max(worst, median(f"import {module}", samples))
+
+    if args.empty_run:
+        env = dict(os.environ)
+        env.update(benchdb.benchEnv())
+        samples = []
+        for _ in range(args.repeat):
+            ms, out = wallMs(['Emailjob.py'], env)
+            if "Nada pendente" not in out:
+                sys.exit("A fila do banco de benchmark não está vazia; rode bench/run_bench.py antes para drená-la")
+            samples.append(ms)
+        worst = median("Emailjob.py (fila vazia)", samples)
+
+    if args.max_ms is not None and worst > args.max_ms:
+        sys.exit(f"Acima do limite: {worst:.1f}ms > {args.max_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de renderização dos templates do Emailjob.
+Uso: python3 bench/bench_templates.py [renderizacoes_por_template]
+
+Para cada template em templates/ compara string.Template.substitute,
+o CompiledTemplate (segmentos + slots) e o TemplateRegistry com cache,
+com parâmetros distintos (cache frio) e repetidos (cache quente).
+"""
+
+import sys
+import os
+import time
+from string import Template
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from modules.Templates import TemplateRegistry
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'templates')
+
+
+def params(i):
+    # secoes: o que o renderCombined junta para o order_update_email, duas seções já renderizadas
+    secoes = (f"<b>Pedido enviado</b><br><br>O seu pedido {100000 + i} foi enviado. Nota fiscal {5000 + i}, "
+              f"chave {i:044d}.<br><br>"
+              f"<b>Pedido pronto para retirada</b><br><br>O seu pedido {100000 + i} j&aacute; est&aacute; "
+              f"pronto para ser retirado em nossa loja.<br><br>")
+    return dict(nome=f"Cliente {i}", ped=100000 + i, nf=5000 + i, key=f"{i:044d}", senha=f"s{i:06d}", secoes=secoes)
+
+
+def rate(count, fn):
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    registry = TemplateRegistry(TEMPLATE_DIR)
+    cached = TemplateRegistry(TEMPLATE_DIR, aCacheSize=count)
+    print(f"{count} renderizações por template (renders/s)")
+    print(f"  {'template':22s} {'substitute':>12s} {'compilado':>12s} {'cache frio':>12s} {'cache quente':>12s}")
+    for name in sorted(registry.templates):
+        compiled = registry.get(name)
+        with open(os.path.join(TEMPLATE_DIR, name + '.html'), encoding='utf-8') as f:
+            legacy = Template(f.read())
+        # Só os campos que o template usa, como o EmailRegistry passa
+        p = [{k: v for k, v in params(i).items() if k in compiled.names} for i in range(count)]
+        a = rate(count, lambda i: legacy.substitute(**p[i]))
+        b = rate(count, lambda i: compiled.render(p[i]))
+        c = rate(count, lambda i: cached.render(name, p[i]))
+        d = rate(count, lambda i: cached.render(name, p[0]))
+        print(f"  {name:22s} {a:12.0f} {b:12.0f} {c:12.0f} {d:12.0f}")
+
+
+if __name__ == "__main__":
+    main()
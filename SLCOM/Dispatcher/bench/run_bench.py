@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark de ponta a ponta do LionDispatcher e do Emailjob, sem produção:
+SQL Server local (bench/docker-compose.yml) + stub do SES (bench/ses_stub.py).
+Uso: python3 bench/run_bench.py [--seed] [--latency-ms 20] [--throttle-rate 0.0]
+                                [--out resultado.json] [--baseline anterior.json]
+
+1. --seed recria e popula o banco de benchmark (ver bench/seed.py e seus
+   parâmetros --receipts/--pending-receipts/--history/--pending)
+2. roda o LionDispatcher e depois o Emailjob como subprocessos, com as
+   variáveis AA_DB* apontando para o banco de benchmark e o SES no stub
+3. mostra linhas/s, p50/p99 de cada etapa (métricas de modules/Metrics.py)
+   e o pico de RSS de cada processo; com --baseline mostra a variação
+
+As demais variáveis de ambiente (LION_*, EMAILJOB_*, SES_CONCURRENCY...)
+são repassadas, então o mesmo comando compara configurações diferentes.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import seed as benchdb
+from ses_stub import startStub
+
+DISPATCHER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def runScript(name, script, env, metricsDir):
+    """Roda o script, espera terminar e retorna (segundos, pico de RSS em MB, métricas)"""
+    logPath = os.path.join(metricsDir, f"{name}.log")
+    with open(logPath, 'w') as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, script], cwd=DISPATCHER_DIR, env=env,
+                                stdout=log, stderr=subprocess.STDOUT)
+        # wait4 devolve o rusage só deste filho (ru_maxrss em KB no Linux)
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{script} terminou com código {proc.returncode}, ver {logPath}")
+    with open(os.path.join(metricsDir, f"{name}.json")) as f:
+        metrics = json.load(f)
+    return elapsed, usage.ru_maxrss / 1024.0, metrics
+
+
+def counterTotal(metrics, name, **labels):
+    return sum(c['value'] for c in metrics['counters']
+               if c['name'] == name and all(c['labels'].get(k) == v for k, v in labels.items()))
+
+
+def stages(metrics):
+    return {h['labels']['stage']: {'count': h['count'], 'p50_ms': h['p50'] * 1000, 'p99_ms': h['p99'] * 1000}
+            for h in metrics['histograms'] if h['name'] == 'dispatcher_stage_seconds'}
+
+
+def summarize(elapsed, rssMb, rows, metrics):
+    return {'seconds': round(elapsed, 3), 'rows': rows,
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed else 0.0,
+            'peak_rss_mb': round(rssMb, 1), 'stages': stages(metrics)}
+
+
+def delta(current, previous):
+    if not previous:
+        return ""
+    return f" ({(current - previous) / previous:+.1%})"
+
+
+def report(results, baseline):
+    for name, r in results.items():
+        base = (baseline or {}).get(name, {})
+        print(f"\n{name}: {r['rows']:,} linhas em {r['seconds']:.1f}s")
+        print(f"  linhas/s     {r['rows_per_sec']:>10,.1f}{delta(r['rows_per_sec'], base.get('rows_per_sec'))}")
+        print(f"  pico de RSS  {r['peak_rss_mb']:>10,.1f} MB{delta(r['peak_rss_mb'], base.get('peak_rss_mb'))}")
+        for stage, s in sorted(r['stages'].items()):
+            baseP99 = base.get('stages', {}).get(stage, {}).get('p99_ms')
+            print(f"  {stage:12s} n={s['count']:<8} p50<={s['p50_ms']:g}ms p99<={s['p99_ms']:g}ms{delta(s['p99_ms'], baseP99)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do LionDispatcher e do Emailjob")
+    parser.add_argument('--seed', action='store_true', help="recria e popula o banco antes de medir")
+    parser.add_argument('--receipts', type=int, default=1000000)
+    parser.add_argument('--pending-receipts', type=int, default=100000)
+    parser.add_argument('--history', type=int, default=2000000)
+    parser.add_argument('--pending', type=int, default=50000)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--out', help="grava os resultados em JSON (para usar como --baseline depois)")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    if args.seed:
+        benchdb.seed(args.receipts, min(args.pending_receipts, args.receipts), args.history, args.pending)
+
+    server, url = startStub(aLatencyMs=args.latency_ms, aThrottleRate=args.throttle_rate)
+    metricsDir = tempfile.mkdtemp(prefix="slcom_bench_")
+    env = dict(os.environ)
+    env.update(benchdb.benchEnv())
+    env.update({'METRICS_DIR': metricsDir, 'METRICS_FORMAT': 'json',
+                'SES_ENDPOINT_URL': url, 'AWS_REGION': env.get('AWS_REGION', 'us-east-1'),
+                'AWS_ACCESS_KEY_ID': 'stub', 'AWS_SECRET_ACCESS_KEY': 'stub'})
+    # Sem limite de taxa, a não ser que o ambiente peça: o que se mede aqui é o código
+    env.setdefault('SES_MAX_SEND_RATE', '0')
+    env.setdefault('LION_CHUNK_SIZE', '5000')
+
+    print(f"SES stub em {url} (latência {args.latency_ms}ms, throttle {args.throttle_rate:.0%}), logs em {metricsDir}")
+    results = {}
+    try:
+        elapsed, rss, metrics = runScript("lion", "LionDispatcher.py", env, metricsDir)
+        results['LionDispatcher'] = summarize(elapsed, rss, counterTotal(metrics, "dispatcher_receipts_enqueued_total"), metrics)
+        elapsed, rss, metrics = runScript("emailjob", "Emailjob.py", env, metricsDir)
+        results['Emailjob'] = summarize(elapsed, rss, counterTotal(metrics, "dispatcher_emails_total", result="sent"), metrics)
+    finally:
+        config = server.stubConfig
+        print(f"SES stub: chamadas {config.calls} - enviados {config.sent} - throttled {config.throttled}")
+        server.shutdown()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
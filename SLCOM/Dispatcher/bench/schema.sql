@@ -0,0 +1,34 @@
+-- Esquema mínimo das tabelas usadas pelo LionDispatcher e pelo Emailjob,
+-- criado por bench/seed.py no banco de benchmark. Os scripts de sql/ são
+-- aplicados em seguida, como no servidor.
+IF OBJECT_ID('dbo.RECEIPT') IS NOT NULL DROP TABLE dbo.RECEIPT;
+IF OBJECT_ID('dbo.[ORDER]') IS NOT NULL DROP TABLE dbo.[ORDER];
+IF OBJECT_ID('dbo.CLIENT') IS NOT NULL DROP TABLE dbo.CLIENT;
+IF OBJECT_ID('dbo.TRANSACTION_LOG') IS NOT NULL DROP TABLE dbo.TRANSACTION_LOG;
+GO
+
+CREATE TABLE dbo.CLIENT (
+    PKId INT NOT NULL PRIMARY KEY,
+    SOCIAL_NAME NVARCHAR(120) NOT NULL,
+    EMAIL NVARCHAR(200) NOT NULL
+);
+
+CREATE TABLE dbo.[ORDER] (
+    PKId INT NOT NULL PRIMARY KEY,
+    CLIENT_ID INT NOT NULL,
+    NFE_KEY VARCHAR(44) NULL
+);
+
+CREATE TABLE dbo.RECEIPT (
+    RECEIPT_NO INT NOT NULL PRIMARY KEY,
+    ORDER_ID INT NOT NULL,
+    TRX_ID INT NULL
+);
+
+CREATE TABLE dbo.TRANSACTION_LOG (
+    TRX_ID INT IDENTITY(1,1) NOT NULL PRIMARY KEY,
+    TRX_CODE INT NOT NULL,
+    TRX_INFO NVARCHAR(MAX) NOT NULL,
+    TRX_STATUS VARCHAR(20) NOT NULL
+);
+GO
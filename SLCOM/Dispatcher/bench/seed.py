@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Popula o banco de benchmark (SQL Server local de bench/docker-compose.yml)
+com recibos/pedidos/clientes sintéticos e uma TRANSACTION_LOG com histórico
+PROCESSED e linhas PENDING dos seis TRX_CODE.
+Uso: python3 bench/seed.py [--receipts 1000000] [--pending-receipts 100000]
+                           [--history 2000000] [--pending 50000]
+
+Usa só as variáveis BENCH_DB_* (padrão: o container local), nunca as AA_DB*
+de produção: o script recria as tabelas do zero.
+"""
+
+import argparse
+import os
+import time
+
+import pyodbc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SQL_DIR = os.path.join(BENCH_DIR, '..', 'sql')
+
+BENCH_DB_SERVER = os.getenv('BENCH_DB_SERVER', '127.0.0.1,14333')
+BENCH_DB_DATABASE = os.getenv('BENCH_DB_DATABASE', 'SLCOM_BENCH')
+BENCH_DB_UID = os.getenv('BENCH_DB_UID', 'sa')
+BENCH_DB_PWD = os.getenv('BENCH_DB_PWD', 'Bench_Passw0rd')
+BENCH_DB_PORT = os.getenv('BENCH_DB_PORT', '14333')
+
+# Linhas por INSERT ... SELECT; mantém o log de transação pequeno
+SEED_BATCH = 500000
+
+# Mesmo formato de ReceiptInfo.toJSON() (sort_keys, indent=4), montado no servidor
+TRX_INFO_SQL = """CONCAT('{', CHAR(10),
+        '    "email": "bench', n, '@example.com",', CHAR(10),
+        '    "nfeKey": "', RIGHT(CONCAT(REPLICATE('0', 44), n), 44), '",', CHAR(10),
+        '    "orderId": ', n, ',', CHAR(10),
+        '    "receiptNo": ', n, ',', CHAR(10),
+        '    "socialName": "Cliente Bench ', n, '"', CHAR(10), '}')"""
+
+
+def benchEnv():
+    """Variáveis AA_DB* que apontam os scripts para o banco de benchmark"""
+    return {'AA_DBSERVER': BENCH_DB_SERVER, 'AA_DB_DATABASE': BENCH_DB_DATABASE,
+            'AA_DB_UID': BENCH_DB_UID, 'AA_DB_PWD': BENCH_DB_PWD, 'AA_DB_PORT': BENCH_DB_PORT}
+
+
+def connect(database=None, autocommit=False):
+    cnxn_str = (f"Driver={{ODBC Driver 17 for SQL Server}};PORT={BENCH_DB_PORT};Server={BENCH_DB_SERVER};"
+                f"Database={database or BENCH_DB_DATABASE};UID={BENCH_DB_UID};PWD={BENCH_DB_PWD};")
+    return pyodbc.connect(cnxn_str, autocommit=autocommit)
+
+
+def runScript(conn, path):
+    """Executa um script .sql separando os lotes por GO, como o sqlcmd"""
+    with open(path, encoding='utf-8') as f:
+        batches = [b.strip() for b in f.read().split('\nGO')]
+    cursor = conn.cursor()
+    for batch in batches:
+        if batch:
+            cursor.execute(batch)
+    conn.commit()
+
+
+def createDatabase():
+    master = connect('master', autocommit=True)
+    master.cursor().execute(f"IF DB_ID('{BENCH_DB_DATABASE}') IS NULL CREATE DATABASE [{BENCH_DB_DATABASE}]")
+    master.close()
+
+
+def insertSeries(conn, label, total, sql, offset=0):
+    """Executa sql (com @lo/@hi) em faixas de SEED_BATCH valores de n"""
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    for lo in range(offset + 1, offset + total + 1, SEED_BATCH):
+        hi = min(lo + SEED_BATCH - 1, offset + total)
+        cursor.execute(f"DECLARE @lo INT = ?, @hi INT = ?; {sql}", lo, hi)
+        conn.commit()
+    print(f"  {label:28s} {total:>10,} linhas em {time.perf_counter() - start:6.1f}s")
+
+
+def seed(receipts, pendingReceipts, history, pending):
+    createDatabase()
+    conn = connect()
+    runScript(conn, os.path.join(BENCH_DIR, 'schema.sql'))
+    for name in sorted(os.listdir(SQL_DIR)):
+        if name.endswith('.sql'):
+            runScript(conn, os.path.join(SQL_DIR, name))
+
+    print(f"Populando {BENCH_DB_DATABASE} em {BENCH_DB_SERVER}")
+    insertSeries(conn, "CLIENT", receipts, """
+        INSERT INTO CLIENT (PKId, SOCIAL_NAME, EMAIL)
+        SELECT value, CONCAT('Cliente Bench ', value), CONCAT('bench', value, '@example.com')
+        FROM GENERATE_SERIES(@lo, @hi);""")
+    insertSeries(conn, "ORDER", receipts, """
+        INSERT INTO [ORDER] (PKId, CLIENT_ID, NFE_KEY)
+        SELECT value, value, RIGHT(CONCAT(REPLICATE('0', 44), value), 44)
+        FROM GENERATE_SERIES(@lo, @hi);""")
+    # Os últimos pendingReceipts recibos ainda não têm TRX_ID: é o que o LionDispatcher vai enfileirar
+    insertSeries(conn, "RECEIPT", receipts, f"""
+        INSERT INTO RECEIPT (RECEIPT_NO, ORDER_ID, TRX_ID)
+        SELECT value, value, CASE WHEN value > {receipts - pendingReceipts} THEN NULL ELSE value END
+        FROM GENERATE_SERIES(@lo, @hi);""")
+    insertSeries(conn, "TRANSACTION_LOG PROCESSED", history, f"""
+        INSERT INTO TRANSACTION_LOG (TRX_CODE, TRX_INFO, TRX_STATUS)
+        SELECT (n % 6) + 1, {TRX_INFO_SQL}, 'PROCESSED'
+        FROM (SELECT value AS n FROM GENERATE_SERIES(@lo, @hi)) s ORDER BY n;""")
+    insertSeries(conn, "TRANSACTION_LOG PENDING", pending, f"""
+        INSERT INTO TRANSACTION_LOG (TRX_CODE, TRX_INFO, TRX_STATUS)
+        SELECT (n % 6) + 1, {TRX_INFO_SQL}, 'PENDING'
+        FROM (SELECT value AS n FROM GENERATE_SERIES(@lo, @hi)) s ORDER BY n;""", history)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Popula o banco de benchmark")
+    parser.add_argument('--receipts', type=int, default=1000000)
+    parser.add_argument('--pending-receipts', type=int, default=100000)
+    parser.add_argument('--history', type=int, default=2000000)
+    parser.add_argument('--pending', type=int, default=50000)
+    args = parser.parse_args()
+    seed(args.receipts, min(args.pending_receipts, args.receipts), args.history, args.pending)
+
+
+if __name__ == "__main__":
+    main()
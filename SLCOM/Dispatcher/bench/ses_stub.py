@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Stub local da API do SES (protocolo Query, o mesmo que o boto3 usa) para
+benchmarks e testes offline.
+Uso: python3 bench/ses_stub.py [--port 8025] [--latency-ms 50] [--throttle-rate 0.0]
+                                [--max-send-rate 0] [--max-24h -1] [--sent-24h 0] [--error-rate 0.0]
+
+--max-send-rate e --max-24h simulam as cotas da conta como o SES: por
+destinatário (To + Cc + Bcc), com Throttling "Maximum sending rate exceeded."
+ou "Daily message quota exceeded.", e GetSendQuota responde com elas.
+--error-rate responde ServiceUnavailable (503) a essa fração de todas as
+chamadas, como uma região fora do ar (stubConfig.errorRate muda em execução).
+
+Aponte o Emailjob para ele com SES_ENDPOINT_URL=http://127.0.0.1:8025
+(o boto3 ainda exige credenciais, qualquer valor serve).
+"""
+
+import argparse
+import random
+import re
+import signal
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+from xml.sax.saxutils import escape
+
+NS = "http://ses.amazonaws.com/doc/2010-12-01/"
+
+
+class StubConfig:
+    def __init__(self, aLatencyMs=50, aThrottleRate=0.0, aMaxSendRate=0, aMax24HourSend=-1, aSentLast24Hours=0,
+                 aErrorRate=0.0):
+        self.latencyMs = aLatencyMs
+        self.throttleRate = aThrottleRate
+        self.errorRate = aErrorRate
+        self.maxSendRate = aMaxSendRate
+        self.max24HourSend = aMax24HourSend
+        self.sentLast24Hours = aSentLast24Hours
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.throttled = 0
+        self.failed = 0
+        self.calls = 0
+        self.templates = {}
+        # Token bucket da taxa, com rajada de um segundo
+        self.tokens = float(aMaxSendRate)
+        self.updated = time.monotonic()
+
+    def count(self, aField, aAmount=1):
+        with self.lock:
+            setattr(self, aField, getattr(self, aField) + aAmount)
+
+    def admit(self, aRecipients):
+        """Desconta aRecipients das cotas; retorna a mensagem do Throttling ou None"""
+        with self.lock:
+            if 0 <= self.max24HourSend < self.sentLast24Hours + aRecipients:
+                return 'Daily message quota exceeded.'
+            if self.maxSendRate > 0:
+                now = time.monotonic()
+                self.tokens = min(self.maxSendRate, self.tokens + (now - self.updated) * self.maxSendRate)
+                self.updated = now
+                # Um email com mais destinatários que a taxa passa e fica devendo
+                # tokens, como no SES (senão nunca caberia na rajada)
+                if self.tokens < min(aRecipients, self.maxSendRate):
+                    return 'Maximum sending rate exceeded.'
+                self.tokens -= aRecipients
+            self.sentLast24Hours += aRecipients
+            return None
+
+
+def recipientCount(aParams):
+    """Destinatários (To + Cc + Bcc) de um SendEmail/SendBulkTemplatedEmail"""
+    return max(1, sum(1 for k in aParams if re.search(r'Addresses\.member\.\d+$', k)))
+
+
+class SesStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, aStatus, aBody):
+        data = aBody.encode('utf-8')
+        self.send_response(aStatus)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def error(self, aCode, aMessage, aStatus=400):
+        self.reply(aStatus, f"""<ErrorResponse xmlns="{NS}"><Error><Type>Sender</Type><Code>{aCode}</Code><Message>{aMessage}</Message></Error><RequestId>{uuid.uuid4()}</RequestId></ErrorResponse>""")
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        params = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        config = self.server.stubConfig
+        time.sleep(config.latencyMs / 1000.0)
+
+        action = params.get('Action')
+        config.count('calls')
+        if config.errorRate > 0 and random.random() < config.errorRate:
+            config.count('failed')
+            return self.error('ServiceUnavailable', 'Service is unavailable.', 503)
+        if action in ('SendEmail', 'SendRawEmail'):
+            if config.throttleRate > 0 and random.random() < config.throttleRate:
+                config.count('throttled')
+                return self.error('Throttling', 'Maximum sending rate exceeded.')
+            rejected = config.admit(recipientCount(params))
+            if rejected:
+                config.count('throttled')
+                return self.error('Throttling', rejected)
+            config.count('sent')
+            return self.reply(200, f"""<{action}Response xmlns="{NS}"><{action}Result><MessageId>{uuid.uuid4()}</MessageId></{action}Result><ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></{action}Response>""")
+        if action == 'SendBulkTemplatedEmail':
+            return self.sendBulk(params)
+        if action == 'GetSendQuota':
+            with config.lock:
+                quota = f"<Max24HourSend>{float(config.max24HourSend)}</Max24HourSend><MaxSendRate>{float(config.maxSendRate)}</MaxSendRate><SentLast24Hours>{float(config.sentLast24Hours)}</SentLast24Hours>"
+            return self.reply(200, f"""<GetSendQuotaResponse xmlns="{NS}"><GetSendQuotaResult>{quota}</GetSendQuotaResult><ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></GetSendQuotaResponse>""")
+        if action in ('CreateTemplate', 'UpdateTemplate'):
+            config.templates[params['Template.TemplateName']] = (params.get('Template.SubjectPart', ''), params.get('Template.HtmlPart', ''))
+            return self.reply(200, f"""<{action}Response xmlns="{NS}"><{action}Result/><ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></{action}Response>""")
+        if action == 'GetTemplate':
+            name = params.get('TemplateName')
+            if name not in config.templates:
+                return self.error('TemplateDoesNotExist', f'Template {name} does not exist.')
+            subject, html = config.templates[name]
+            return self.reply(200, f"""<GetTemplateResponse xmlns="{NS}"><GetTemplateResult><Template><TemplateName>{escape(name)}</TemplateName><SubjectPart>{escape(subject)}</SubjectPart><HtmlPart>{escape(html)}</HtmlPart></Template></GetTemplateResult><ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></GetTemplateResponse>""")
+        return self.error('InvalidAction', f'Action {action} não suportada pelo stub')
+
+    def sendBulk(self, aParams):
+        config = self.server.stubConfig
+        if aParams.get('Template') not in config.templates:
+            return self.error('TemplateDoesNotExist', f"Template {aParams.get('Template')} does not exist.")
+        destinations = {int(m.group(1)) for m in (re.match(r'Destinations\.member\.(\d+)\.', k) for k in aParams) if m}
+        if config.throttleRate > 0 and random.random() < config.throttleRate:
+            config.count('throttled', len(destinations))
+            return self.error('Throttling', 'Maximum sending rate exceeded.')
+        rejected = config.admit(recipientCount(aParams))
+        if rejected:
+            config.count('throttled', len(destinations))
+            return self.error('Throttling', rejected)
+        config.count('sent', len(destinations))
+        members = "".join(f"<member><Status>Success</Status><MessageId>{uuid.uuid4()}</MessageId></member>" for _ in destinations)
+        return self.reply(200, f"""<SendBulkTemplatedEmailResponse xmlns="{NS}"><SendBulkTemplatedEmailResult><Status>{members}</Status></SendBulkTemplatedEmailResult><ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></SendBulkTemplatedEmailResponse>""")
+
+def startStub(aPort=0, aLatencyMs=50, aThrottleRate=0.0, aMaxSendRate=0, aMax24HourSend=-1, aSentLast24Hours=0,
+              aErrorRate=0.0):
+    """Sobe o stub numa thread e retorna (server, endpoint_url). Porta 0 = porta livre"""
+    server = ThreadingHTTPServer(('127.0.0.1', aPort), SesStubHandler)
+    server.daemon_threads = True
+    server.stubConfig = StubConfig(aLatencyMs, aThrottleRate, aMaxSendRate, aMax24HourSend, aSentLast24Hours, aErrorRate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local do SES")
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--max-send-rate', type=float, default=0, help="destinatários/s da conta (0 = sem limite)")
+    parser.add_argument('--max-24h', type=float, default=-1, help="cota de 24h em destinatários (-1 = sem limite)")
+    parser.add_argument('--sent-24h', type=float, default=0, help="destinatários já enviados nas últimas 24h")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fração das chamadas com ServiceUnavailable")
+    args = parser.parse_args()
+
+    # SIGTERM encerra como o Ctrl+C, imprimindo o resumo
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    server, url = startStub(args.port, args.latency_ms, args.throttle_rate, args.max_send_rate, args.max_24h, args.sent_24h,
+                            args.error_rate)
+    print(f"SES stub ouvindo em {url} (latência {args.latency_ms}ms, throttle {args.throttle_rate:.0%}, "
+          f"taxa {args.max_send_rate:g}/s, cota 24h {args.max_24h:g})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        config = server.stubConfig
+        print(f"\nChamadas: {config.calls} - Enviados: {config.sent} - Throttled: {config.throttled} - Erros: {config.failed}"
+              f" - Destinatários nas últimas 24h: {config.sentLast24Hours:g}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import statistics
+import time
+from modules.Metrics import METRICS
+from modules.TrxQueue import claimableFilter
+
+######################################
+### Manutenção da TRANSACTION_LOG
+######################################
+
+ARCHIVE_TABLE = "TRANSACTION_LOG_ARCHIVE"
+PENDING_INDEX = "IX_TRANSACTION_LOG_PENDING"
+
+# Índice filtrado só com as linhas PENDING: fica do tamanho da fila, não do histórico
+pendingIndexQuery = f"""
+                CREATE NONCLUSTERED INDEX {PENDING_INDEX}
+                    ON dbo.TRANSACTION_LOG (TRX_CODE, TRX_ID)
+                    INCLUDE (NEXT_ATTEMPT)
+                    WHERE TRX_STATUS = 'PENDING'
+         """
+
+# Mesma leitura do claim (filtro e ordem), sem travar nem alterar nada
+pollProbeQuery = """
+                SELECT TOP (?) TRX_ID FROM TRANSACTION_LOG WITH (READPAST)""" + claimableFilter + """
+                ORDER BY TRX_ID;
+         """
+
+def tableColumns(conn, aTable="TRANSACTION_LOG"):
+    iCursor = conn.cursor()
+    iCursor.execute("SELECT name FROM sys.columns WHERE object_id = OBJECT_ID(?) ORDER BY column_id", f"dbo.{aTable}")
+    columns = [r[0] for r in iCursor.fetchall()]
+    iCursor.close()
+    return columns
+
+def archiveBatch(conn, aColumns, aRetentionDays, aBatchSize):
+    """
+    Move até aBatchSize linhas PROCESSED mais antigas que aRetentionDays com
+    um único DELETE ... OUTPUT INTO (atômico) e faz commit. READPAST pula
+    linhas travadas pelo Emailjob em vez de esperar. Retorna quantas moveu.
+    """
+    columnList = ", ".join(f"[{c}]" for c in aColumns)
+    outputList = ", ".join(f"deleted.[{c}]" for c in aColumns)
+    iQuery = f"""
+                DELETE TOP (?) FROM TRANSACTION_LOG WITH (READPAST, ROWLOCK)
+                OUTPUT {outputList} INTO {ARCHIVE_TABLE} ({columnList})
+                WHERE TRX_STATUS = 'PROCESSED'
+                AND PROCESSED_AT < DATEADD(day, -?, SYSUTCDATETIME());
+            """
+    iCursor = conn.cursor()
+    iCursor.execute(iQuery, aBatchSize, aRetentionDays)
+    moved = iCursor.rowcount
+    iCursor.close()
+    conn.commit()
+    return max(moved, 0)
+
+def archiveProcessed(conn, aRetentionDays, aBatchSize, aPauseMs=0, aMaxBatches=0):
+    """
+    Arquiva em lotes pequenos, cada um na sua transação, com uma pausa entre
+    eles para não competir com o Emailjob. aMaxBatches > 0 limita a execução.
+    Retorna o total de linhas movidas.
+    """
+    columns = tableColumns(conn)
+    total = 0
+    batches = 0
+    while aMaxBatches <= 0 or batches < aMaxBatches:
+        with METRICS.timer("dispatcher_stage_seconds", stage="archive_batch"):
+            moved = archiveBatch(conn, columns, aRetentionDays, aBatchSize)
+        batches += 1
+        total += moved
+        METRICS.inc("dispatcher_archived_rows_total", moved)
+        if moved < aBatchSize:
+            break
+        if batches % 50 == 0:
+            print(f"Arquivamento: {total} linhas movidas até agora")
+        if aPauseMs > 0:
+            time.sleep(aPauseMs / 1000.0)
+    return total
+
+def ensurePendingIndex(conn):
+    """
+    Confere o índice filtrado das linhas PENDING e cria se não existir.
+    Retorna 'ok', 'created' ou 'different' (existe com outra definição; não
+    é alterado, só reportado).
+    """
+    iCursor = conn.cursor()
+    iCursor.execute("""
+                SELECT i.filter_definition,
+                       STUFF((SELECT ',' + c.name
+                              FROM sys.index_columns ic
+                              JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+                              WHERE ic.object_id = i.object_id AND ic.index_id = i.index_id AND ic.is_included_column = 0
+                              ORDER BY ic.key_ordinal
+                              FOR XML PATH('')), 1, 1, '')
+                FROM sys.indexes i
+                WHERE i.object_id = OBJECT_ID('dbo.TRANSACTION_LOG') AND i.name = ?
+            """, PENDING_INDEX)
+    row = iCursor.fetchone()
+    if row is not None:
+        iCursor.close()
+        conn.commit()
+        filterDefinition = (row[0] or "").replace(" ", "").upper()
+        return 'ok' if row[1] == "TRX_CODE,TRX_ID" and "'PENDING'" in filterDefinition else 'different'
+    try:
+        # ONLINE evita bloquear a tabela durante a criação (Enterprise/Azure)
+        iCursor.execute(pendingIndexQuery + " WITH (ONLINE = ON);")
+    except Exception:
+        conn.rollback()
+        iCursor = conn.cursor()
+        iCursor.execute(pendingIndexQuery + ";")
+    iCursor.close()
+    conn.commit()
+    return 'created'
+
+def pollLatencyMs(conn, aTrxCodes, aBatchSize, aSamples=5):
+    """Mediana, em ms, da leitura que o claim do Emailjob faz a cada poll"""
+    iQuery = pollProbeQuery.format(codes=",".join("?" * len(aTrxCodes)))
+    samples = []
+    for _ in range(aSamples):
+        iCursor = conn.cursor()
+        start = time.perf_counter()
+        iCursor.execute(iQuery, aBatchSize, *aTrxCodes)
+        iCursor.fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+        iCursor.close()
+    conn.commit()
+    return statistics.median(samples)
@@ -0,0 +1,80 @@
+from modules.DataTypes import decodeTrxInfo
+from modules.EmailRegistry import COALESCE_CODES, SUPERSEDED_BY
+from modules.Suppression import normalizeEmail
+from modules.TrxQueue import claimIds, pendingByOrder
+
+######################################
+### Coalescência de eventos do mesmo pedido
+######################################
+
+def coalesceKey(aTrxCode, aTrxInfo):
+    """(pedido, destinatário) de um evento combinável, ou None"""
+    if int(aTrxCode) not in COALESCE_CODES:
+        return None
+    orderId = getattr(aTrxInfo, 'orderId', None)
+    email = normalizeEmail(getattr(aTrxInfo, 'email', None))
+    if orderId in (None, "") or not email:
+        return None
+    return (str(orderId), email)
+
+def pullSiblings(conn, aItems, aWorkerId, aLeaseSeconds):
+    """
+    Reserva as linhas PENDING dos mesmos pedidos/destinatários dos itens
+    combináveis de aItems [(TRX_ID, TRX_CODE, ATTEMPTS, trxInfo)], inclusive
+    as que ainda estão na janela, e retorna no mesmo formato. Linhas
+    reservadas por outro worker ficam de fora.
+    """
+    keys = {coalesceKey(trxCode, trxInfo) for trxId, trxCode, attempts, trxInfo in aItems} - {None}
+    if not keys:
+        return []
+    known = {int(item[0]) for item in aItems}
+    candidates = {}
+    for trxInfo, trxId, trxCode, attempts in pendingByOrder(conn, list(COALESCE_CODES), sorted({k[0] for k in keys})):
+        try:
+            info = decodeTrxInfo(trxInfo)
+        except Exception:
+            # Não reserva: no claim dela mesma a linha vai para DEAD (Emailjob.sendBatch)
+            continue
+        if int(trxId) not in known and coalesceKey(trxCode, info) in keys:
+            candidates[int(trxId)] = (int(trxId), int(trxCode), attempts, info)
+    if not candidates:
+        return []
+    return [(trxId, candidates[trxId][1], attempts, candidates[trxId][3])
+            for trxId, attempts in claimIds(conn, list(candidates), aWorkerId, aLeaseSeconds)]
+
+def planCoalesced(aPending):
+    """
+    Agrupa aPending [(TRX_ID, handler, trxInfo)] por pedido/destinatário.
+    Em cada grupo fica só o evento mais recente de cada tipo e saem os avisos
+    superados (SUPERSEDED_BY); sobrando um tipo ele vai no envio normal,
+    sobrando vários eles viram um email combinado. Retorna
+    (avulsos [(TRX_ID, handler, trxInfo)], combinados [(TRX_ID, [(handler, trxInfo)])],
+    contribuintes {TRX_ID enviado: [TRX_IDs que seguem o mesmo resultado]}).
+    """
+    singles = []
+    groups = {}
+    for item in aPending:
+        key = coalesceKey(item[1].trxCode, item[2])
+        if key is None:
+            singles.append(item)
+        else:
+            groups.setdefault(key, []).append(item)
+
+    combined = []
+    contributors = {}
+    for items in groups.values():
+        if len(items) == 1:
+            singles.append(items[0])
+            continue
+        latest = {}
+        for item in sorted(items, key=lambda i: i[0]):
+            latest[item[1].trxCode] = item
+        kept = [latest[code] for code in COALESCE_CODES
+                if code in latest and not any(s in latest for s in SUPERSEDED_BY.get(code, ()))]
+        primary = kept[-1]
+        contributors[primary[0]] = [item[0] for item in items if item[0] != primary[0]]
+        if len(kept) == 1:
+            singles.append(primary)
+        else:
+            combined.append((primary[0], [(handler, trxInfo) for trxId, handler, trxInfo in kept]))
+    return singles, combined, contributors
@@ -5,3 +5,16 @@ SITE_N_EMAIL = 4 #Not authoriz
 SITE_0_EMAIL = 5 #New order created
 SITE_6_EMAIL = 6 #Lost password
 SMTP_SERVER = "smtp.braslink.com"
+
+ENQUEUE_MODE_BULK = "bulk" #Set-based enqueue (INSERT ... SELECT ... OUTPUT)
+ENQUEUE_MODE_ROW = "row" #Legacy INSERT + @@IDENTITY + UPDATE per receipt
+RECEIPT_NO_START = -2147483648 #Keyset start, below any RECEIPT_NO
+DAEMON_CHUNK_SIZE = 500 #Default chunk size when polling in daemon mode
+
+TRX_STATUS_PENDING = "PENDING"
+TRX_STATUS_INFLIGHT = "INFLIGHT" #Leased by an Emailjob worker
+TRX_STATUS_PROCESSED = "PROCESSED"
+MAX_IN_PARAMS = 1000 #Keeps IN (...) lists well below SQL Server 2100 parameter limit
+MAX_BULK_DESTINATIONS = 50 #SES SendBulkTemplatedEmail limit per call
+TRX_STATUS_DEAD = "DEAD" #Gave up after EMAILJOB_MAX_ATTEMPTS or a permanent SES error
+TRX_STATUS_SUPPRESSED = "SUPPRESSED" #Recipient is on the bounce/complaint suppression list, not sent
@@ -0,0 +1,32 @@
+import signal
+import threading
+import time
+
+class PollLoop:
+    """
+    Laço de polling para os modos daemon: chama o callback a cada intervalo
+    até receber SIGTERM/SIGINT. O sinal só interrompe a espera entre ciclos,
+    nunca um ciclo em andamento, então o último lote sempre termina com commit.
+    """
+    def __init__(self, aName, aInterval):
+        self.name = aName
+        self.interval = aInterval
+        self.stopEvent = threading.Event()
+        signal.signal(signal.SIGTERM, self._onSignal)
+        signal.signal(signal.SIGINT, self._onSignal)
+
+    def _onSignal(self, signum, frame):
+        print(f"[{self.name}] Sinal {signum} recebido, encerrando após o ciclo atual")
+        self.stopEvent.set()
+
+    def stopped(self):
+        return self.stopEvent.is_set()
+
+    def run(self, aCallback):
+        print(f"[{self.name}] Daemon iniciado, intervalo de {self.interval}s")
+        while not self.stopped():
+            start = time.monotonic()
+            aCallback()
+            elapsed = time.monotonic() - start
+            self.stopEvent.wait(max(0.0, self.interval - elapsed))
+        print(f"[{self.name}] Daemon encerrado")
@@ -1,9 +1,20 @@
 import json
+from types import SimpleNamespace
+
+# Layout compacto de TRX_INFO: lista posicional cujo primeiro item é a versão.
+# v1: [1, receiptNo, orderId, socialName, email, nfeKey]
+# Mudar a ordem ou os campos exige uma nova versão; decodeTrxInfo continua
+# lendo as anteriores e o JSON indentado legado.
+TRX_INFO_VERSION = 1
+
+_compactEncoder = json.JSONEncoder(separators=(',', ':'))
 
 class ReceiptInfo:
+    __slots__ = ('receiptNo', 'orderId', 'socialName', 'email', 'nfeKey')
+
     def __init__(self,
-                 aReceiptNo, 
-                 aOrderId, 
+                 aReceiptNo,
+                 aOrderId,
                  aSocialName,
                  aEmail,
                  aNfeKey):
@@ -16,14 +27,47 @@ class ReceiptInfo:
     def __str__(self):
         return f"{self.receiptNo} - {self.orderId} - {self.socialName} - {self.email} - {self.nfeKey}"
 
+    def toDict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
     def toJSON(self):
-        return json.dumps(self, default=lambda o: o.__dict__, 
-            sort_keys=True, indent=4)
+        """Formato legado (objeto indentado), mantido para quem ainda lê TRX_INFO assim"""
+        return json.dumps(self.toDict(), sort_keys=True, indent=4)
+
+    def encode(self):
+        """Formato compacto versionado"""
+        return _compactEncoder.encode([TRX_INFO_VERSION, self.receiptNo, self.orderId,
+                                       self.socialName, self.email, self.nfeKey])
 
 class TrxLogInfo:
+    __slots__ = ('trxCode', 'trxInfo')
+
     def __init__(self, aTrxCode, aTrxInfo):
         self.trxCode = aTrxCode
         self.trxInfo = aTrxInfo
 
     def __str__(self):
-        return f"{self.trxCode} - {self.trxInfo}"
\ No newline at end of file
+        return f"{self.trxCode} - {self.trxInfo}"
+
+    def toRow(self, aCompact=True):
+        """(TRX_CODE, TRX_INFO) prontos para o INSERT na TRANSACTION_LOG"""
+        return (f"{self.trxCode}", self.trxInfo.encode() if aCompact else self.trxInfo.toJSON())
+
+def decodeTrxInfo(aText):
+    """
+    TRX_INFO -> ReceiptInfo. Lê o layout compacto versionado e o JSON legado
+    (objeto indentado); payloads legados com outros campos, gravados por outros
+    sistemas, voltam como SimpleNamespace, como o Emailjob sempre fez.
+    """
+    value = json.loads(aText)
+    if type(value) is list:
+        if value[0] == 1:
+            return ReceiptInfo(value[1], value[2], value[3], value[4], value[5])
+        raise ValueError(f"Versão de TRX_INFO desconhecida: {value[0]}")
+    if len(value) == 5:
+        try:
+            return ReceiptInfo(value['receiptNo'], value['orderId'], value['socialName'],
+                               value['email'], value['nfeKey'])
+        except KeyError:
+            pass
+    return json.loads(aText, object_hook=lambda d: SimpleNamespace(**d))
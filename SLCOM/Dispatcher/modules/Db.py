@@ -0,0 +1,14 @@
+import os
+import pyodbc
+
+# Obter variáveis de ambiente
+DB_SERVER = os.getenv('AA_DBSERVER')
+DB_DATABASE = os.getenv('AA_DB_DATABASE')
+DB_UID = os.getenv('AA_DB_UID')
+DB_PWD = os.getenv('AA_DB_PWD')
+DB_PORT = os.getenv('AA_DB_PORT')
+
+def connect():
+    """Abre uma conexão com o SQL Server usando as variáveis AA_DB*"""
+    cnxn_str = f"Driver={{ODBC Driver 17 for SQL Server}};PORT={DB_PORT};Server={DB_SERVER};Database={DB_DATABASE};UID={DB_UID};PWD={DB_PWD};"
+    return pyodbc.connect(cnxn_str, autocommit=False)
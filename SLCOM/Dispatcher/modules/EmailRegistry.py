@@ -0,0 +1,101 @@
+import os
+import json
+import modules.Constants
+from modules.Templates import TemplateRegistry
+
+# Prioridades (peso no rateio do claim) e metas de espera na fila em segundos:
+# reset de senha primeiro, emails do pedido/nota depois, avisos por último
+PRIORITY_RESET, TARGET_RESET = 16, 60
+PRIORITY_ORDER, TARGET_ORDER = 4, 900
+PRIORITY_NOTICE, TARGET_NOTICE = 1, 3600
+
+class EmailHandler:
+    """
+    Como transformar uma linha da TRANSACTION_LOG de um TRX_CODE em email.
+    aWeight é a fatia do TRX_CODE em cada ciclo de claim e aTargetSeconds a
+    meta de espera na fila (ver modules/Scheduler.py).
+    """
+    def __init__(self, aTrxCode, aLabel, aSubject, aTemplateName, aCci, aFields, aWeight=PRIORITY_NOTICE, aTargetSeconds=TARGET_NOTICE):
+        self.trxCode = aTrxCode
+        self.label = aLabel
+        self.subject = aSubject
+        self.templateName = aTemplateName
+        self.cci = aCci
+        self.fields = aFields
+        self.weight = aWeight
+        self.targetSeconds = aTargetSeconds
+
+    def render(self, aTrxInfo):
+        return TEMPLATES.render(self.templateName, self.fields(aTrxInfo))
+
+    # Envio bulk: o template fica cadastrado no SES e cada destino leva só os campos
+    def sesTemplateName(self):
+        return f"{SES_TEMPLATE_PREFIX}{self.templateName}"
+
+    def sesTemplateHtml(self):
+        return TEMPLATES.get(self.templateName).toSes()
+
+    def templateData(self, aTrxInfo):
+        return json.dumps({k: str(v) for k, v in self.fields(aTrxInfo).items()})
+
+    # Trecho deste tipo dentro do email combinado da coalescência
+    def sectionTemplateName(self):
+        return f"{self.templateName}_section"
+
+    def defaultTemplateData(self):
+        return json.dumps({name: "" for name in TEMPLATES.get(self.templateName).names})
+
+# Templates em templates/*.html (sintaxe do string.Template: $nome)
+TEMPLATE_DIR = os.getenv('EMAILJOB_TEMPLATE_DIR',
+                         os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates'))
+SES_TEMPLATE_PREFIX = os.getenv('SES_TEMPLATE_PREFIX', 'aquanimal_')
+TEMPLATES = TemplateRegistry(TEMPLATE_DIR, int(os.getenv('EMAILJOB_TEMPLATE_CACHE', '0')))
+
+########################################################
+### Registro TRX_CODE -> handler
+### Novos tipos de evento entram aqui, sem novo laço no Emailjob
+########################################################
+HANDLERS = {
+    modules.Constants.RECEIPT_EMAIL: EmailHandler(modules.Constants.RECEIPT_EMAIL, "Lion Receipt", "Nota Fiscal", "receipt_email", 0,
+                                                  lambda i: dict(nome=i.socialName, nf=i.receiptNo, key=i.nfeKey),
+                                                  PRIORITY_ORDER, TARGET_ORDER),
+    modules.Constants.SITE_0_EMAIL: EmailHandler(modules.Constants.SITE_0_EMAIL, "Site 0-mail", "Recebemos o seu pedido.", "site_0_email", 1,
+                                                 lambda i: dict(nome=i.socialName, ped=i.orderId),
+                                                 PRIORITY_ORDER, TARGET_ORDER),
+    modules.Constants.SITE_V_EMAIL: EmailHandler(modules.Constants.SITE_V_EMAIL, "Site V-mail", "Pedido Enviado!", "site_v_email", 0,
+                                                 lambda i: dict(nome=i.socialName, ped=i.orderId)),
+    modules.Constants.SITE_R_EMAIL: EmailHandler(modules.Constants.SITE_R_EMAIL, "Site r-mail", "Pedido pronto para retirada!", "site_r_email", 0,
+                                                 lambda i: dict(nome=i.socialName, ped=i.orderId)),
+    modules.Constants.SITE_N_EMAIL: EmailHandler(modules.Constants.SITE_N_EMAIL, "Site n-mail", "Cartão não autorizado.", "site_n_email", 0,
+                                                 lambda i: dict(nome=i.socialName, ped=i.orderId),
+                                                 PRIORITY_ORDER, TARGET_ORDER),
+    # Reset de senha: a senha temporária vem no campo socialName
+    modules.Constants.SITE_6_EMAIL: EmailHandler(modules.Constants.SITE_6_EMAIL, "Site 6-mail", "Reset de Senha", "site_6_email", 0,
+                                                 lambda i: dict(senha=i.socialName),
+                                                 PRIORITY_RESET, TARGET_RESET),
+}
+
+def getHandler(aTrxCode):
+    return HANDLERS.get(int(aTrxCode))
+
+########################################################
+### Coalescência (EMAILJOB_COALESCE_WINDOW, ver modules/Coalesce.py):
+### eventos do mesmo pedido e destinatário num email só
+########################################################
+# Tipos que podem ser combinados, na ordem das seções do email combinado
+COALESCE_CODES = (modules.Constants.SITE_0_EMAIL, modules.Constants.RECEIPT_EMAIL,
+                  modules.Constants.SITE_R_EMAIL, modules.Constants.SITE_V_EMAIL)
+# Aviso que perde o sentido quando um destes já está na fila para o mesmo pedido
+SUPERSEDED_BY = {
+    modules.Constants.SITE_0_EMAIL: (modules.Constants.SITE_V_EMAIL, modules.Constants.SITE_R_EMAIL),
+}
+COMBINED_TEMPLATE = "order_update_email"
+
+def renderCombined(aSections):
+    """[(handler, trxInfo)] na ordem de COALESCE_CODES -> (assunto, html, cci)"""
+    trxInfo = aSections[0][1]
+    sections = "".join(TEMPLATES.render(handler.sectionTemplateName(), handler.fields(info)) for handler, info in aSections)
+    # O evento mais recente do pedido vem primeiro no assunto
+    subject = " - ".join(handler.subject for handler, info in reversed(aSections))
+    html = TEMPLATES.render(COMBINED_TEMPLATE, dict(nome=trxInfo.socialName, ped=trxInfo.orderId, secoes=sections))
+    return subject, html, max(handler.cci for handler, info in aSections)
@@ -0,0 +1,200 @@
+import os
+import modules.Constants
+from modules.DataTypes import ReceiptInfo, TrxLogInfo
+from modules.Metrics import METRICS
+
+######################################
+### Enfileiramento de recibos do LION
+######################################
+
+# compact (padrão) grava TRX_INFO no layout versionado de DataTypes; legacy, no JSON indentado antigo
+TRX_INFO_COMPACT = os.getenv('LION_TRX_INFO_FORMAT', 'compact') != 'legacy'
+
+selectQuery = """
+                select	r.RECEIPT_NO,
+                        o.PKId as ORDER_ID,
+                        c.SOCIAL_NAME,
+                        c.EMAIL,
+                        o.NFE_KEY
+                from    receipt r
+                join    [order] o on o.PKId = r.ORDER_ID
+                join    client c on c.PKId = o.CLIENT_ID
+                where   trx_id is null
+                order by r.RECEIPT_NO
+         """
+
+# Mesmo join, paginado por keyset em RECEIPT_NO
+selectChunkQuery = """
+                select	top (?)
+                        r.RECEIPT_NO,
+                        o.PKId as ORDER_ID,
+                        c.SOCIAL_NAME,
+                        c.EMAIL,
+                        o.NFE_KEY
+                from    receipt r
+                join    [order] o on o.PKId = r.ORDER_ID
+                join    client c on c.PKId = o.CLIENT_ID
+                where   trx_id is null
+                and     r.RECEIPT_NO > ?
+                order by r.RECEIPT_NO
+         """
+
+def fetchPendingReceipts(conn):
+    cursor = conn.cursor()
+    cursor.execute(selectQuery)
+    rs = cursor.fetchall()
+    cursor.close()
+    return [ReceiptInfo(r[0],r[1],r[2],r[3],r[4]) for r in rs]
+
+def fetchPendingReceiptsChunk(conn, afterReceiptNo, chunkSize):
+    cursor = conn.cursor()
+    cursor.execute(selectChunkQuery, chunkSize, afterReceiptNo)
+    rs = cursor.fetchall()
+    cursor.close()
+    return [ReceiptInfo(r[0],r[1],r[2],r[3],r[4]) for r in rs]
+
+def saveTrxLog(conn, aTrxInfos):
+    iQuery = """
+                INSERT INTO [TRANSACTION_LOG]
+                    ([TRX_CODE]
+                    ,[TRX_INFO]
+                    ,[TRX_STATUS])
+                VALUES
+                    (?,?,'PENDING')
+            """
+    iCursor = conn.cursor()
+    iCursor.execute(iQuery,aTrxInfos)
+    iCursor.execute("select @@IDENTITY")
+    rs = iCursor.fetchone()
+    trx_id = rs[0]
+    return trx_id
+
+def updateReceiptInTrx(conn, receiptno, trxid):
+    iQuery = """
+                UPDATE RECEIPT
+                    SET TRX_ID = ?
+                WHERE RECEIPT_NO = ?
+            """
+    iCursor = conn.cursor()
+    iCursor.execute(iQuery, trxid, receiptno)
+
+def enqueueReceiptsRowByRow(conn, receipts):
+    """Caminho original: INSERT + @@IDENTITY + UPDATE para cada recibo. Retorna [(ReceiptInfo, TRX_ID)]"""
+    enqueued = []
+    for ri in receipts:
+        tuple = TrxLogInfo(modules.Constants.RECEIPT_EMAIL, ri).toRow(TRX_INFO_COMPACT)
+        i = saveTrxLog(conn, tuple)
+        print(f"Update {ri.receiptNo} with {i}")
+        updateReceiptInTrx(conn, ri.receiptNo, i)
+        enqueued.append((ri, int(i)))
+    return enqueued
+
+def enqueueReceiptsBulk(conn, receipts):
+    """
+    Enfileira o lote inteiro com um número fixo de comandos:
+    carga em tabela temporária (fast_executemany), INSERT ... SELECT na
+    TRANSACTION_LOG e um UPDATE com join na RECEIPT.
+    Gera as mesmas linhas que enqueueReceiptsRowByRow, com os TRX_ID na
+    ordem de RECEIPT_NO como ele. Retorna [(ReceiptInfo, TRX_ID)].
+    """
+    if not receipts:
+        return []
+
+    iCursor = conn.cursor()
+    # Colunas com os tipos reais de RECEIPT e TRANSACTION_LOG (SELECT TOP 0 ... INTO);
+    # o join impede que o IDENTITY de TRX_ID venha junto
+    iCursor.execute("""
+                IF OBJECT_ID('tempdb..#LION_ENQUEUE') IS NOT NULL DROP TABLE #LION_ENQUEUE;
+                IF OBJECT_ID('tempdb..#LION_ENQUEUE_IDS') IS NOT NULL DROP TABLE #LION_ENQUEUE_IDS;
+                IF OBJECT_ID('tempdb..#LION_ENQUEUE_MAP') IS NOT NULL DROP TABLE #LION_ENQUEUE_MAP;
+                SELECT TOP (0) r.RECEIPT_NO, t.TRX_INFO INTO #LION_ENQUEUE
+                    FROM RECEIPT r CROSS JOIN [TRANSACTION_LOG] t;
+                SELECT TOP (0) t.TRX_ID INTO #LION_ENQUEUE_IDS
+                    FROM [TRANSACTION_LOG] t CROSS JOIN RECEIPT r;
+                SELECT TOP (0) r.RECEIPT_NO, t.TRX_ID INTO #LION_ENQUEUE_MAP
+                    FROM RECEIPT r CROSS JOIN [TRANSACTION_LOG] t;
+                CREATE CLUSTERED INDEX IX_LION_ENQUEUE_MAP ON #LION_ENQUEUE_MAP (RECEIPT_NO);
+            """)
+
+    iCursor.fast_executemany = True
+    iCursor.executemany("INSERT INTO #LION_ENQUEUE (RECEIPT_NO, TRX_INFO) VALUES (?,?)",
+                        [(ri.receiptNo, ri.encode() if TRX_INFO_COMPACT else ri.toJSON()) for ri in receipts])
+
+    # INSERT ... SELECT ... ORDER BY garante os IDENTITY na ordem de RECEIPT_NO
+    # (o MERGE não garante ordem); o n-ésimo TRX_ID gerado é do n-ésimo recibo
+    iCursor.execute("""
+                INSERT INTO [TRANSACTION_LOG] ([TRX_CODE], [TRX_INFO], [TRX_STATUS])
+                OUTPUT inserted.TRX_ID INTO #LION_ENQUEUE_IDS (TRX_ID)
+                SELECT ?, s.TRX_INFO, 'PENDING'
+                FROM #LION_ENQUEUE s
+                ORDER BY s.RECEIPT_NO;
+
+                INSERT INTO #LION_ENQUEUE_MAP (RECEIPT_NO, TRX_ID)
+                SELECT s.RECEIPT_NO, i.TRX_ID
+                FROM (SELECT RECEIPT_NO, ROW_NUMBER() OVER (ORDER BY RECEIPT_NO) AS N FROM #LION_ENQUEUE) s
+                JOIN (SELECT TRX_ID, ROW_NUMBER() OVER (ORDER BY TRX_ID) AS N FROM #LION_ENQUEUE_IDS) i ON i.N = s.N;
+            """, f"{modules.Constants.RECEIPT_EMAIL}")
+
+    iCursor.execute("""
+                UPDATE r
+                    SET r.TRX_ID = m.TRX_ID
+                FROM RECEIPT r
+                JOIN #LION_ENQUEUE_MAP m ON m.RECEIPT_NO = r.RECEIPT_NO
+            """)
+
+    iCursor.execute("SELECT RECEIPT_NO, TRX_ID FROM #LION_ENQUEUE_MAP")
+    trxIds = {r[0]: int(r[1]) for r in iCursor.fetchall()}
+
+    iCursor.execute("DROP TABLE #LION_ENQUEUE; DROP TABLE #LION_ENQUEUE_IDS; DROP TABLE #LION_ENQUEUE_MAP;")
+    print(f"Bulk enqueue: {len(receipts)} recibos enfileirados")
+    return [(ri, trxIds[ri.receiptNo]) for ri in receipts]
+
+def enqueueReceipts(conn, receipts, mode):
+    if mode == modules.Constants.ENQUEUE_MODE_ROW:
+        return enqueueReceiptsRowByRow(conn, receipts)
+    return enqueueReceiptsBulk(conn, receipts)
+
+def dispatchAll(conn, mode):
+    """Lê todos os recibos pendentes e enfileira em uma única transação"""
+    with METRICS.timer("dispatcher_stage_seconds", stage="lion_fetch"):
+        receipts = fetchPendingReceipts(conn)
+    print(f"=== DEBUG: Total de registros encontrados: {len(receipts)} ===")
+    with METRICS.timer("dispatcher_stage_seconds", stage="lion_enqueue"):
+        enqueueReceipts(conn, receipts, mode)
+    with METRICS.timer("dispatcher_stage_seconds", stage="lion_commit"):
+        conn.commit()
+    METRICS.inc("dispatcher_receipts_enqueued_total", len(receipts))
+    return len(receipts)
+
+def dispatchChunked(conn, mode, chunkSize, afterReceiptNo=modules.Constants.RECEIPT_NO_START, onCommitted=None):
+    """
+    Lê os recibos pendentes em blocos de chunkSize ordenados por RECEIPT_NO e
+    faz commit de cada bloco. Uma falha só desfaz o bloco corrente; como os
+    blocos já gravados têm TRX_ID, a próxima execução continua de onde parou.
+    onCommitted, se informado, recebe [(ReceiptInfo, TRX_ID)] de cada bloco
+    já gravado. Retorna (total enfileirado, último RECEIPT_NO processado).
+    """
+    total = 0
+    while True:
+        with METRICS.timer("dispatcher_stage_seconds", stage="lion_fetch"):
+            receipts = fetchPendingReceiptsChunk(conn, afterReceiptNo, chunkSize)
+        if not receipts:
+            break
+        try:
+            with METRICS.timer("dispatcher_stage_seconds", stage="lion_enqueue"):
+                enqueued = enqueueReceipts(conn, receipts, mode)
+            with METRICS.timer("dispatcher_stage_seconds", stage="lion_commit"):
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            METRICS.inc("dispatcher_errors_total", stage="lion_enqueue")
+            raise
+        METRICS.inc("dispatcher_receipts_enqueued_total", len(receipts))
+        if onCommitted is not None:
+            onCommitted(enqueued)
+        total += len(receipts)
+        afterReceiptNo = receipts[-1].receiptNo
+        print(f"Chunk de {len(receipts)} recibos gravado (até RECEIPT_NO {afterReceiptNo}, total {total})")
+        if len(receipts) < chunkSize:
+            break
+    return total, afterReceiptNo
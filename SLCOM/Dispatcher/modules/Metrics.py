@@ -0,0 +1,160 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Diretório onde cada script grava <nome>.prom / <nome>.json (ex: textfile collector do node_exporter)
+METRICS_DIR = os.getenv('METRICS_DIR')
+# prom (Prometheus textfile) ou json
+METRICS_FORMAT = os.getenv('METRICS_FORMAT', 'prom')
+# Modo daemon: intervalo mínimo em segundos entre duas exportações
+METRICS_INTERVAL = float(os.getenv('METRICS_INTERVAL', '60'))
+
+# Limites superiores (segundos) dos buckets dos histogramas de latência
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Histograma de buckets fixos: observe() é um bisect e três somas"""
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, aValue):
+        self.buckets[bisect.bisect_left(BUCKETS, aValue)] += 1
+        self.count += 1
+        self.sum += aValue
+
+    def quantile(self, aQ):
+        """Aproximação pelo limite superior do bucket que contém o quantil"""
+        if self.count == 0:
+            return 0.0
+        rank = aQ * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else float('inf')
+        return float('inf')
+
+def labelKey(aLabels):
+    return tuple(sorted((k, str(v)) for k, v in aLabels.items()))
+
+def formatLabels(aKey, aExtra=()):
+    pairs = list(aKey) + list(aExtra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+class Metrics:
+    """
+    Registro de métricas do processo: histogramas de latência, contadores e
+    gauges, todos com labels. Seguro entre threads (os envios do SES rodam
+    no pool de threads do SesSender).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.started = time.time()
+        self.lastExport = time.monotonic()
+
+    def observe(self, aName, aSeconds, **aLabels):
+        key = (aName, labelKey(aLabels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(aSeconds)
+
+    @contextmanager
+    def timer(self, aName, **aLabels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(aName, time.perf_counter() - start, **aLabels)
+
+    def inc(self, aName, aValue=1, **aLabels):
+        key = (aName, labelKey(aLabels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + aValue
+
+    def setGauge(self, aName, aValue, **aLabels):
+        with self.lock:
+            self.gauges[(aName, labelKey(aLabels))] = aValue
+
+    def clearGauge(self, aName):
+        with self.lock:
+            for key in [k for k in self.gauges if k[0] == aName]:
+                del self.gauges[key]
+
+    def toPrometheus(self):
+        lines = []
+        typed = set()
+        def family(aName, aType):
+            if aName not in typed:
+                typed.add(aName)
+                lines.append(f"# TYPE {aName} {aType}")
+        with self.lock:
+            for (name, key), value in sorted(self.counters.items()):
+                family(name, "counter")
+                lines.append(f"{name}{formatLabels(key)} {value}")
+            for (name, key), value in sorted(self.gauges.items()):
+                family(name, "gauge")
+                lines.append(f"{name}{formatLabels(key)} {value}")
+            for (name, key), h in sorted(self.histograms.items()):
+                family(name, "histogram")
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ('+Inf',), h.buckets):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{formatLabels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{formatLabels(key)} {h.sum:.6f}")
+                lines.append(f"{name}_count{formatLabels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def toDict(self):
+        with self.lock:
+            return {
+                'started': self.started,
+                'exported': time.time(),
+                'counters': [dict(name=n, labels=dict(k), value=v) for (n, k), v in sorted(self.counters.items())],
+                'gauges': [dict(name=n, labels=dict(k), value=v) for (n, k), v in sorted(self.gauges.items())],
+                'histograms': [dict(name=n, labels=dict(k), count=h.count, sum=round(h.sum, 6),
+                                    p50=h.quantile(0.5), p90=h.quantile(0.9), p99=h.quantile(0.99))
+                               for (n, k), h in sorted(self.histograms.items())],
+            }
+
+    def summary(self):
+        """Uma linha por histograma para o log: contagem, média e p50/p99 em ms"""
+        lines = []
+        with self.lock:
+            for (name, key), h in sorted(self.histograms.items()):
+                mean = h.sum / h.count if h.count else 0.0
+                lines.append(f"{name}{formatLabels(key)} n={h.count} avg={mean * 1000:.1f}ms "
+                             f"p50<={h.quantile(0.5) * 1000:g}ms p99<={h.quantile(0.99) * 1000:g}ms")
+        return lines
+
+    def export(self, aJobName):
+        """Grava <METRICS_DIR>/<aJobName>.prom|.json de forma atômica (arquivo temporário + rename)"""
+        self.lastExport = time.monotonic()
+        if not METRICS_DIR:
+            return None
+        ext = 'json' if METRICS_FORMAT == 'json' else 'prom'
+        path = os.path.join(METRICS_DIR, f"{aJobName}.{ext}")
+        content = json.dumps(self.toDict(), indent=2) if ext == 'json' else self.toPrometheus()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp, path)
+        return path
+
+    def exportDue(self):
+        """Modo daemon: já passou METRICS_INTERVAL desde a última exportação?"""
+        return time.monotonic() - self.lastExport >= METRICS_INTERVAL
+
+# Registro único do processo, usado pelos módulos e pelos scripts
+METRICS = Metrics()
@@ -0,0 +1,48 @@
+import random
+import modules.Constants
+import modules.TrxQueue
+
+# Erros do SES que valem nova tentativa: throttling e falhas transitórias.
+# Erros sem código (timeout) também são tratados como transitórios.
+RETRYABLE_ERRORS = {
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'AccountThrottled',
+    'TransientFailure',
+    'ServiceUnavailable',
+    'InternalFailure',
+    'RequestTimeout',
+    'EndpointConnectionError',
+}
+
+class RetryPolicy:
+    """
+    Decide o destino de um envio que falhou: nova tentativa com backoff
+    exponencial com jitter ("full jitter": espera aleatória entre 0 e
+    base * 2^tentativas, limitada a aMaxDelayMs) ou DEAD, quando o erro é
+    permanente ou as tentativas acabaram.
+    """
+    def __init__(self, aMaxAttempts, aBaseDelayMs, aMaxDelayMs):
+        self.maxAttempts = aMaxAttempts
+        self.baseDelayMs = aBaseDelayMs
+        self.maxDelayMs = aMaxDelayMs
+
+    def isRetryable(self, aResult):
+        return aResult.errorCode is None or aResult.errorCode in RETRYABLE_ERRORS
+
+    def delayMs(self, aAttempts):
+        ceiling = min(self.maxDelayMs, self.baseDelayMs * (2 ** aAttempts))
+        return int(random.uniform(0, ceiling))
+
+    def fail(self, conn, aWorkerId, aResult, aAttempts):
+        """Registra a falha de aResult (aAttempts = tentativas anteriores); retorna o novo status"""
+        error = f"{aResult.errorCode}: {aResult.error}" if aResult.errorCode else aResult.error
+        if self.isRetryable(aResult) and aAttempts + 1 < self.maxAttempts:
+            delay = self.delayMs(aAttempts)
+            modules.TrxQueue.trxRetry(conn, aResult.trxId, aWorkerId, delay, error)
+            print(f"↻ Trx Id {aResult.trxId}: tentativa {aAttempts + 1} falhou, nova tentativa em {delay / 1000:.1f}s")
+            return modules.Constants.TRX_STATUS_PENDING
+        modules.TrxQueue.trxDead(conn, aResult.trxId, aWorkerId, error)
+        print(f"☠ Trx Id {aResult.trxId}: movido para DEAD após {aAttempts + 1} tentativa(s)")
+        return modules.Constants.TRX_STATUS_DEAD
@@ -0,0 +1,74 @@
+from modules.Metrics import METRICS
+from modules.TrxQueue import claimPending
+
+# Tipo acima da meta de espera tem o peso multiplicado por isso até alcançá-la
+LATE_BOOST = 4
+
+class PriorityScheduler:
+    """
+    Reparte cada lote do claim entre os TRX_CODE pelo peso dos handlers
+    (deficit round robin): com todos os tipos cheios, um reset de senha
+    (peso 16) sai na frente de 16 avisos (peso 1), mas os avisos continuam
+    andando a cada rodada. A fração não usada de uma cota fica de crédito
+    para a rodada seguinte, então mesmo um peso pequeno diante de um lote
+    pequeno chega à sua vez.
+
+    Cada rodada reserva uma fatia de cada tipo ativo, na ordem de prioridade,
+    e devolve tudo como um lote só. Um tipo sai da rodada quando o claim
+    volta com menos linhas que a cota (não há mais o que pegar agora). A
+    espera na fila (ENQUEUED_AT) é medida no claim; o tipo que passou da
+    meta ganha LATE_BOOST no peso até a espera voltar para dentro dela.
+    aHoldCodes/aHoldSeconds seguram a janela de coalescência no claim.
+    """
+    def __init__(self, aHandlers, aBatchSize, aHoldCodes=(), aHoldSeconds=0):
+        self.handlers = sorted(aHandlers, key=lambda h: (-h.weight, h.trxCode))
+        self.batchSize = max(1, int(aBatchSize))
+        self.deficit = {h.trxCode: 0.0 for h in self.handlers}
+        self.late = set()
+        self.holdCodes = aHoldCodes
+        self.holdSeconds = aHoldSeconds
+
+    def weight(self, aHandler):
+        return aHandler.weight * (LATE_BOOST if aHandler.trxCode in self.late else 1)
+
+    def batches(self, conn, aWorkerId, aLeaseSeconds):
+        """Gera lotes reservados [(TRX_INFO, TRX_ID, TRX_CODE, ATTEMPTS, espera)] até a fila esvaziar"""
+        active = list(self.handlers)
+        while active:
+            totalWeight = sum(self.weight(h) for h in active)
+            rs = []
+            for handler in list(active):
+                quota = self.deficit[handler.trxCode] + self.batchSize * self.weight(handler) / totalWeight
+                count = int(quota)
+                if count == 0:
+                    self.deficit[handler.trxCode] = quota
+                    continue
+                rows = claimPending(conn, [handler.trxCode], aWorkerId, count, aLeaseSeconds,
+                                    self.holdCodes, self.holdSeconds)
+                self.observe(handler, rows)
+                rs.extend(rows)
+                if len(rows) < count:
+                    # Esvaziou: crédito não acumula para um tipo sem fila
+                    self.deficit[handler.trxCode] = 0.0
+                    active.remove(handler)
+                else:
+                    self.deficit[handler.trxCode] = quota - count
+            if rs:
+                yield rs
+
+    def observe(self, aHandler, aRows):
+        """Registra a maior espera do claim e atualiza o atraso do tipo"""
+        waits = [r[4] for r in aRows if r[4] is not None]
+        if not waits:
+            return
+        wait = max(waits)
+        METRICS.setGauge("dispatcher_claim_wait_seconds", wait, trx_code=aHandler.trxCode)
+        missed = sum(1 for w in waits if w > aHandler.targetSeconds)
+        if missed:
+            METRICS.inc("dispatcher_target_missed_total", missed, trx_code=aHandler.trxCode)
+        if wait > aHandler.targetSeconds:
+            if aHandler.trxCode not in self.late:
+                print(f"⚠ {aHandler.label}: espera de {wait}s na fila, meta de {aHandler.targetSeconds}s")
+            self.late.add(aHandler.trxCode)
+        else:
+            self.late.discard(aHandler.trxCode)
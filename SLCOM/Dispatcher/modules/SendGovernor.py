@@ -0,0 +1,269 @@
+import threading
+import time
+from modules.Metrics import METRICS
+
+# Códigos do SES para excesso de taxa; o fim da cota de 24h vem com o mesmo
+# código e a mensagem "Daily message quota exceeded."
+THROTTLE_ERRORS = {'Throttling', 'ThrottlingException', 'TooManyRequestsException'}
+DAILY_QUOTA_MESSAGE = "daily message quota exceeded"
+# Redução multiplicativa a cada throttling, no máximo uma por DECREASE_COOLDOWN
+# segundos (os envios em andamento voltam com throttling todos juntos)
+DECREASE_FACTOR = 0.7
+DECREASE_COOLDOWN = 1.0
+# Fração do teto devolvida à taxa a cada segundo sem throttling
+INCREASE_STEP = 0.05
+# A taxa nunca desce abaixo desta fração do teto
+MIN_RATE_FRACTION = 0.05
+
+class TokenBucket:
+    """Limita a taxa de envio (tokens por segundo) permitindo rajadas de até aCapacity"""
+    def __init__(self, aRate, aCapacity=None):
+        self.rate = float(aRate)
+        self.capacity = float(aCapacity if aCapacity else max(1.0, aRate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def setRate(self, aRate):
+        """Muda a taxa (e a rajada, se ela vier da taxa) mantendo os tokens acumulados"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.capacity == max(1.0, self.rate):
+                self.capacity = max(1.0, float(aRate))
+                self.tokens = min(self.tokens, self.capacity)
+            self.rate = float(aRate)
+
+    def acquire(self, aCount=1):
+        for _ in range(aCount):
+            self._acquireOne()
+
+    def _acquireOne(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class SendGovernor:
+    """
+    Taxa e concorrência dos envios ajustadas aos limites da conta SES.
+
+    refresh() lê GetSendQuota a cada aRefreshSeconds: MaxSendRate é o teto
+    da taxa (destinatários por segundo, como o SES conta) e Max24HourSend -
+    SentLast24Hours é a cota restante do dia, descontado o que este processo
+    enviou desde a leitura. A cota é da conta, então os outros processos que
+    enviam (outros workers, o send_welcome_email.py) entram a cada leitura.
+    Sem permissão para ler a cota vale aFallbackRate, sem limite diário;
+    aMaxRate > 0 limita o teto abaixo da taxa da conta.
+
+    Cada throttling de taxa reduz a taxa e a concorrência em DECREASE_FACTOR;
+    cada segundo sem throttling devolve INCREASE_STEP do teto à taxa e um
+    envio à concorrência (AIMD): a taxa fica rente ao teto, mesmo dividido
+    entre vários processos, sem uma tempestade de erros.
+
+    admits() decide se um email do lote entra agora e reserva a sua parte da
+    cota até o release() do envio (os que não chegam a ser enviados voltam
+    no settle(), chamado quando o lote termina). Com a cota do dia abaixo de
+    aReserve (fração de Max24HourSend) só passam os de peso >=
+    aReserveWeight; com a cota esgotada nada passa até a próxima leitura.
+    """
+    def __init__(self, aFallbackRate=0, aReserve=0.1, aReserveWeight=0, aRefreshSeconds=60, aMaxRate=0):
+        self.fallbackRate = float(aFallbackRate or 0)
+        self.maxRate = float(aMaxRate or 0)
+        self.reserve = float(aReserve)
+        self.reserveWeight = aReserveWeight
+        self.refreshSeconds = aRefreshSeconds
+        # Labels das métricas; o SenderPool põe o endpoint de cada governor
+        self.labels = {}
+        self.client = None
+        self.maxConcurrency = 1
+        self.limit = 1
+        self.active = 0
+        self.ceiling = self.fallbackRate
+        self.rate = self.fallbackRate
+        self.bucket = None
+        self.max24 = None
+        self.sent24 = 0
+        self.sentSinceRefresh = 0
+        self.admitted = 0
+        self.quotaKnown = False
+        self.warned = False
+        self.lastRefresh = None
+        self.lastIncrease = time.monotonic()
+        self.lastDecrease = 0.0
+        self.lock = threading.Lock()
+        self.slots = threading.Condition(self.lock)
+        self.refreshLock = threading.Lock()
+
+    def attach(self, aClient, aMaxConcurrency):
+        """Chamado pelo SesSender com o client e a concorrência máxima"""
+        self.client = aClient
+        self.maxConcurrency = self.limit = max(1, int(aMaxConcurrency))
+        # O botocore repete o throttling sozinho: cada tentativa passa por aqui
+        aClient.meta.events.register('needs-retry.ses', self.onAttempt)
+        self.refresh()
+
+    def refresh(self):
+        """Relê a cota da conta; numa falha segue com os valores atuais"""
+        try:
+            quota = self.client.get_send_quota()
+        except Exception as e:
+            if not self.warned:
+                rate = f"{self.fallbackRate:g} envios/s" if self.fallbackRate > 0 else "sem limite de taxa"
+                print(f"⚠ GetSendQuota indisponível ({e}); usando {rate}, sem limite diário")
+                self.warned = True
+            with self.lock:
+                self.lastRefresh = time.monotonic()
+                if not self.quotaKnown:
+                    self._setCeiling(self.fallbackRate)
+            return
+        with self.lock:
+            self.quotaKnown = True
+            self.lastRefresh = time.monotonic()
+            self.max24 = None if quota['Max24HourSend'] < 0 else quota['Max24HourSend']
+            self.sent24 = quota['SentLast24Hours']
+            self.sentSinceRefresh = 0
+            self._setCeiling(quota['MaxSendRate'])
+        self.publish()
+
+    def refreshIfDue(self):
+        if self.lastRefresh is not None and time.monotonic() - self.lastRefresh < self.refreshSeconds:
+            return
+        # Uma thread relê; as outras seguem com os valores atuais
+        if self.refreshLock.acquire(blocking=False):
+            try:
+                self.refresh()
+            finally:
+                self.refreshLock.release()
+
+    def _setCeiling(self, aRate):
+        ceiling = float(aRate or 0)
+        if self.maxRate > 0 and (ceiling <= 0 or ceiling > self.maxRate):
+            ceiling = self.maxRate
+        if ceiling == self.ceiling and self.bucket is not None:
+            return
+        # Começa no teto; depois um teto novo só limita a taxa atual, que sobe sozinha
+        self.rate = ceiling if self.bucket is None or ceiling <= 0 else min(self.rate, ceiling)
+        self.ceiling = ceiling
+        if ceiling <= 0:
+            self.bucket = None
+        elif self.bucket is None:
+            self.bucket = TokenBucket(self.rate)
+        else:
+            self.bucket.setRate(self.rate)
+
+    def remaining(self):
+        """Envios que ainda cabem na cota de 24h (None = sem limite ou desconhecida)"""
+        if self.max24 is None:
+            return None
+        return self.max24 - self.sent24 - self.sentSinceRefresh
+
+    def capacity(self, aWeight):
+        """Destinatários que ainda cabem na cota do dia para um email de peso aWeight (None = sem limite)"""
+        self.refreshIfDue()
+        with self.lock:
+            return self._capacity(aWeight)
+
+    def _capacity(self, aWeight):
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        left = remaining - self.admitted
+        # Abaixo da reserva só entram os de peso >= aReserveWeight
+        if aWeight < self.reserveWeight:
+            left -= self.max24 * self.reserve
+        return left
+
+    def admits(self, aWeight, aRecipients=1):
+        """Reserva aRecipients da cota do dia para um email de peso aWeight; False = adiar"""
+        self.refreshIfDue()
+        with self.lock:
+            capacity = self._capacity(aWeight)
+            if capacity is None:
+                return True
+            if capacity < aRecipients:
+                return False
+            self.admitted += aRecipients
+            return True
+
+    def settle(self):
+        """Lote terminado: devolve a reserva dos emails admitidos e não enviados"""
+        with self.lock:
+            self.admitted = 0
+
+    def acquire(self, aRecipients=1):
+        """Espera uma vaga de concorrência e os tokens de aRecipients destinatários"""
+        self.refreshIfDue()
+        with self.slots:
+            while self.active >= self.limit:
+                self.slots.wait()
+            self.active += 1
+            bucket = self.bucket
+        if bucket is not None:
+            bucket.acquire(aRecipients)
+
+    def release(self, aRecipients, aOk):
+        """Libera a vaga e a reserva; um envio aceito conta na cota e pode subir a taxa"""
+        now = time.monotonic()
+        with self.slots:
+            self.active -= 1
+            self.admitted = max(0, self.admitted - aRecipients)
+            if aOk:
+                self.sentSinceRefresh += aRecipients
+                if now - max(self.lastIncrease, self.lastDecrease) >= 1.0:
+                    self._increase(now)
+            self.slots.notify_all()
+        self.publish()
+
+    def onAttempt(self, response=None, **kwargs):
+        """Evento needs-retry do botocore: reduz a taxa a cada tentativa com throttling"""
+        if response is None:
+            return None
+        error = response[1].get('Error', {})
+        if error.get('Code') not in THROTTLE_ERRORS:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            if DAILY_QUOTA_MESSAGE in (error.get('Message') or "").lower():
+                kind = "daily"
+                # O SES diz que acabou: vale até a próxima leitura da cota
+                if self.max24 is not None:
+                    self.sentSinceRefresh = self.max24 - self.sent24
+            else:
+                kind = "rate"
+                if now - self.lastDecrease >= DECREASE_COOLDOWN:
+                    self._decrease(now)
+        METRICS.inc("ses_throttled_total", kind=kind, **self.labels)
+        self.publish()
+        # None: a decisão de repetir continua com o botocore
+        return None
+
+    def _increase(self, aNow):
+        self.lastIncrease = aNow
+        if self.ceiling > 0 and self.rate < self.ceiling:
+            self.rate = min(self.ceiling, self.rate + self.ceiling * INCREASE_STEP)
+            self.bucket.setRate(self.rate)
+        self.limit = min(self.maxConcurrency, self.limit + 1)
+
+    def _decrease(self, aNow):
+        self.lastDecrease = aNow
+        if self.ceiling > 0:
+            self.rate = max(self.ceiling * MIN_RATE_FRACTION, self.rate * DECREASE_FACTOR)
+            self.bucket.setRate(self.rate)
+        self.limit = max(1, int(self.limit * DECREASE_FACTOR))
+        print(f"↻ Throttling do SES: taxa reduzida para {self.rate:.1f}/s, {self.limit} envios simultâneos")
+
+    def publish(self):
+        METRICS.setGauge("ses_send_rate_limit", round(self.rate, 3), **self.labels)
+        METRICS.setGauge("ses_max_send_rate", self.ceiling, **self.labels)
+        METRICS.setGauge("ses_concurrency_limit", self.limit, **self.labels)
+        remaining = self.remaining()
+        if remaining is not None:
+            METRICS.setGauge("ses_quota_remaining", remaining, **self.labels)
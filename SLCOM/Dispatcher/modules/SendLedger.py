@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import threading
+import time
+
+class SendLedger:
+    """
+    Registro local (SQLite em modo WAL) dos emails que o SES já aceitou e que
+    ainda não estão PROCESSED no banco: TRX_ID -> MessageId.
+
+    record() grava logo após cada envio bem-sucedido; o Emailjob consulta
+    get() antes de enviar e pula o que já está aqui, então uma queda entre o
+    envio e o commit no banco não gera reenvio. Depois que o PROCESSED é
+    commitado, reconciled() apaga as entradas. Na inicialização as entradas
+    que sobraram são reconciliadas com o banco em lote.
+
+    As consultas vão para um dict em memória carregado na abertura; o SQLite
+    só é tocado para gravar. Com synchronous=NORMAL no WAL cada gravação
+    sobrevive à queda do processo sem fsync por email (uma queda de energia
+    pode perder as últimas).
+    """
+    def __init__(self, aPath):
+        directory = os.path.dirname(aPath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = aPath
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(aPath, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+                CREATE TABLE IF NOT EXISTS sent (
+                    trx_id INTEGER PRIMARY KEY,
+                    message_id TEXT NOT NULL,
+                    sent_at REAL NOT NULL
+                )
+            """)
+        self.sent = dict(self.db.execute("SELECT trx_id, message_id FROM sent"))
+
+    def get(self, aTrxId):
+        """MessageId do envio já feito para aTrxId, ou None"""
+        return self.sent.get(int(aTrxId))
+
+    def record(self, aTrxId, aMessageId):
+        trxId = int(aTrxId)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO sent (trx_id, message_id, sent_at) VALUES (?, ?, ?)",
+                            (trxId, aMessageId or "", time.time()))
+            self.sent[trxId] = aMessageId or ""
+
+    def pending(self):
+        """TRX_IDs enviados cujo PROCESSED ainda não foi confirmado"""
+        with self.lock:
+            return list(self.sent)
+
+    def reconciled(self, aTrxIds):
+        """Remove as entradas cujo PROCESSED já foi commitado no banco"""
+        ids = [int(i) for i in aTrxIds]
+        if not ids:
+            return
+        with self.lock:
+            self.db.execute("BEGIN")
+            self.db.executemany("DELETE FROM sent WHERE trx_id = ?", [(i,) for i in ids])
+            self.db.execute("COMMIT")
+            for trxId in ids:
+                self.sent.pop(trxId, None)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,293 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import modules.Constants
+from modules.Metrics import METRICS
+from modules.SendGovernor import THROTTLE_ERRORS
+from modules.SesSender import CONNECT_ERROR
+
+# Erros que dizem respeito ao endpoint (região/identidade), não ao destinatário:
+# contam para o failover e o email vai na hora para outro endpoint
+ENDPOINT_ERRORS = {
+    'ServiceUnavailable',
+    'InternalFailure',
+    'AccessDenied',
+    'InvalidClientTokenId',
+    'SignatureDoesNotMatch',
+    'AccountSendingPausedException',
+    'MailFromDomainNotVerifiedException',
+    CONNECT_ERROR,
+}
+# Novas tentativas internas do boto3 em cada endpoint: poucas, para o pool
+# ver logo um endpoint fora do ar e mandar o email para outro
+ENDPOINT_MAX_RETRIES = 1
+# Peso da última medição na média móvel da latência de cada endpoint
+LATENCY_ALPHA = 0.2
+
+def parseEndpoints(aSpec):
+    """'região|identidade[|endpoint_url], ...' -> [(região, identidade, endpoint_url ou None)]"""
+    endpoints = []
+    for entry in aSpec.split(','):
+        parts = [p.strip() for p in entry.split('|')]
+        if not parts[0]:
+            continue
+        if len(parts) < 2 or not parts[1]:
+            raise ValueError(f"Endpoint SES sem identidade: '{entry.strip()}' (use região|identidade[|url])")
+        endpoints.append((parts[0], parts[1], parts[2] if len(parts) > 2 and parts[2] else None))
+    return endpoints
+
+class Endpoint:
+    """Um SesSender (região + identidade) e o estado de saúde e latência dele no pool"""
+    def __init__(self, aSender, aName):
+        self.sender = aSender
+        self.name = aName
+        self.inflight = 0
+        self.latency = None
+        self.errors = 0
+        self.up = True
+        self.retryAt = 0.0
+        self.checkedAt = 0.0
+
+    def rate(self):
+        """Envios/s disponíveis agora: a taxa atual do governor ou a fixa (0 = sem limite)"""
+        governor = self.sender.governor
+        if governor is not None:
+            return governor.rate
+        return self.sender.bucket.rate if self.sender.bucket is not None else 0
+
+    def cost(self):
+        """
+        Tempo estimado até o próximo envio terminar: a fila dos que já estão
+        em andamento na taxa do endpoint mais a latência observada
+        """
+        rate = self.rate()
+        queue = (self.inflight + 1) / rate if rate > 0 else 0.0
+        return queue + (self.latency if self.latency is not None else 0.0)
+
+class SenderPool:
+    """
+    Vários endpoints do SES (região + identidade de envio), cada um um
+    SesSender com o seu governor, já que a taxa e a cota do SES são por
+    região. Mesma interface do SesSender para o Emailjob.
+
+    Cada envio vai para o endpoint disponível com o menor custo estimado
+    (Endpoint.cost): quem tem mais taxa livre e responde mais rápido leva
+    mais emails, e um endpoint que fica lento perde tráfego sozinho.
+    Endpoints sem cota do dia para o email ficam de fora enquanto houver
+    outro.
+
+    admits() só confere a cota somada dos endpoints e a reserva no pool; no
+    envio pick() passa a reserva para o endpoint escolhido, que é quem
+    devolve no release() do governor dele.
+
+    aFailoverAfter erros seguidos de endpoint (ENDPOINT_ERRORS, conexão,
+    timeout) tiram o endpoint do pool; um email que falhou com um desses
+    códigos ou com throttling vai na hora para outro endpoint. Os senders
+    do pool devem ser criados com aMaxRetries=ENDPOINT_MAX_RETRIES, senão
+    o boto3 prende os envios repetindo numa região fora do ar.
+
+    checkHealth() consulta GetSendQuota de cada endpoint a cada aHealthInterval segundos: o que
+    está fora volta quando responde, e a latência dos que estão ociosos é
+    atualizada.
+    """
+    def __init__(self, aSenders, aFailoverAfter=5, aHealthInterval=30):
+        self.endpoints = [Endpoint(sender, f"{region}/{sender.fromEmail}") for region, sender in aSenders]
+        # Os governors publicaram sem label ao serem criados: uma série por endpoint
+        for name in ("ses_send_rate_limit", "ses_max_send_rate", "ses_concurrency_limit", "ses_quota_remaining"):
+            METRICS.clearGauge(name)
+        for endpoint in self.endpoints:
+            if endpoint.sender.governor is not None:
+                endpoint.sender.governor.labels = {'endpoint': endpoint.name}
+                endpoint.sender.governor.publish()
+        self.failoverAfter = aFailoverAfter
+        self.healthInterval = aHealthInterval
+        self.concurrency = sum(e.sender.concurrency for e in self.endpoints)
+        # Templates do envio bulk, recadastrados num endpoint que volta ao pool
+        self.templates = {}
+        # Destinatários admitidos no lote e ainda sem endpoint
+        self.admitted = 0
+        self.lock = threading.Lock()
+        self.healthLock = threading.Lock()
+        self.publish()
+
+    def recipients(self, aCci):
+        return self.endpoints[0].sender.recipients(aCci)
+
+    def admits(self, aWeight, aRecipients=1):
+        """Os endpoints disponíveis, somados, têm cota do dia para o email; reserva no pool"""
+        capacities = [e.sender.capacity(aWeight) for e in self.available()]
+        if None in capacities:
+            return True
+        with self.lock:
+            if sum(max(0, c) for c in capacities) - self.admitted < aRecipients:
+                return False
+            self.admitted += aRecipients
+            return True
+
+    def unreserve(self, aRecipients):
+        with self.lock:
+            self.admitted = max(0, self.admitted - aRecipients)
+
+    def settle(self):
+        with self.lock:
+            self.admitted = 0
+        for endpoint in self.endpoints:
+            endpoint.sender.settle()
+
+    def available(self):
+        """Endpoints no ar; se todos caíram, todos (um deles pode ter voltado)"""
+        up = [e for e in self.endpoints if e.up]
+        return up or list(self.endpoints)
+
+    def pick(self, aExclude=(), aWeight=0, aRecipients=1):
+        """
+        O endpoint de menor custo que admite o email (a cota fica reservada
+        nele); se nenhum admite, o de menor custo
+        """
+        self.checkHealthIfDue()
+        with self.lock:
+            candidates = [e for e in self.available() if e not in aExclude]
+            if not candidates:
+                return None
+            # Um endpoint travado não acumula mais envios do que a sua concorrência
+            ranked = sorted(candidates, key=lambda e: (e.inflight >= e.sender.concurrency, e.cost()))
+        # Fora do lock: o admits() pode reler a cota (GetSendQuota) do endpoint
+        endpoint = next((e for e in ranked if e.sender.admits(aWeight, aRecipients)), ranked[0])
+        with self.lock:
+            endpoint.inflight += 1
+        return endpoint
+
+    def done(self, aEndpoint, aResult):
+        """Registra latência e resultado; retorna True se o erro é do endpoint"""
+        code = aResult.errorCode
+        endpointError = not aResult.ok and (code is None or code in ENDPOINT_ERRORS)
+        with self.lock:
+            aEndpoint.inflight -= 1
+            if aResult.seconds is not None and (aResult.ok or code in THROTTLE_ERRORS):
+                aEndpoint.latency = aResult.seconds if aEndpoint.latency is None else \
+                    aEndpoint.latency + LATENCY_ALPHA * (aResult.seconds - aEndpoint.latency)
+            if endpointError:
+                aEndpoint.errors += 1
+                if aEndpoint.up and aEndpoint.errors >= self.failoverAfter:
+                    self.down(aEndpoint, f"{aEndpoint.errors} erros seguidos, o último {code}: {aResult.error}")
+            elif aResult.ok:
+                aEndpoint.errors = 0
+        METRICS.inc("dispatcher_ses_endpoint_sends_total", endpoint=aEndpoint.name,
+                    result="sent" if aResult.ok else ("endpoint_error" if endpointError else "error"))
+        self.publish()
+        return endpointError
+
+    def down(self, aEndpoint, aReason):
+        aEndpoint.up = False
+        aEndpoint.retryAt = time.monotonic() + self.healthInterval
+        print(f"☠ Endpoint SES {aEndpoint.name} fora do pool: {aReason}")
+
+    def call(self, aFn, aWeight, aRecipients):
+        """
+        Executa aFn(sender) -> [SendResult] no melhor endpoint; com erro de
+        endpoint ou throttling tenta uma vez cada um dos outros
+        """
+        tried = []
+        endpoint = self.pick((), aWeight, aRecipients)
+        # A reserva do admits() agora está no endpoint
+        self.unreserve(aRecipients)
+        while True:
+            results = aFn(endpoint.sender)
+            # Erros da chamada valem para todos os destinos; falhas de um destino não contam
+            sample = next((r for r in results if r.ok), results[0])
+            endpointError = self.done(endpoint, sample)
+            # Sem código (timeout de leitura) o SES pode ter aceitado: fica com o RetryPolicy
+            if sample.errorCode is None or not (endpointError or sample.errorCode in THROTTLE_ERRORS):
+                return results
+            tried.append(endpoint)
+            endpoint = self.pick(tried, aWeight, aRecipients)
+            if endpoint is None:
+                return results
+            print(f"↻ {tried[-1].name}: {sample.errorCode}, tentando {endpoint.name}")
+
+    def send(self, aJob):
+        return self.call(lambda sender: [sender.send(aJob)], aJob.weight, self.recipients(aJob.cci))[0]
+
+    def sendBulk(self, aTemplateName, aDefaultData, aJobs):
+        return self.call(lambda sender: sender.sendBulk(aTemplateName, aDefaultData, aJobs),
+                         max(job.weight for job in aJobs), sum(self.recipients(job.cci) for job in aJobs))
+
+    def ensureTemplate(self, aName, aSubject, aHtml):
+        """Os templates são por região: cadastra em todos os endpoints no ar"""
+        self.templates[aName] = (aSubject, aHtml)
+        for endpoint in self.available():
+            self.ensureTemplates(endpoint, {aName: (aSubject, aHtml)})
+
+    def ensureTemplates(self, aEndpoint, aTemplates):
+        try:
+            for name, (subject, html) in aTemplates.items():
+                aEndpoint.sender.ensureTemplate(name, subject, html)
+        except Exception as e:
+            with self.lock:
+                if aEndpoint.up:
+                    self.down(aEndpoint, f"cadastro de template falhou: {e}")
+                aEndpoint.retryAt = time.monotonic() + self.healthInterval
+            return False
+        return True
+
+    def _parallel(self, aCalls):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(call) for call in aCalls]
+            for future in as_completed(futures):
+                yield from future.result()
+
+    def sendMany(self, aJobs):
+        return self._parallel([lambda job=job: [self.send(job)] for job in aJobs])
+
+    def sendBulkMany(self, aTemplateName, aDefaultData, aJobs):
+        size = modules.Constants.MAX_BULK_DESTINATIONS
+        chunks = [aJobs[i:i + size] for i in range(0, len(aJobs), size)]
+        return self._parallel([lambda chunk=chunk: self.sendBulk(aTemplateName, aDefaultData, chunk) for chunk in chunks])
+
+    def checkHealthIfDue(self):
+        now = time.monotonic()
+        if not any((not e.up and now >= e.retryAt) or now - e.checkedAt >= self.healthInterval
+                   for e in self.endpoints):
+            return
+        # Uma thread verifica; as outras seguem com o estado atual
+        if self.healthLock.acquire(blocking=False):
+            try:
+                self.checkHealth()
+            finally:
+                self.healthLock.release()
+
+    def checkHealth(self, aForce=False):
+        """GetSendQuota nos endpoints com verificação vencida (aForce: em todos)"""
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            due = (now >= endpoint.retryAt) if not endpoint.up else (now - endpoint.checkedAt >= self.healthInterval)
+            if not (aForce or due):
+                continue
+            endpoint.checkedAt = time.monotonic()
+            start = time.perf_counter()
+            try:
+                endpoint.sender.client.get_send_quota()
+            except Exception as e:
+                with self.lock:
+                    if endpoint.up:
+                        self.down(endpoint, f"verificação falhou: {e}")
+                    endpoint.retryAt = time.monotonic() + self.healthInterval
+                continue
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                if endpoint.latency is None or endpoint.inflight == 0:
+                    endpoint.latency = elapsed if endpoint.latency is None else \
+                        endpoint.latency + LATENCY_ALPHA * (elapsed - endpoint.latency)
+                recovered = not endpoint.up
+            if recovered and self.ensureTemplates(endpoint, dict(self.templates)):
+                with self.lock:
+                    endpoint.up = True
+                    endpoint.errors = 0
+                print(f"✅ Endpoint SES {endpoint.name} de volta ao pool")
+        self.publish()
+
+    def publish(self):
+        for endpoint in self.endpoints:
+            METRICS.setGauge("ses_endpoint_up", 1 if endpoint.up else 0, endpoint=endpoint.name)
+            if endpoint.latency is not None:
+                METRICS.setGauge("ses_endpoint_latency_seconds", round(endpoint.latency, 4), endpoint=endpoint.name)
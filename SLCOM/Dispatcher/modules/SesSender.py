@@ -0,0 +1,215 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import modules.Constants
+from modules.Metrics import METRICS
+# TokenBucket fica no SendGovernor, que também é copiado para o send_welcome_email.py
+from modules.SendGovernor import TokenBucket
+
+# Código dado às falhas de conexão com o endpoint (a requisição não chegou ao SES)
+CONNECT_ERROR = 'EndpointConnectionError'
+
+class SendJob:
+    def __init__(self, aTrxId, aToEmail, aSubject, aMessage, aCci, aTemplateData=None, aWeight=0):
+        self.trxId = aTrxId
+        self.toEmail = aToEmail
+        self.subject = aSubject
+        self.message = aMessage
+        self.cci = aCci
+        # JSON com os campos do template, usado no envio bulk (SendBulkTemplatedEmail)
+        self.templateData = aTemplateData
+        # Peso do tipo de email: o SenderPool reserva a cota no endpoint do envio com ele
+        self.weight = aWeight
+
+class SendResult:
+    def __init__(self, aTrxId, aOk, aMessageId=None, aError=None, aErrorCode=None, aSeconds=None):
+        self.trxId = aTrxId
+        self.ok = aOk
+        self.messageId = aMessageId
+        self.error = aError
+        self.errorCode = aErrorCode
+        # Duração da chamada ao SES, sem a espera pela taxa
+        self.seconds = aSeconds
+
+    def __str__(self):
+        if self.ok:
+            return f"{self.trxId} - OK - {self.messageId}"
+        return f"{self.trxId} - ERRO - {self.errorCode} - {self.error}"
+
+class SesSender:
+    """
+    Envia emails pelo SES com um único client (thread-safe, com pool de
+    conexões HTTP reaproveitadas), até aConcurrency envios em paralelo e
+    respeitando aMaxSendRate envios por segundo (0 = sem limite). Com um
+    aGovernor (modules/SendGovernor.py) a taxa, a concorrência e a cota do
+    dia vêm da conta SES e se ajustam ao throttling; aMaxSendRate fica
+    só como reserva do governor. aMaxRetries limita as novas tentativas
+    internas do boto3 (None = padrão do boto3).
+    """
+    def __init__(self, aRegion, aFromEmail, aCcEmail, aBccEmail,
+                 aConcurrency=1, aMaxSendRate=0, aEndpointUrl=None, aGovernor=None, aMaxRetries=None):
+        self.fromEmail = aFromEmail
+        self.ccEmail = aCcEmail
+        self.bccEmail = aBccEmail
+        self.concurrency = max(1, int(aConcurrency))
+        self.bucket = TokenBucket(aMaxSendRate) if aMaxSendRate and aMaxSendRate > 0 and aGovernor is None else None
+        self.governor = aGovernor
+        # boto3 leva centenas de ms para importar: só quando um sender é de fato criado
+        import boto3
+        from botocore.config import Config
+        from botocore.exceptions import EndpointConnectionError
+        self.connectError = EndpointConnectionError
+        self.client = boto3.client('ses',
+                                   region_name=aRegion,
+                                   endpoint_url=aEndpointUrl,
+                                   config=Config(max_pool_connections=self.concurrency,
+                                                 retries={'max_attempts': aMaxRetries} if aMaxRetries is not None else None))
+        if aGovernor is not None:
+            aGovernor.attach(self.client, self.concurrency)
+
+    def destination(self, aJob):
+        return {
+            'ToAddresses': [aJob.toEmail],
+            'CcAddresses': [self.ccEmail] if aJob.cci == 1 else [],
+            'BccAddresses': [self.bccEmail] if self.bccEmail else []
+        }
+
+    def recipients(self, aCci):
+        """Destinatários de um email (To + Cc + Bcc): é o que o SES conta na taxa e na cota"""
+        return 1 + (1 if aCci == 1 else 0) + (1 if self.bccEmail else 0)
+
+    def admits(self, aWeight, aRecipients=1):
+        """O email cabe na cota do dia (sempre, sem governor)"""
+        return self.governor is None or self.governor.admits(aWeight, aRecipients)
+
+    def capacity(self, aWeight):
+        """Destinatários que cabem na cota do dia (None = sem limite ou sem governor)"""
+        return None if self.governor is None else self.governor.capacity(aWeight)
+
+    def settle(self):
+        if self.governor is not None:
+            self.governor.settle()
+
+    def send(self, aJob):
+        if self.governor is not None:
+            recipients = self.recipients(aJob.cci)
+            self.governor.acquire(recipients)
+            result = self._send(aJob)
+            self.governor.release(recipients, result.ok)
+            return result
+        if self.bucket is not None:
+            self.bucket.acquire()
+        return self._send(aJob)
+
+    def _send(self, aJob):
+        start = time.perf_counter()
+        try:
+            with METRICS.timer("dispatcher_stage_seconds", stage="ses_send"):
+                response = self.client.send_email(
+                    Source=self.fromEmail,
+                    Destination=self.destination(aJob),
+                    Message={
+                        'Subject': {'Data': aJob.subject, 'Charset': 'UTF-8'},
+                        'Body': {'Html': {'Data': aJob.message, 'Charset': 'UTF-8'}}
+                    }
+                )
+            return SendResult(aJob.trxId, True, aMessageId=response['MessageId'],
+                              aSeconds=time.perf_counter() - start)
+        except self.client.exceptions.ClientError as e:
+            return SendResult(aJob.trxId, False,
+                              aError=e.response['Error']['Message'],
+                              aErrorCode=e.response['Error']['Code'],
+                              aSeconds=time.perf_counter() - start)
+        except self.connectError as e:
+            # A requisição nem saiu: o email pode ir por outro endpoint
+            return SendResult(aJob.trxId, False, aError=str(e), aErrorCode=CONNECT_ERROR,
+                              aSeconds=time.perf_counter() - start)
+        except Exception as e:
+            return SendResult(aJob.trxId, False, aError=str(e), aSeconds=time.perf_counter() - start)
+
+    def ensureTemplate(self, aName, aSubject, aHtml):
+        """Cria o template no SES ou atualiza se o conteúdo mudou"""
+        template = {'TemplateName': aName, 'SubjectPart': aSubject, 'HtmlPart': aHtml}
+        try:
+            current = self.client.get_template(TemplateName=aName)['Template']
+        except self.client.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'TemplateDoesNotExist':
+                raise
+            self.client.create_template(Template=template)
+            return
+        if current.get('SubjectPart') != aSubject or current.get('HtmlPart') != aHtml:
+            self.client.update_template(Template=template)
+
+    def sendBulk(self, aTemplateName, aDefaultData, aJobs):
+        """
+        Um SendBulkTemplatedEmail para até MAX_BULK_DESTINATIONS jobs do mesmo
+        template. Retorna um SendResult por job, na mesma ordem dos destinos.
+        """
+        if self.governor is not None:
+            recipients = sum(self.recipients(job.cci) for job in aJobs)
+            self.governor.acquire(recipients)
+            results = self._sendBulk(aTemplateName, aDefaultData, aJobs)
+            # Throttling e erros da chamada valem para todos os destinos; falhas
+            # de um destino não contam como falha do envio
+            self.governor.release(recipients, any(r.ok for r in results))
+            return results
+        if self.bucket is not None:
+            self.bucket.acquire(len(aJobs))
+        return self._sendBulk(aTemplateName, aDefaultData, aJobs)
+
+    def _sendBulk(self, aTemplateName, aDefaultData, aJobs):
+        start = time.perf_counter()
+        try:
+            with METRICS.timer("dispatcher_stage_seconds", stage="ses_bulk"):
+                response = self.client.send_bulk_templated_email(
+                    Source=self.fromEmail,
+                    Template=aTemplateName,
+                    DefaultTemplateData=aDefaultData,
+                    Destinations=[{'Destination': self.destination(job),
+                                   'ReplacementTemplateData': job.templateData} for job in aJobs]
+                )
+        except self.client.exceptions.ClientError as e:
+            seconds = time.perf_counter() - start
+            return [SendResult(job.trxId, False,
+                               aError=e.response['Error']['Message'],
+                               aErrorCode=e.response['Error']['Code'],
+                               aSeconds=seconds) for job in aJobs]
+        except self.connectError as e:
+            seconds = time.perf_counter() - start
+            return [SendResult(job.trxId, False, aError=str(e), aErrorCode=CONNECT_ERROR,
+                               aSeconds=seconds) for job in aJobs]
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            return [SendResult(job.trxId, False, aError=str(e), aSeconds=seconds) for job in aJobs]
+
+        seconds = time.perf_counter() - start
+        results = []
+        for job, status in zip(aJobs, response['Status']):
+            if status['Status'] == 'Success':
+                results.append(SendResult(job.trxId, True, aMessageId=status['MessageId'], aSeconds=seconds))
+            else:
+                results.append(SendResult(job.trxId, False,
+                                          aError=status.get('Error', status['Status']),
+                                          aErrorCode=status['Status'],
+                                          aSeconds=seconds))
+        return results
+
+    def _parallel(self, aCalls):
+        """Executa as chamadas (funções que retornam listas de SendResult) e gera os resultados"""
+        if self.concurrency == 1:
+            for call in aCalls:
+                yield from call()
+            return
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(call) for call in aCalls]
+            for future in as_completed(futures):
+                yield from future.result()
+
+    def sendMany(self, aJobs):
+        """Envia os jobs em paralelo e gera um SendResult por job, na ordem em que terminam"""
+        return self._parallel([lambda job=job: [self.send(job)] for job in aJobs])
+
+    def sendBulkMany(self, aTemplateName, aDefaultData, aJobs):
+        """Envia os jobs de um mesmo template em chamadas bulk de até 50 destinos, em paralelo"""
+        size = modules.Constants.MAX_BULK_DESTINATIONS
+        chunks = [aJobs[i:i + size] for i in range(0, len(aJobs), size)]
+        return self._parallel([lambda chunk=chunk: self.sendBulk(aTemplateName, aDefaultData, chunk) for chunk in chunks])
@@ -0,0 +1,100 @@
+import os
+import time
+
+# A cada quantas recargas incrementais uma recarga completa (para ver remoções)
+FULL_RELOAD_EVERY = 12
+# Folga da leitura incremental da tabela: uma linha com CREATED_AT anterior à
+# última leitura pode ficar visível só depois (commit atrasado)
+TABLE_OVERLAP_SECONDS = 60
+
+def normalizeEmail(aEmail):
+    """'Nome <Fulano@Exemplo.com> ' -> 'fulano@exemplo.com'"""
+    email = (aEmail or "").strip()
+    if email.endswith(">") and "<" in email:
+        email = email[email.rindex("<") + 1:-1]
+    return email.strip().lower()
+
+class SuppressionList:
+    """
+    Endereços que não devem receber email (bounce/reclamação), num set em
+    memória consultado antes de cada envio. As fontes são um arquivo local
+    (um endereço por linha, opcionalmente 'email,motivo'; '#' comenta) e/ou a
+    tabela EMAIL_SUPPRESSION. refreshIfDue() relê a cada aTtl segundos só o
+    que mudou: as linhas novas da tabela (CREATED_AT) e o que foi acrescentado
+    ao arquivo; a cada FULL_RELOAD_EVERY recargas tudo é relido do zero.
+    """
+    def __init__(self, aFile=None, aTable=None, aTtl=300):
+        self.file = aFile
+        self.table = aTable
+        self.ttl = aTtl
+        self.addresses = set()
+        self.fileState = None
+        self.tableSince = None
+        self.refreshes = 0
+        self.lastRefresh = None
+
+    def isSuppressed(self, aEmail):
+        return normalizeEmail(aEmail) in self.addresses
+
+    def refreshIfDue(self, conn):
+        if self.lastRefresh is None or time.monotonic() - self.lastRefresh >= self.ttl:
+            self.refresh(conn)
+
+    def refresh(self, conn):
+        full = self.refreshes % FULL_RELOAD_EVERY == 0 or self._fileRewritten()
+        addresses = set() if full else self.addresses
+        before = len(self.addresses)
+        if self.file:
+            self._loadFile(addresses, full)
+        if self.table and conn is not None:
+            self._loadTable(conn, addresses, full)
+        self.addresses = addresses
+        self.refreshes += 1
+        self.lastRefresh = time.monotonic()
+        if full or len(addresses) != before:
+            print(f"Supressão: {len(addresses)} endereços ({'recarga completa' if full else 'incremental'})")
+
+    def _fileRewritten(self):
+        """O arquivo diminuiu ou sumiu: endereços podem ter saído, então a recarga é completa"""
+        if not self.file or self.fileState is None:
+            return False
+        try:
+            return os.stat(self.file).st_size < self.fileState[1]
+        except FileNotFoundError:
+            return True
+
+    def _loadFile(self, aAddresses, aFull):
+        try:
+            stat = os.stat(self.file)
+        except FileNotFoundError:
+            self.fileState = None
+            return
+        offset = 0
+        if not aFull and self.fileState is not None:
+            mtime, size = self.fileState
+            if stat.st_mtime == mtime and stat.st_size == size:
+                return
+            # Só cresceu (o caso de diminuir já virou recarga completa): lê apenas o final
+            offset = size
+        # Binário: o offset salvo é em bytes (st_size)
+        with open(self.file, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                line = raw.decode('utf-8', 'replace').split('#', 1)[0].strip()
+                if line:
+                    aAddresses.add(normalizeEmail(line.split(',', 1)[0]))
+        self.fileState = (stat.st_mtime, stat.st_size)
+
+    def _loadTable(self, conn, aAddresses, aFull):
+        iCursor = conn.cursor()
+        if aFull or self.tableSince is None:
+            iCursor.execute(f"SELECT EMAIL, CREATED_AT FROM {self.table}")
+        else:
+            iCursor.execute(f"SELECT EMAIL, CREATED_AT FROM {self.table} WHERE CREATED_AT > DATEADD(second, -?, ?)",
+                            TABLE_OVERLAP_SECONDS, self.tableSince)
+        for email, createdAt in iCursor.fetchall():
+            aAddresses.add(normalizeEmail(email))
+            if self.tableSince is None or createdAt > self.tableSince:
+                self.tableSince = createdAt
+        iCursor.close()
+        conn.commit()
@@ -0,0 +1,100 @@
+import os
+import threading
+from collections import OrderedDict
+from string import Template
+
+class CompiledTemplate:
+    """
+    Template pré-compilado: o texto é quebrado uma única vez em segmentos
+    estáticos e slots ($nome, ${nome}). Renderizar é só preencher os slots
+    numa cópia da lista e fazer um join. Mesma sintaxe do string.Template.
+    """
+    def __init__(self, aName, aText):
+        self.name = aName
+        self.segments = []
+        self.slots = []
+        last = 0
+        for m in Template.pattern.finditer(aText):
+            self.segments.append(aText[last:m.start()])
+            if m.group('escaped') is not None:
+                self.segments.append(Template.delimiter)
+            elif m.group('invalid') is not None:
+                raise ValueError(f"Placeholder inválido no template {aName}, posição {m.start()}")
+            else:
+                self.slots.append((len(self.segments), m.group('named') or m.group('braced')))
+                self.segments.append(None)
+            last = m.end()
+        self.segments.append(aText[last:])
+        self.names = frozenset(name for _, name in self.slots)
+
+    def toSes(self):
+        """Mesmo template na sintaxe do SES ({{campo}}), para envio bulk"""
+        parts = self.segments.copy()
+        for offset, name in self.slots:
+            parts[offset] = "{{" + name + "}}"
+        return "".join(parts)
+
+    def render(self, aParams):
+        parts = self.segments.copy()
+        for offset, name in self.slots:
+            parts[offset] = str(aParams[name])
+        return "".join(parts)
+
+class TemplateRegistry:
+    """
+    Carrega os templates *.html de um diretório uma única vez e compila.
+    Com aCacheSize > 0 guarda em cache (LRU) o resultado de parâmetros
+    repetidos; nos templates atuais o render compilado já é mais barato que
+    montar a chave do cache (ver bench/bench_templates.py), por isso o padrão é 0.
+    reloadIfChanged() recarrega só os arquivos alterados, para o modo daemon.
+    """
+    def __init__(self, aDirectory, aCacheSize=0):
+        self.directory = aDirectory
+        self.cacheSize = aCacheSize
+        self.templates = {}
+        self.mtimes = {}
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.reloadIfChanged()
+
+    def _load(self, aName, aPath):
+        with open(aPath, 'r', encoding='utf-8') as f:
+            self.templates[aName] = CompiledTemplate(aName, f.read())
+
+    def reloadIfChanged(self):
+        """Recompila os templates novos ou alterados; retorna os nomes recarregados"""
+        reloaded = []
+        with self.lock:
+            for fileName in sorted(os.listdir(self.directory)):
+                if not fileName.endswith('.html'):
+                    continue
+                path = os.path.join(self.directory, fileName)
+                name = fileName[:-len('.html')]
+                mtime = os.stat(path).st_mtime_ns
+                if self.mtimes.get(name) != mtime:
+                    self._load(name, path)
+                    self.mtimes[name] = mtime
+                    reloaded.append(name)
+            if reloaded:
+                self.cache.clear()
+        return reloaded
+
+    def get(self, aName):
+        return self.templates[aName]
+
+    def render(self, aName, aParams):
+        if self.cacheSize <= 0:
+            return self.templates[aName].render(aParams)
+        key = (aName, tuple(sorted(aParams.items())))
+        with self.lock:
+            body = self.cache.get(key)
+            if body is not None:
+                self.cache.move_to_end(key)
+                return body
+            template = self.templates[aName]
+        body = template.render(aParams)
+        with self.lock:
+            self.cache[key] = body
+            if len(self.cache) > self.cacheSize:
+                self.cache.popitem(last=False)
+        return body
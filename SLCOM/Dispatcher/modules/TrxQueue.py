@@ -0,0 +1,313 @@
+import os
+import socket
+import time
+import modules.Constants
+from modules.Metrics import METRICS
+
+######################################
+### Claim/lease da TRANSACTION_LOG
+######################################
+
+def defaultWorkerId():
+    return f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+# Pega um lote de linhas pendentes (ou com lease vencido) de todos os TRX_CODE
+# informados, em ordem de TRX_ID, e marca como INFLIGHT para este worker.
+# Linhas aguardando nova tentativa (NEXT_ATTEMPT no futuro) ficam de fora.
+# Um lease vencido conta como tentativa (o worker caiu ou travou com a linha):
+# uma linha que sempre derruba o worker chega a EMAILJOB_MAX_ATTEMPTS e vai
+# para DEAD em vez de voltar para sempre.
+# READPAST pula linhas travadas por outro worker em vez de esperar; UPDLOCK
+# garante que duas sessões não escolham a mesma linha.
+claimableFilter = """
+                    WHERE TRX_CODE IN ({codes})
+                    AND ((TRX_STATUS = 'PENDING' AND (NEXT_ATTEMPT IS NULL OR NEXT_ATTEMPT <= SYSUTCDATETIME()))
+                         OR (TRX_STATUS = 'INFLIGHT' AND LEASE_EXPIRES < SYSUTCDATETIME()))"""
+
+claimQuery = """
+                WITH batch AS (
+                    SELECT TOP (?) TRX_ID, TRX_CODE, TRX_INFO, TRX_STATUS, WORKER_ID, LEASE_EXPIRES, ATTEMPTS, LAST_ERROR
+                    FROM TRANSACTION_LOG WITH (UPDLOCK, READPAST, ROWLOCK)""" + claimableFilter + """{hold}
+                    ORDER BY TRX_ID
+                )
+                UPDATE batch
+                    SET ATTEMPTS = ATTEMPTS + CASE WHEN TRX_STATUS = 'INFLIGHT' THEN 1 ELSE 0 END,
+                        LAST_ERROR = CASE WHEN TRX_STATUS = 'INFLIGHT'
+                                          THEN LEFT('Lease vencido de ' + ISNULL(WORKER_ID, '?'), 400)
+                                          ELSE LAST_ERROR END,
+                        TRX_STATUS = 'INFLIGHT',
+                        WORKER_ID = ?,
+                        LEASE_EXPIRES = DATEADD(second, ?, SYSUTCDATETIME())
+                OUTPUT inserted.TRX_INFO, inserted.TRX_ID, inserted.TRX_CODE, inserted.ATTEMPTS,
+                       DATEDIFF(second, inserted.ENQUEUED_AT, SYSUTCDATETIME());
+         """
+
+# Janela de coalescência: linhas dos TRX_CODE em {held} só são reservadas depois
+# de ? segundos na fila, para que os outros eventos do mesmo pedido cheguem
+holdFilter = """
+                    AND (TRX_CODE NOT IN ({held}) OR ENQUEUED_AT IS NULL OR ENQUEUED_AT <= DATEADD(second, -?, SYSUTCDATETIME()))"""
+
+# Mesmo filtro do claim, sem travar nem alterar nada: basta saber se existe uma linha
+hasClaimableQuery = """
+                SELECT TOP (1) 1 FROM TRANSACTION_LOG""" + claimableFilter + ";"
+
+def hasClaimable(conn, aTrxCodes):
+    """Há alguma linha que o claim pegaria agora? Uma consulta barata para o cron sair cedo"""
+    iCursor = conn.cursor()
+    iCursor.execute(hasClaimableQuery.format(codes=",".join("?" * len(aTrxCodes))), *aTrxCodes)
+    found = iCursor.fetchone() is not None
+    iCursor.close()
+    conn.commit()
+    return found
+
+def claimPending(conn, aTrxCodes, aWorkerId, aBatchSize, aLeaseSeconds, aHoldCodes=(), aHoldSeconds=0):
+    """
+    Reserva até aBatchSize linhas dos TRX_CODE e retorna
+    [(TRX_INFO, TRX_ID, TRX_CODE, ATTEMPTS, segundos na fila)]; a espera é
+    None para linhas gravadas antes do ENQUEUED_AT (sql/005). Linhas dos
+    aHoldCodes com menos de aHoldSeconds na fila ficam para depois.
+    """
+    held = [c for c in aHoldCodes if c in aTrxCodes] if aHoldSeconds > 0 else []
+    hold = holdFilter.format(held=",".join("?" * len(held))) if held else ""
+    holdParams = [*held, aHoldSeconds] if held else []
+    iQuery = claimQuery.format(codes=",".join("?" * len(aTrxCodes)), hold=hold)
+    with METRICS.timer("dispatcher_stage_seconds", stage="claim"):
+        iCursor = conn.cursor()
+        iCursor.execute(iQuery, aBatchSize, *aTrxCodes, *holdParams, aWorkerId, aLeaseSeconds)
+        rs = iCursor.fetchall()
+        iCursor.close()
+        # Commit imediato: o lease precisa ficar visível para os outros workers
+        conn.commit()
+    return sorted(rs, key=lambda r: r[1])
+
+def claimBatches(conn, aTrxCodes, aWorkerId, aBatchSize, aLeaseSeconds, aHoldCodes=(), aHoldSeconds=0):
+    """Gera lotes reservados até a fila esvaziar"""
+    while True:
+        rs = claimPending(conn, aTrxCodes, aWorkerId, aBatchSize, aLeaseSeconds, aHoldCodes, aHoldSeconds)
+        if not rs:
+            return
+        yield rs
+
+def claimIds(conn, aTrxIds, aWorkerId, aLeaseSeconds):
+    """
+    Reserva linhas específicas que ainda estejam PENDING (ex: recém-gravadas
+    pelo pipeline) e retorna [(TRX_ID, ATTEMPTS)] das reservadas. Linhas já
+    reservadas por outro worker ficam de fora.
+    """
+    claimedIds = []
+    iCursor = conn.cursor()
+    ids = [int(i) for i in aTrxIds]
+    for start in range(0, len(ids), modules.Constants.MAX_IN_PARAMS):
+        chunk = ids[start:start + modules.Constants.MAX_IN_PARAMS]
+        iQuery = f"""
+                UPDATE TRANSACTION_LOG WITH (ROWLOCK, READPAST)
+                    SET TRX_STATUS = 'INFLIGHT',
+                        WORKER_ID = ?,
+                        LEASE_EXPIRES = DATEADD(second, ?, SYSUTCDATETIME())
+                OUTPUT inserted.TRX_ID, inserted.ATTEMPTS
+                WHERE TRX_ID IN ({",".join("?" * len(chunk))}) AND TRX_STATUS = 'PENDING';
+            """
+        iCursor.execute(iQuery, aWorkerId, aLeaseSeconds, *chunk)
+        claimedIds.extend((int(r[0]), r[1]) for r in iCursor.fetchall())
+    iCursor.close()
+    conn.commit()
+    return claimedIds
+
+def pendingByOrder(conn, aTrxCodes, aOrderIds):
+    """
+    Linhas PENDING dos TRX_CODE cujo TRX_INFO é de um dos pedidos, em
+    qualquer formato (objeto com orderId ou lista compacta, posição 2).
+    Retorna [(TRX_INFO, TRX_ID, TRX_CODE, ATTEMPTS)] sem reservar nada.
+    """
+    rows = []
+    orderIds = [str(i) for i in aOrderIds]
+    iCursor = conn.cursor()
+    for start in range(0, len(orderIds), modules.Constants.MAX_IN_PARAMS):
+        chunk = orderIds[start:start + modules.Constants.MAX_IN_PARAMS]
+        iQuery = f"""
+                SELECT TRX_INFO, TRX_ID, TRX_CODE, ATTEMPTS FROM TRANSACTION_LOG WITH (READPAST)
+                WHERE TRX_CODE IN ({",".join("?" * len(aTrxCodes))}) AND TRX_STATUS = 'PENDING'
+                AND CASE WHEN ISJSON(TRX_INFO) = 1
+                         THEN COALESCE(JSON_VALUE(TRX_INFO, '$.orderId'), JSON_VALUE(TRX_INFO, '$[2]'))
+                    END IN ({",".join("?" * len(chunk))});
+            """
+        iCursor.execute(iQuery, *aTrxCodes, *chunk)
+        rows.extend(iCursor.fetchall())
+    iCursor.close()
+    conn.commit()
+    return rows
+
+def pendingStats(conn):
+    """Profundidade e idade da fila: {TRX_CODE: (linhas PENDING, segundos da mais antiga ou None)}"""
+    iCursor = conn.cursor()
+    iCursor.execute("""
+            SELECT TRX_CODE, COUNT(*), DATEDIFF(second, MIN(ENQUEUED_AT), SYSUTCDATETIME())
+            FROM TRANSACTION_LOG
+            WHERE TRX_STATUS = 'PENDING'
+            GROUP BY TRX_CODE;
+        """)
+    stats = {int(r[0]): (int(r[1]), r[2]) for r in iCursor.fetchall()}
+    iCursor.close()
+    return stats
+
+def leaseLost(aExpected, aUpdated):
+    """
+    PROCESSED que não pegou todas as linhas: o lease venceu durante o envio e
+    outro worker reservou a linha, que pode ser enviada de novo
+    """
+    lost = aExpected - aUpdated
+    if aUpdated >= 0 and lost > 0:
+        METRICS.inc("dispatcher_lease_lost_total", lost)
+        print(f"⚠ {lost} Trx Ids enviados sem o lease deste worker (vencido e reservado por outro): "
+              f"não marcados como PROCESSED, podem ser reenviados; aumente EMAILJOB_LEASE_SECONDS")
+
+def trxSuccess(conn, aTrxId, aWorkerId):
+    # Só marca se o lease ainda é deste worker
+    iQuery = """
+                UPDATE TRANSACTION_LOG
+                    SET TRX_STATUS = 'PROCESSED', LEASE_EXPIRES = NULL, PROCESSED_AT = SYSUTCDATETIME()
+                WHERE TRX_ID = ? AND WORKER_ID = ?;
+            """
+    iCursor = conn.cursor()
+    iCursor.execute(iQuery, int(aTrxId), aWorkerId)
+    leaseLost(1, iCursor.rowcount)
+
+def trxRetry(conn, aTrxId, aWorkerId, aDelayMs, aError):
+    """Devolve a linha para PENDING, só elegível ao claim depois de aDelayMs"""
+    iQuery = """
+                UPDATE TRANSACTION_LOG
+                    SET TRX_STATUS = 'PENDING',
+                        ATTEMPTS = ATTEMPTS + 1,
+                        NEXT_ATTEMPT = DATEADD(millisecond, ?, SYSUTCDATETIME()),
+                        LAST_ERROR = ?,
+                        LEASE_EXPIRES = NULL
+                WHERE TRX_ID = ? AND WORKER_ID = ?;
+            """
+    iCursor = conn.cursor()
+    iCursor.execute(iQuery, int(aDelayMs), (aError or "")[:400], int(aTrxId), aWorkerId)
+    iCursor.close()
+
+def trxDead(conn, aTrxId, aWorkerId, aError):
+    iQuery = """
+                UPDATE TRANSACTION_LOG
+                    SET TRX_STATUS = 'DEAD',
+                        ATTEMPTS = ATTEMPTS + 1,
+                        NEXT_ATTEMPT = NULL,
+                        LAST_ERROR = ?,
+                        LEASE_EXPIRES = NULL
+                WHERE TRX_ID = ? AND WORKER_ID = ?;
+            """
+    iCursor = conn.cursor()
+    iCursor.execute(iQuery, (aError or "")[:400], int(aTrxId), aWorkerId)
+    iCursor.close()
+
+def trxSuppressed(conn, aTrxId, aWorkerId, aReason):
+    """Destinatário na lista de supressão: não envia e tira a linha da fila"""
+    iQuery = """
+                UPDATE TRANSACTION_LOG
+                    SET TRX_STATUS = 'SUPPRESSED',
+                        LAST_ERROR = ?,
+                        LEASE_EXPIRES = NULL
+                WHERE TRX_ID = ? AND WORKER_ID = ?;
+            """
+    iCursor = conn.cursor()
+    iCursor.execute(iQuery, (aReason or "")[:400], int(aTrxId), aWorkerId)
+    iCursor.close()
+
+def trxDeferMany(conn, aTrxIds, aWorkerId, aDelaySeconds, aReason):
+    """
+    Devolve linhas reservadas para PENDING, só elegíveis ao claim depois de
+    aDelaySeconds, sem contar tentativa (ex: cota diária do SES reservada)
+    """
+    ids = [int(i) for i in aTrxIds]
+    iCursor = conn.cursor()
+    for start in range(0, len(ids), modules.Constants.MAX_IN_PARAMS):
+        chunk = ids[start:start + modules.Constants.MAX_IN_PARAMS]
+        iQuery = f"""
+                UPDATE TRANSACTION_LOG
+                    SET TRX_STATUS = 'PENDING',
+                        NEXT_ATTEMPT = DATEADD(second, ?, SYSUTCDATETIME()),
+                        LAST_ERROR = ?,
+                        LEASE_EXPIRES = NULL
+                WHERE TRX_ID IN ({",".join("?" * len(chunk))}) AND WORKER_ID = ?;
+            """
+        iCursor.execute(iQuery, int(aDelaySeconds), (aReason or "")[:400], *chunk, aWorkerId)
+    iCursor.close()
+
+def trxSuccessMany(conn, aTrxIds, aWorkerId):
+    """
+    Marca vários TRX_ID como PROCESSED com UPDATE ... IN (limite de 2100
+    parâmetros do SQL Server). Retorna os TRX_ID marcados: os que tinham
+    o lease deste worker
+    """
+    ids = [int(i) for i in aTrxIds]
+    updated = []
+    iCursor = conn.cursor()
+    for start in range(0, len(ids), modules.Constants.MAX_IN_PARAMS):
+        chunk = ids[start:start + modules.Constants.MAX_IN_PARAMS]
+        iQuery = f"""
+                UPDATE TRANSACTION_LOG
+                    SET TRX_STATUS = 'PROCESSED', LEASE_EXPIRES = NULL, PROCESSED_AT = SYSUTCDATETIME()
+                OUTPUT inserted.TRX_ID
+                WHERE TRX_ID IN ({",".join("?" * len(chunk))}) AND WORKER_ID = ?;
+            """
+        iCursor.execute(iQuery, *chunk, aWorkerId)
+        rows = [int(r[0]) for r in iCursor.fetchall()]
+        leaseLost(len(chunk), len(rows))
+        updated.extend(rows)
+    iCursor.close()
+    return updated
+
+def trxReconcileMany(conn, aTrxIds):
+    """
+    Marca PROCESSED linhas que o ledger local registra como enviadas, de
+    qualquer worker (ex: de uma execução anterior que caiu antes do commit)
+    """
+    ids = [int(i) for i in aTrxIds]
+    iCursor = conn.cursor()
+    for start in range(0, len(ids), modules.Constants.MAX_IN_PARAMS):
+        chunk = ids[start:start + modules.Constants.MAX_IN_PARAMS]
+        iQuery = f"""
+                UPDATE TRANSACTION_LOG
+                    SET TRX_STATUS = 'PROCESSED', LEASE_EXPIRES = NULL, PROCESSED_AT = SYSUTCDATETIME()
+                WHERE TRX_ID IN ({",".join("?" * len(chunk))}) AND TRX_STATUS IN ('PENDING', 'INFLIGHT');
+            """
+        iCursor.execute(iQuery, *chunk)
+    iCursor.close()
+
+class GroupCommit:
+    """
+    Acumula os TRX_ID enviados com sucesso e grava todos com um único UPDATE
+    + commit a cada aEvery linhas ou aIntervalMs milissegundos, o que vier
+    primeiro. flush() precisa ser chamado no encerramento. aOnCommitted, se
+    informado, recebe os TRX_ID de cada flush já commitado (sem os que
+    perderam o lease, que ficam no ledger).
+    """
+    def __init__(self, conn, aWorkerId, aEvery, aIntervalMs, aOnCommitted=None):
+        self.conn = conn
+        self.onCommitted = aOnCommitted
+        self.workerId = aWorkerId
+        self.every = max(1, int(aEvery))
+        self.interval = aIntervalMs / 1000.0
+        self.pending = []
+        self.lastFlush = time.monotonic()
+
+    def add(self, aTrxId):
+        self.pending.append(aTrxId)
+        self.flushIfDue()
+
+    def flushIfDue(self):
+        if len(self.pending) >= self.every or (self.pending and time.monotonic() - self.lastFlush >= self.interval):
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            with METRICS.timer("dispatcher_stage_seconds", stage="commit"):
+                updated = trxSuccessMany(self.conn, self.pending, self.workerId)
+                self.conn.commit()
+            if self.every > 1:
+                print(f"Group commit: {len(updated)} Trx Ids marcados como PROCESSED")
+            if self.onCommitted is not None:
+                self.onCommitted(updated)
+            self.pending = []
+        self.lastFlush = time.monotonic()
@@ -0,0 +1,9 @@
+-- Colunas de lease para que vários Emailjob possam drenar a TRANSACTION_LOG
+-- em paralelo sem enviar o mesmo email duas vezes (ver modules/TrxQueue.py).
+IF COL_LENGTH('dbo.TRANSACTION_LOG', 'WORKER_ID') IS NULL
+    ALTER TABLE dbo.TRANSACTION_LOG ADD WORKER_ID VARCHAR(64) NULL;
+GO
+
+IF COL_LENGTH('dbo.TRANSACTION_LOG', 'LEASE_EXPIRES') IS NULL
+    ALTER TABLE dbo.TRANSACTION_LOG ADD LEASE_EXPIRES DATETIME2 NULL;
+GO
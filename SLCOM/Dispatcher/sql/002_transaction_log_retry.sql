@@ -0,0 +1,14 @@
+-- Controle de novas tentativas do Emailjob (ver modules/Retry.py).
+-- Linhas com NEXT_ATTEMPT no futuro são ignoradas pelo claim até vencer;
+-- depois de EMAILJOB_MAX_ATTEMPTS falhas a linha vai para TRX_STATUS='DEAD'.
+IF COL_LENGTH('dbo.TRANSACTION_LOG', 'ATTEMPTS') IS NULL
+    ALTER TABLE dbo.TRANSACTION_LOG ADD ATTEMPTS INT NOT NULL CONSTRAINT DF_TRANSACTION_LOG_ATTEMPTS DEFAULT 0;
+GO
+
+IF COL_LENGTH('dbo.TRANSACTION_LOG', 'NEXT_ATTEMPT') IS NULL
+    ALTER TABLE dbo.TRANSACTION_LOG ADD NEXT_ATTEMPT DATETIME2 NULL;
+GO
+
+IF COL_LENGTH('dbo.TRANSACTION_LOG', 'LAST_ERROR') IS NULL
+    ALTER TABLE dbo.TRANSACTION_LOG ADD LAST_ERROR NVARCHAR(400) NULL;
+GO
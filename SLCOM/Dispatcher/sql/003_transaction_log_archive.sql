@@ -0,0 +1,31 @@
+-- Arquivamento da TRANSACTION_LOG (ver Maintenance.py e modules/Archive.py).
+-- PROCESSED_AT é gravado pelo Emailjob ao marcar PROCESSED; a manutenção move
+-- para TRANSACTION_LOG_ARCHIVE as linhas PROCESSED mais antigas que a retenção.
+IF COL_LENGTH('dbo.TRANSACTION_LOG', 'PROCESSED_AT') IS NULL
+    ALTER TABLE dbo.TRANSACTION_LOG ADD PROCESSED_AT DATETIME2 NULL;
+GO
+
+-- Linhas processadas antes deste script recebem a data de hoje, então só são
+-- arquivadas depois de passar a retenção. Em lotes para não crescer o log.
+WHILE 1 = 1
+BEGIN
+    UPDATE TOP (50000) dbo.TRANSACTION_LOG
+        SET PROCESSED_AT = SYSUTCDATETIME()
+    WHERE TRX_STATUS = 'PROCESSED' AND PROCESSED_AT IS NULL;
+    IF @@ROWCOUNT = 0 BREAK;
+END
+GO
+
+-- Mesmas colunas e tipos da TRANSACTION_LOG (o UNION ALL descarta o IDENTITY) + ARCHIVED_AT
+IF OBJECT_ID('dbo.TRANSACTION_LOG_ARCHIVE') IS NULL
+BEGIN
+    SELECT TOP (0) * INTO dbo.TRANSACTION_LOG_ARCHIVE FROM dbo.TRANSACTION_LOG
+    UNION ALL
+    SELECT TOP (0) * FROM dbo.TRANSACTION_LOG;
+
+    ALTER TABLE dbo.TRANSACTION_LOG_ARCHIVE
+        ADD ARCHIVED_AT DATETIME2 NOT NULL CONSTRAINT DF_TRANSACTION_LOG_ARCHIVE_ARCHIVED_AT DEFAULT SYSUTCDATETIME();
+
+    CREATE UNIQUE CLUSTERED INDEX IX_TRANSACTION_LOG_ARCHIVE_TRX_ID ON dbo.TRANSACTION_LOG_ARCHIVE (TRX_ID);
+END
+GO
@@ -0,0 +1,14 @@
+-- Endereços que não devem mais receber email (hard bounce, reclamação ou
+-- pedido de descadastro), lidos pelo Emailjob (ver modules/Suppression.py).
+-- EMAIL é gravado normalizado: sem espaços e em minúsculas.
+IF OBJECT_ID('dbo.EMAIL_SUPPRESSION') IS NULL
+BEGIN
+    CREATE TABLE dbo.EMAIL_SUPPRESSION (
+        EMAIL NVARCHAR(320) NOT NULL CONSTRAINT PK_EMAIL_SUPPRESSION PRIMARY KEY,
+        REASON VARCHAR(20) NOT NULL, -- BOUNCE, COMPLAINT, MANUAL
+        CREATED_AT DATETIME2 NOT NULL CONSTRAINT DF_EMAIL_SUPPRESSION_CREATED_AT DEFAULT SYSUTCDATETIME()
+    );
+    -- Recarga incremental: só o que entrou desde a última leitura
+    CREATE INDEX IX_EMAIL_SUPPRESSION_CREATED_AT ON dbo.EMAIL_SUPPRESSION (CREATED_AT) INCLUDE (EMAIL);
+END
+GO
@@ -0,0 +1,14 @@
+-- Momento em que cada linha entrou na fila, para medir a espera por TRX_CODE
+-- contra as metas de latência (ver modules/Scheduler.py). O DEFAULT preenche
+-- as novas linhas sem mudar os INSERT/MERGE do LionDispatcher; as linhas já
+-- existentes ficam NULL e não entram na medição.
+IF COL_LENGTH('dbo.TRANSACTION_LOG', 'ENQUEUED_AT') IS NULL
+    ALTER TABLE dbo.TRANSACTION_LOG
+        ADD ENQUEUED_AT DATETIME2 NULL CONSTRAINT DF_TRANSACTION_LOG_ENQUEUED_AT DEFAULT SYSUTCDATETIME();
+GO
+
+-- O arquivamento copia todas as colunas da TRANSACTION_LOG (sql/003)
+IF OBJECT_ID('dbo.TRANSACTION_LOG_ARCHIVE') IS NOT NULL
+   AND COL_LENGTH('dbo.TRANSACTION_LOG_ARCHIVE', 'ENQUEUED_AT') IS NULL
+    ALTER TABLE dbo.TRANSACTION_LOG_ARCHIVE ADD ENQUEUED_AT DATETIME2 NULL;
+GO
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Testes do envio do Emailjob e do Pipeline com uma TRANSACTION_LOG em memória,
+sem SQL Server nem AWS (o pyodbc só precisa estar instalado).
+Uso: python3 -m unittest test_emailjob
+"""
+
+import re
+import unittest
+
+from modules.DataTypes import ReceiptInfo
+from modules.SesSender import SendResult
+from modules.TrxQueue import GroupCommit
+import Emailjob
+import Pipeline
+
+
+class FakeCursor:
+    """Responde às consultas do TrxQueue usadas no envio sobre FakeConnection.rows"""
+    def __init__(self, aConn):
+        self.conn = aConn
+        self.result = []
+        self.rowcount = -1
+
+    def execute(self, aQuery, *aParams):
+        query = " ".join(aQuery.split())
+        rows = self.conn.rows
+        self.result = []
+        if "UPDATE batch" in query:
+            # claimPending: PENDING ou INFLIGHT com lease vencido, que conta como tentativa
+            size, worker = aParams[0], aParams[-2]
+            codes = {int(c) for c in aParams[1:-2]}
+            for trxId in sorted(rows):
+                row = rows[trxId]
+                if len(self.result) < size and row['code'] in codes and (
+                        row['status'] == 'PENDING' or (row['status'] == 'INFLIGHT' and row['expired'])):
+                    if row['status'] == 'INFLIGHT':
+                        row.update(attempts=row['attempts'] + 1, error=f"Lease vencido de {row['worker']}")
+                    row.update(status='INFLIGHT', worker=worker, expired=False)
+                    self.result.append((row['info'], trxId, row['code'], row['attempts'], 0))
+        elif "OUTPUT inserted.TRX_ID, inserted.ATTEMPTS" in query:
+            # claimIds
+            worker, lease, ids = aParams[0], aParams[1], aParams[2:]
+            for trxId in ids:
+                row = rows.get(trxId)
+                if row is not None and row['status'] == 'PENDING':
+                    row.update(status='INFLIGHT', worker=worker)
+                    self.result.append((trxId, row['attempts']))
+        elif "SET TRX_STATUS = 'PROCESSED'" in query and "OUTPUT inserted.TRX_ID" in query:
+            # trxSuccessMany
+            ids, worker = aParams[:-1], aParams[-1]
+            for trxId in ids:
+                row = rows.get(trxId)
+                if row is not None and row['worker'] == worker:
+                    row['status'] = 'PROCESSED'
+                    self.result.append((trxId,))
+        elif re.search(r"SET TRX_STATUS = '(DEAD|PENDING)', ATTEMPTS = ATTEMPTS \+ 1", query):
+            # trxDead / trxRetry
+            status = 'DEAD' if "'DEAD'" in query else 'PENDING'
+            error, trxId, worker = aParams[-3:]
+            row = rows.get(trxId)
+            if row is not None and row['worker'] == worker:
+                row.update(status=status, attempts=row['attempts'] + 1, error=error)
+        else:
+            raise AssertionError(f"Consulta inesperada: {query}")
+        self.conn.queries.append(query)
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.rows = {}
+        self.queries = []
+
+    def add(self, aTrxId, aStatus='PENDING', aAttempts=0, aWorker=None, aInfo=None, aCode=1):
+        self.rows[aTrxId] = dict(status=aStatus, attempts=aAttempts, worker=aWorker, error=None,
+                                 info=aInfo, code=aCode, expired=False)
+
+    def claimed(self, aTrxId, aAttempts=0):
+        """Linha já reservada por este worker, como o claim entrega ao sendBatch"""
+        self.add(aTrxId, 'INFLIGHT', aAttempts, Emailjob.WORKER_ID)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakeSender:
+    """Aceita tudo e guarda os jobs enviados; os TRX_ID de crashes derrubam o envio"""
+    def __init__(self):
+        self.jobs = []
+        self.crashes = set()
+
+    def recipients(self, aCci):
+        return 1
+
+    def admits(self, aWeight, aRecipients=1):
+        return True
+
+    def settle(self):
+        pass
+
+    def sendMany(self, aJobs):
+        self.jobs.extend(aJobs)
+        if any(job.trxId in self.crashes for job in aJobs):
+            raise RuntimeError("worker caiu no meio do envio")
+        return [SendResult(job.trxId, True, aMessageId=f"msg-{job.trxId}") for job in aJobs]
+
+
+def receipt(aReceiptNo):
+    return ReceiptInfo(aReceiptNo, 5000 + aReceiptNo, f"Cliente {aReceiptNo}", f"cliente{aReceiptNo}@example.com", "K")
+
+
+class EmailjobTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = FakeConnection()
+        self.sender = FakeSender()
+        self.saved = {name: getattr(Emailjob, name)
+                      for name in ("conn", "sender", "statusBatch", "ledger", "suppression", "scheduler",
+                                   "COALESCE_WINDOW")}
+        Emailjob.conn = self.conn
+        Emailjob.sender = self.sender
+        Emailjob.statusBatch = GroupCommit(self.conn, Emailjob.WORKER_ID, 1, 0)
+        Emailjob.ledger = None
+        Emailjob.suppression = None
+        Emailjob.scheduler = None
+        Emailjob.COALESCE_WINDOW = 0
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(Emailjob, name, value)
+
+    def status(self, aTrxId):
+        return self.conn.rows[aTrxId]['status']
+
+
+class PipelineTest(EmailjobTestCase):
+    def test_enqueue_then_send(self):
+        # Como o dispatchChunked entrega: [(ReceiptInfo, TRX_ID)]
+        self.conn.add(101)
+        self.conn.add(102)
+        pipeline = Pipeline.Pipeline()
+        pipeline.enqueue([(receipt(1), 101), (receipt(2), 102)])
+        pipeline.sendQueued(pipeline.nextBatch())
+        self.assertEqual([job.trxId for job in self.sender.jobs], [101, 102])
+        self.assertEqual(self.sender.jobs[0].toEmail, "cliente1@example.com")
+        self.assertEqual((self.status(101), self.status(102)), ('PROCESSED', 'PROCESSED'))
+
+    def test_skips_rows_claimed_elsewhere(self):
+        self.conn.add(101)
+        self.conn.add(102, aStatus='INFLIGHT')
+        pipeline = Pipeline.Pipeline()
+        pipeline.enqueue([(receipt(1), 101), (receipt(2), 102)])
+        pipeline.sendQueued(pipeline.nextBatch())
+        self.assertEqual([job.trxId for job in self.sender.jobs], [101])
+
+    def test_attempts_from_claim_reach_dead(self):
+        # Linha que já esgotou as tentativas (ex: leases vencidos) não é enviada
+        self.conn.add(101, aAttempts=Emailjob.MAX_ATTEMPTS)
+        pipeline = Pipeline.Pipeline()
+        pipeline.enqueue([(receipt(1), 101)])
+        pipeline.sendQueued(pipeline.nextBatch())
+        self.assertEqual(self.sender.jobs, [])
+        self.assertEqual(self.status(101), 'DEAD')
+
+
+class SendBatchTest(EmailjobTestCase):
+    def test_undecodable_rows_go_dead_and_the_rest_is_sent(self):
+        rows = [
+            (receipt(1).encode(), 201, 1, 0),
+            ('[9,1,5001,"Cliente","c@example.com","K"]', 202, 1, 0),  # versão desconhecida
+            ('[]', 203, 1, 0),                                         # payload vazio
+            ('{"receiptNo": 1', 204, 1, 0),                            # JSON cortado
+            (receipt(5).encode(), 205, 1, 0),
+        ]
+        for trxInfo, trxId, trxCode, attempts in rows:
+            self.conn.claimed(trxId, attempts)
+        Emailjob.sendBatch(rows)
+        self.assertEqual([job.trxId for job in self.sender.jobs], [201, 205])
+        self.assertEqual([self.status(i) for i in (201, 202, 203, 204, 205)],
+                         ['PROCESSED', 'DEAD', 'DEAD', 'DEAD', 'PROCESSED'])
+        self.assertIn("TRX_INFO inválido", self.conn.rows[202]['error'])
+
+
+class LeaseTest(EmailjobTestCase):
+    def test_row_that_keeps_crashing_the_worker_reaches_dead(self):
+        self.conn.add(301, aInfo=receipt(1).encode())
+        self.sender.crashes.add(301)
+        cycles = 0
+        while self.status(301) != 'DEAD':
+            self.assertLess(cycles, Emailjob.MAX_ATTEMPTS + 1, "a linha não chegou a DEAD")
+            cycles += 1
+            try:
+                Emailjob.drainQueue()
+            except RuntimeError:
+                pass
+            # O lease da linha vence antes da próxima drenagem
+            self.conn.rows[301]['expired'] = True
+        # Um envio por tentativa; na última o claim já conta MAX_ATTEMPTS e não envia
+        self.assertEqual(len(self.sender.jobs), Emailjob.MAX_ATTEMPTS)
+        self.assertIn("Lease vencido", self.conn.rows[301]['error'])
+
+
+if __name__ == "__main__":
+    unittest.main()